@@ -14,39 +14,48 @@
 # OTHER TORTUOUS ACTION, ARISING OUT OF OR IN CONNECTION WITH THE USE OR
 # PERFORMANCE OF THIS SOFTWARE.
 # ----------------------------------------------------------------------
+import glob
 import os.path
 import re
 import subprocess
 import shutil
 import textwrap
-import imp
 import decimal
 import platform
+import queue
+import threading
 
 import sys
 
 try:
-    import Pmw
-    import tkinter as tk
-    import tkinter.filedialog
-except:
-    print("  ### Graphic libraries not found. Please install them (Tkinter and Pmw) and re-run the plugin.")
-try:
-    import matplotlib as mplt
-    #mplt.use('TKAgg')
-except Exception as e:
-    print("  ### Matplotlib library not found. Please install it and re-run the plugin." + str(e))
-try:
-    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-    from matplotlib.patches import Rectangle
-    from matplotlib.lines import Line2D
-except Exception as e:
-    print("  ### Matplotlib library not found. Please install it and re-run the plugin." + str(e))
-from pymol.cgo import *
-from pymol import cmd
-from tkinter.font import Font
+    from pymol.cgo import *
+    from pymol import cmd
+except ImportError:
+    cmd = None  # batch mode (python -m PyLasso) runs without PyMOL and the graphic libraries
+
+if cmd is not None:
+    try:
+        import Pmw
+        import tkinter as tk
+        import tkinter.filedialog
+        from tkinter import ttk
+    except:
+        print("  ### Graphic libraries not found. Please install them (Tkinter and Pmw) and re-run the plugin.")
+    try:
+        import matplotlib as mplt
+        #mplt.use('TKAgg')
+    except Exception as e:
+        print("  ### Matplotlib library not found. Please install it and re-run the plugin." + str(e))
+    try:
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from matplotlib.patches import Rectangle, Circle
+    except Exception as e:
+        print("  ### Matplotlib library not found. Please install it and re-run the plugin." + str(e))
+    from tkinter.font import Font
 from math import ceil
 
+import numpy as np
+
 errors = {
     1: "There 2 Ca atoms with identical indices and position.",
     2: "There are two consecutive atoms in the non-natural distance lower than 2 angstrom or larger than 4.2 angstrom.",
@@ -101,6 +110,9 @@ colors = ['#FF4000', '#FF8000', '#FFBF00', '#FFFF00', '#BFFF00', '#80FF00', '#40
           '#FF3399', '#990033', '#CC3300', '#FFFFFF', '#9900FF', '#0033CC', '#339966', '#336600', '#cc3300',
           '#CC6699', 'red', '#FF9966']
 
+bridge_images = {"SS": "SS", "SS-like": "SS", "AMIDE": "Amide", "AMIDE-like": "Amide", "ESTER": "Ester",
+                 "ESTER-like": "Ester", "THIOESTER": "Thioester", "THIOESTER-like": "Thioester", "OTHER": "Other"}
+
 
 GUI_PARS = {
     'TRAJECTORY_LOOP_FILL': [50, 5, 55],
@@ -118,7 +130,12 @@ GUI_PARS = {
 
 plugin_path = os.path.dirname(__file__)
 sys.path.append(plugin_path)
+import convert_pdb_2_5columns
+import gln
+import lasso_pipeline
+import result_cache
 system_working_directory = os.getcwd()
+TASK_POLL = 100  # ms between checks of the events of a background task
 
 
 def gui_par(par):
@@ -140,16 +157,6 @@ class PyLassoBase:
     #                             CHECK FILE EXTENSION & ADJUST POLYMER REPRESENTATION
     ####################################################################################################################
 
-    def get_python_exec(self):
-        if sys.version_info.major == 3:
-            res = subprocess.Popen(["python3", "--version"], stdout=subprocess.PIPE).communicate()[0].splitlines()
-            if res and res[0].decode('utf-8').find("Python 3") >= 0:
-                return "python3"
-            else:
-                "python"
-        else:
-            "python"
-
     def load_file(self):
         self.open_file_window = tkinter.filedialog.askopenfile(initialdir=os.getcwd(), title="PyLasso",
                                                                filetypes=(("PDB", "*.pdb"), ("XYZ", "*.xyz")))
@@ -291,17 +298,19 @@ class PyLassoBase:
         output_file = open(self._full_path_to_dir + os.sep + self._filename, 'w')
 
         xyz_atm = re.compile(
-            r"^\s*(?P<resid>[0-9]*)\s+(?P<x>-?\d+\.\d*)\s+(?P<y>-?\d+\.\d*)\s+(?P<z>-?\d+\.\d*).*$")
+            r"^\s*(?P<resid>[0-9]*)\s+(?P<x>-?\d+\.\d*)\s+(?P<y>-?\d+\.\d*)\s+(?P<z>-?\d+\.\d*)"
+            r"(\s+(?P<resname>[A-Z]{3}))?.*$")
         with open(self._full_path_to_file) as f:
             for line in f:
                 data = xyz_atm.match(line)
                 if data:
-                    resid = int(data.groups()[0])
-                    x = float(data.groups()[1])
-                    y = float(data.groups()[2])
-                    z = float(data.groups()[3])
-                    output_file.write("ATOM%7d  CA  GLY A%4d    %8.3f%8.3f%8.3f  1.00  0.00           C\n" % (
-                        resid, resid, x, y, z))
+                    resid = int(data.group("resid"))
+                    x = float(data.group("x"))
+                    y = float(data.group("y"))
+                    z = float(data.group("z"))
+                    resname = data.group("resname") or "GLY"  # residue names of 5-column files let find cysteines
+                    output_file.write("ATOM%7d  CA  %3s A%4d    %8.3f%8.3f%8.3f  1.00  0.00           C\n" % (
+                        resid, resname, resid, x, y, z))
         output_file.close()
 
     def delete_pymol_objects(self):
@@ -380,9 +389,12 @@ class PyLassoBase:
 
     def _invoke_plugin_action(self, clicked_btn):
         if clicked_btn == "Proceed":
+            if self.is_task_running():
+                return
             print("  PyLasso is running...")
             self._invoke_program()
         else:
+            self.cancel_task()
             self.dialog.withdraw()
             if hasattr(self, "error_pop_menu") and self.error_popup.winfo_exists():
                 self.error_popup.withdraw()
@@ -417,11 +429,103 @@ class PyLassoBase:
         if not self.is_trajectory:
             self.create_gln_interior()
         self.create_advanced_frame_hints()
+        self.create_progress_interior()
 
         Pmw.setbusycursorattributes(self.dialog.component('hull'))
         self.dialog.resizable(0, 0)
         self.dialog.show()
 
+    ####################################################################################################################
+    #                                              BACKGROUND TASKS
+    ####################################################################################################################
+
+    def create_progress_interior(self):
+        self.fr_progress = tk.Frame(self.dialog.interior())
+        self.fr_progress.columnconfigure(0, weight=1)
+        self.progress_label = tk.Label(self.fr_progress, anchor="w")
+        self.progress_label.grid(sticky='w', column=0, row=0, columnspan=2)
+        self.progress_bar = ttk.Progressbar(self.fr_progress, orient="horizontal", mode="determinate")
+        self.progress_bar.grid(sticky='we', column=0, row=1)
+        self.btn_cancel = tk.Button(self.fr_progress, text="Cancel", width=self.retrieve_btns_width,
+                                    command=self.cancel_task)
+        self.btn_cancel.grid(column=1, row=1, padx=5)
+
+    def start_task(self, label, function, then=None, watch=None, failure="The calculations failed: "):
+        """
+            Runs function(progress, cancellation) on a worker thread, so PyMOL does not freeze, and calls then(result)
+            on the main thread when it finishes. The worker reports progress(done, total), posted to a queue which is
+            polled with after() every TASK_POLL ms; watch() called at every poll may report (done, total) for work
+            that cannot do it itself. Cancel terminates the running detect_lassos processes; errors end in a popup.
+        """
+        events = queue.Queue()
+        cancellation = lasso_pipeline.Cancellation()
+
+        def work():
+            try:
+                events.put(("done", function(lambda done, total: events.put(("progress", (done, total))),
+                                             cancellation)))
+            except lasso_pipeline.Cancelled:
+                events.put(("cancelled", None))
+            except Exception as e:
+                events.put(("error", e))
+
+        self.task_events, self.task_cancellation = events, cancellation
+        self.show_progress(label)
+        threading.Thread(target=work, daemon=True).start()
+        self.parent.after(TASK_POLL, self.poll_task, events, then, watch, failure)
+
+    def poll_task(self, events, then, watch, failure):
+        if watch is not None:
+            self.update_progress(*watch())
+        while True:
+            try:
+                event, value = events.get_nowait()
+            except queue.Empty:
+                break
+            if event == "progress":
+                self.update_progress(*value)
+                continue
+            self.task_events = None
+            self.hide_progress()
+            if event == "done" and then is not None:
+                then(value)
+            elif event == "cancelled":
+                print("  Calculations cancelled...")
+            elif event == "error":
+                self.raise_popup_menu(failure + str(value))
+            return
+        self.parent.after(TASK_POLL, self.poll_task, events, then, watch, failure)
+
+    def is_task_running(self):
+        return getattr(self, "task_events", None) is not None
+
+    def cancel_task(self):
+        if self.is_task_running():
+            self.progress_label.configure(text="Cancelling...")
+            self.task_cancellation.cancel()
+
+    def show_progress(self, label):
+        self.progress_text = label
+        self.progress_label.configure(text=label)
+        self.progress_bar.configure(mode="indeterminate", value=0)
+        self.progress_bar.start()
+        self.fr_progress.pack(fill='x', padx=10, pady=5)
+        self.dialog.component('buttonbox').button('Proceed').configure(state='disabled')
+
+    def update_progress(self, done, total):
+        if total <= 0 or self.task_cancellation.is_cancelled():
+            return
+        if str(self.progress_bar.cget("mode")) != "determinate":
+            self.progress_bar.stop()
+            self.progress_bar.configure(mode="determinate")
+        self.progress_bar.configure(maximum=total, value=min(done, total))
+        self.progress_label.configure(text=self.progress_text + " " + str(min(done, total)) + "/" + str(total))
+
+    def hide_progress(self):
+        self.progress_bar.stop()
+        self.fr_progress.pack_forget()
+        self.dialog.component('buttonbox').button('Proceed').configure(state='normal')
+
     ####################################################################################################################
     #                                          1) TRAJECTORY INTERFACE
     ####################################################################################################################
@@ -668,6 +772,7 @@ class PyLassoBase:
         self.type_loop_closing_bridge = Pmw.ComboBox(self.fr_loop_closing_bridge.interior(), entry_width=30,
                                                      scrolledlist_items=('automatic detections of closed loops',
                                                                          'choose a type of loop closing',
+                                                                         'scan all residues in contact',
                                                                          'choose two atoms to form a bridge'),
                                                      entryfield_entry_state="readonly",
                                                      selectioncommand=lambda x: self.set_bridge_closing())
@@ -681,6 +786,8 @@ class PyLassoBase:
             self.choose_automatic_closing()
         elif str(self.type_loop_closing_bridge.get()) == "choose a type of loop closing":
             self.choose_type_closing()
+        elif str(self.type_loop_closing_bridge.get()) == "scan all residues in contact":
+            self.choose_automatic_closing()
         elif str(self.type_loop_closing_bridge.get()) == "choose two atoms to form a bridge":
             self.choose_own_closing()
 
@@ -1115,8 +1222,15 @@ class PyLassoBase:
                                                        "analyzed. For files in the XYZ format only one chain is "
                                                        "available.", self.hint_width))
         hint_protein.bind(self.type_loop_closing_bridge, textwrap.fill("Choose a method to identify closed loops. For "
-                                                                       "files in XYZ format only the last method is "
-                                                                       "available.", self.hint_width))
+                                                                       "files without SSBOND and LINK records (e.g. "
+                                                                       "models and XYZ files) disulfide bridges are "
+                                                                       "proposed from the distances between "
+                                                                       "cysteines. Scanning all residues in "
+                                                                       "contact closes a loop by every pair of "
+                                                                       "residues with CA atoms 3.1-10 A apart; the "
+                                                                       "results are written to a file in the polymer "
+                                                                       "directory instead of the result window.",
+                                                                       self.hint_width))
 
 
 
@@ -1124,31 +1238,102 @@ class PyLassoBase:
     #                                               EXECUTE PROGRAM 1/2
     ####################################################################################################################
 
+    def convert_to_5columns_format(self):
+        """
+            Converts the structure into .xyz files of each chain, collects the bridges of the selected chain and the
+            gaps of all chains.
+        """
+        self.pdb_bridges = []
+        self.warning_gaps = []
+        self.frame_cache = (None, [])
+
+        if self.is_trajectory:
+            # only the frames appended since the previous analysis are converted, the rest is in the polymer directory
+            convert_pdb_2_5columns.convert_trajectory(self._full_path_to_file, True,
+                                                      os.path.join(self._full_path_to_dir,
+                                                                   self._filename.replace(".", "_")))
+        else:
+            # without SSBOND and LINK records (e.g. models and .xyz files) bridges are proposed from the geometry
+            chains, chain_data = convert_pdb_2_5columns.convert_pdb(self._full_path_to_file,
+                                                                    find_bridges=not self.is_original_pdb)
+            chain = self.chain_index.get()
+            for i in chains:
+                self.warning_gaps += [(gap[0], str(gap[1]), str(gap[2])) for gap in chain_data[i].get_gaps()]
+            if chain in chain_data:
+                self.pdb_bridges = chain_data[chain].get_bridges()
+
     def _invoke_program(self):
         self.displayed_lasso = None
 
-        self.convert_to_5columns_format()
+        if not self.is_trajectory:
+            self.convert_to_5columns_format()
+
+        if not self.is_trajectory and hasattr(self, "type_loop_closing_bridge") \
+                and str(self.type_loop_closing_bridge.get()) == "scan all residues in contact":
+            self.scan_all_contacts()
+            return
 
         self.delete_pymol_objects()
         cmd.spectrum(palette="rainbow", selection="all")
 
-        if self._file_extension == "pdb":
-            self.warning_gaps = [(i.split(" ")[3], i.split(" ")[-3], i.split(" ")[-1]) for i in self.pdb_bridges if
-                                 i.__contains__("WARNING")]
-            self.pdb_bridges = [num for num in self.pdb_bridges if not num.__contains__("WARNING")]
-
         self.user_data = self.generate_invoking_commands()
 
         if not self.is_trajectory:
             self.display_pymol_chain()
+        else:
+            trajectory_output = "traj_" + self._filename + "_" + self.chains[0] + "_" + \
+                                str(self.loops_list[0][0].getvalue()) + "_" + str(self.loops_list[0][1].getvalue()) + \
+                                ".txt"
+            # outputs of the whole trajectory or of the appended frames (see lasso_pipeline.update_trajectory)
+            xyz_file = self.user_data[0].split()[1]
+            update = lasso_pipeline.update_directory(self._full_path_to_dir, xyz_file)
+            self.trajectory_outputs = [os.path.join(self._full_path_to_dir, trajectory_output),
+                                       os.path.join(lasso_pipeline.shards_directory(self._full_path_to_dir, xyz_file),
+                                                    "*", trajectory_output),
+                                       os.path.join(update, trajectory_output),
+                                       os.path.join(lasso_pipeline.shards_directory(update, xyz_file), "*",
+                                                    trajectory_output)]
+            self.trajectory_progress = ({}, self.count_trajectory_frames())
+
+        self.start_task("Detecting lassos...", self.detect_in_background, self.after_lasso_detection,
+                        self.get_trajectory_progress if self.is_trajectory else None)
+
+    def detect_in_background(self, progress, cancellation):
+        # trajectories are converted here, as it may take long and needs no data collected from the interface
+        if self.is_trajectory:
+            self.convert_to_5columns_format()
+            cancellation.check()
+            self.call_trajectory_detection(progress, cancellation)
+        else:
+            self.call_lasso_detection(progress, cancellation)
 
-        self.call_lasso_detection()
+    def call_trajectory_detection(self, progress=None, cancellation=None):
+        """
+            Runs detect_lassos over the frames appended to the trajectory since its previous analysis (all of them
+            the first time), split into shards of frames analysed at the same time (see
+            lasso_pipeline.update_trajectory). Without the number of frames the progress is given in shards.
+        """
+        self.output_data = []
+        if self.trajectory_progress[1]:
+            progress = None  # the frames are counted by get_trajectory_progress
+        try:
+            previous = os.path.join(self._full_path_to_dir, self._filename.replace(".", "_"))
+            output = lasso_pipeline.update_trajectory(self.user_data[0], self._full_path_to_dir, previous,
+                                                      cancellation=cancellation, progress=progress)
+            self.output_data = list(filter(len, [output]))
+        except lasso_pipeline.Cancelled:
+            raise
+        except Exception as e:
+            print("  ### Trajectory analysis failed: " + str(e))
+        self.results = [lasso_pipeline.parse_result(i) for i in self.output_data]
+        print("  Data passed to program and executed...")
 
+    def after_lasso_detection(self, _):
         self.separate_smooth_crossings_from_output()
 
         if hasattr(self, "type_loop_closing_bridge") \
                 and not str(self.type_loop_closing_bridge.get()) == 'choose two atoms to form a bridge' \
-                and all(i.__contains__("ERROR") for i in self.output_data) and not self.is_trajectory:
+                and all(i.is_error() for i in self.results) and not self.is_trajectory:
             if self.is_stable.get() and not self.is_bad_caca_enabled.get():
                 if hasattr(self, "artifact_found") and self.artifact_found.winfo_exists():
                     self.artifact_found.withdraw()
@@ -1160,14 +1345,29 @@ class PyLassoBase:
                 self.artifact_found = Pmw.MessageDialog(self.parent, title=' ', defaultbutton=0,
                                                         message_text=textwrap.fill(artifact_message, self.hint_width))
                 self.artifact_found.geometry("+%d+%d" % (self.screen_width / 2 - 150, self.screen_height / 2))
-                self.call_program_for_artifacts()
+                self.is_artifact = True
+                self.stable_lasso.deselect()
+                self.enable_parametrization_of_algorithm()
+                self.user_data = self.generate_invoking_commands()
+                self.start_task("Detecting lassos again...", self.call_program_for_artifacts, self.write_results)
+                return
+        self.write_results()
+
+    def write_results(self, _=None):
+        is_gln = self.is_gln_checkbutton_selected.get()
+        chain = self.chain_index.get()
+        smooth = int(self.smooth_val.getvalue()) if str(self.smooth_val.getvalue()).isdigit() else 0
 
-        if self.is_gln_checkbutton_selected.get():
-            print("  Generating GLN matrices...")
-            self.call_gln_generator()
+        def write(progress, cancellation):
+            if is_gln:
+                print("  Generating GLN matrices...")
+                self.call_gln_generator(chain, smooth, progress, cancellation)
+            self.move_files_to_polymer_directory(is_gln)
 
-        self.move_files_to_polymer_directory()
+        self.start_task("Writing results...", write, self.show_results)
 
+    def show_results(self, _):
+        self.restore_working_directory()
         if hasattr(self, "win_lasso_info") and self.win_lasso_info.winfo_exists():
             self.win_lasso_info.destroy()
         if hasattr(self, "win_trajectory_analysis") and self.win_trajectory_analysis.winfo_exists():
@@ -1181,6 +1381,110 @@ class PyLassoBase:
         if hasattr(self, "error_pop_menu") and self.error_popup.winfo_exists():
             self.error_popup.withdraw()
 
+    def count_trajectory_frames(self):
+        """
+            Number of frames analysed in the trajectory (every step-th state loaded in PyMOL), 0 if unknown.
+        """
+        step = int(self.step.getvalue()) if str(self.step.getvalue()).isdigit() and int(self.step.getvalue()) else 1
+        try:
+            return int(ceil(cmd.count_states("all") / float(step)))
+        except Exception:
+            return 0
+
+    def get_trajectory_progress(self):
+        """
+            Frames already analysed by detect_lassos - lines after the header of the trajectory output or of the
+            outputs of its shards, each read from where the previous check stopped - and all frames.
+        """
+        read, frames = self.trajectory_progress
+        done = 0
+        for path in [self.trajectory_outputs[0]] + sum([glob.glob(i) for i in self.trajectory_outputs[1:]], []):
+            if not os.path.exists(path):
+                continue
+            position, lines = read.get(path, (0, 0))
+            if os.path.getsize(path) < position:
+                position, lines = 0, 0
+            with open(path, "rb") as f:
+                f.seek(position)
+                data = f.read()
+            read[path] = (position + len(data), lines + data.count(b"\n"))
+            done += max(0, read[path][1] - lasso_pipeline.TRAJECTORY_HEADER)
+        return done, frames
+
+    def scan_all_contacts(self):
+        """
+            Detects lassos for the loops closed by all residues in contact. There may be thousands of them, so no
+            surfaces are written and the results go straight to a file in the polymer directory.
+        """
+        chain = self.chain_index.get()
+        directory = self.create_polymer_directory(self._filename.replace(".", "_"))
+        output_file = os.path.join(self._full_path_to_dir, directory, self._filename + "_" + chain + "_contacts.txt")
+        options = lasso_pipeline.detection_options(smooth=self.smooth_val.getvalue(),
+                                                   bad_caca=self.is_bad_caca_enabled.get(),
+                                                   reductions=self.get_reductions(), files=False)
+        print("  Scanning all residues in contact...")
+
+        def scan(progress, cancellation):
+            found = lasso_pipeline.scan_contacts(self.program_execution, self._full_path_to_file + "_" + chain + ".xyz",
+                                                 options, output_file, cwd=self._full_path_to_dir,
+                                                 cancellation=cancellation, progress=progress)
+            self.move_files_to_polymer_directory(False)
+            return found
+
+        self.start_task("Scanning residues in contact...", scan, lambda found: self.show_contacts(found, output_file),
+                        failure="Scanning of the residues in contact failed: ")
+
+    def show_contacts(self, found, output_file):
+        self.restore_working_directory()
+        loops, lassos = found
+        if os.path.exists("niewaznypliczek.txt"):
+            os.remove("niewaznypliczek.txt")
+
+        if hasattr(self, "contacts_scanned") and self.contacts_scanned.winfo_exists():
+            self.contacts_scanned.withdraw()
+        self.contacts_scanned = Pmw.MessageDialog(self.parent, title=' ', defaultbutton=0,
+                                                  message_text=textwrap.fill(str(lassos) + " lasso(s) found in " +
+                                                                             str(loops) + " loops closed by residues "
+                                                                             "in contact. The results were written "
+                                                                             "to " + output_file, self.hint_width))
+        self.contacts_scanned.geometry("+%d+%d" % (self.screen_width / 2 - 150, self.screen_height / 2))
+
+    def call_gln_generator(self, chain=None, smooth=None, progress=None, cancellation=None):
+        """
+            Computes the GLN matrices of the tails of every loop with gln (matrixGLN_*_t1.npz/_t2.npz and colours of
+            segments surface_*_GLN1.txt, also for the smoothed chain), next to the files of detect_lassos. Matrices
+            computed before are taken from the result cache. The chain and the smoothing are read from the interface
+            unless given (as they must be off the main thread).
+        """
+        if chain is None:
+            chain = self.chain_index.get()
+        if smooth is None:
+            smooth = int(self.smooth_val.getvalue()) if str(self.smooth_val.getvalue()).isdigit() else 0
+        for k, result in enumerate(self.results):
+            if cancellation is not None:
+                cancellation.check()
+            if progress is not None:
+                progress(k, len(self.results))
+            if result.is_error():
+                continue
+            try:
+                gln.generate_gln(self._full_path_to_file + "_" + chain + ".xyz", result.first, result.last,
+                                 self._full_path_to_dir, smooth, self.result_cache)
+            except Exception as e:
+                print("  ### GLN matrices of the loop " + str(result.first) + "-" + str(result.last) +
+                      " were not generated: " + str(e))
+        if self.result_cache is not None:
+            self.result_cache.evict()
+
+    def separate_smooth_crossings_from_output(self):
+        self.smooth_crossings = []
+
+        for result in self.results:
+            if result.is_error():
+                self.smooth_crossings.append([])
+            else:
+                self.smooth_crossings.append([i + "," for i in result.smooth_n_piercings + result.smooth_c_piercings])
+
     ####################################################################################################################
     #                                               1) GET PLUGIN DATA
     ####################################################################################################################
@@ -1192,29 +1496,19 @@ class PyLassoBase:
 
         arguments += self.get_trajectory_data() if self.is_trajectory else self.get_method_to_find_bridges()
 
-        if self.is_gln_checkbutton_selected.get():
-            arguments = [i + " -f" for i in arguments]
-            arguments = [i + " 3" for i in arguments]
-        else:
-            arguments = [i + " -f" for i in arguments]
-            arguments = [i + " 2" for i in arguments]
         if len(self.smooth_val.getvalue()) < 0:
             self.raise_popup_menu('No surface value given. Please insert appropriate value from range <2;100>.')
-        if len(self.smooth_val.getvalue()) > 0:
-            arguments = [i + " -sm_nr" for i in arguments]
-            arguments = [i + " " + str(self.smooth_val.getvalue()) for i in arguments]
-        if self.is_bad_caca_enabled.get():
-            arguments = [i + " -cd" for i in arguments]
-            arguments = [i + " 0" for i in arguments]
-        if not self.is_stable.get():
-            arguments = [i + " -redAC" for i in arguments]
-            arguments = [i + " " + self.min_dist_crossings.getvalue() for i in arguments]
-            arguments = [i + " -redEnd" for i in arguments]
-            arguments = [i + " " + self.min_dist_cross_end.getvalue() for i in arguments]
-            arguments = [i + " -redBr" for i in arguments]
-            arguments = [i + " " + self.min_dist_cross_loop.getvalue() for i in arguments]
+        options = lasso_pipeline.detection_options(self.is_gln_checkbutton_selected.get(), self.smooth_val.getvalue(),
+                                                   self.is_bad_caca_enabled.get(), self.get_reductions())
+        arguments = [i + options for i in arguments]
         return arguments
 
+    def get_reductions(self):
+        if self.is_stable.get():
+            return None
+        return (self.min_dist_crossings.getvalue(), self.min_dist_cross_end.getvalue(),
+                self.min_dist_cross_loop.getvalue())
+
     def get_trajectory_data(self):
         args = self.program_execution
         new_filename = self._full_path_to_file + "_" + self.chains[0] + ".xyz"
@@ -1252,67 +1546,26 @@ class PyLassoBase:
         return args
 
     def get_automatic_closing_data(self):
-        if self._file_extension == "xyz":
-            self.raise_popup_menu('No automatic detection of closed loops for .xyz files.')
-        if not self.is_original_pdb:
+        if len(self.pdb_bridges) == 0:
             self.raise_popup_menu('No bridge has been detected in the file. Please use na option "choose two atoms '
                                   'to form a bridge"')
 
         chain = self.chain_index.get()
-        list_atoms = []
-        list_args = []
-
-        for i in list(self.pdb_bridges):
-            elem = i.split(" ")
-            if len(elem) > 2:
-                if int(elem[-2]) > int(elem[-1]):
-                    bridge = (elem[0], elem[-1], elem[-2])
-                else:
-                    bridge = (elem[0], elem[-2], elem[-1])
-                list_atoms.append(bridge)
-        for i in list_atoms:
-            if not list_args.__contains__(self.program_execution + self._full_path_to_file + "_" + chain + ".xyz " +
-                                                  i[1] + " " + i[2]):
-                list_args.append(self.program_execution + self._full_path_to_file + "_" + chain + ".xyz " + i[1] +
-                                 " " + i[2])
-                self.list_bridges.append(i)
-        return list_args
+        self.list_bridges, _ = lasso_pipeline.bridge_loops(self.pdb_bridges)
+        return lasso_pipeline.loop_commands(self.program_execution, self._full_path_to_file + "_" + chain + ".xyz",
+                                            [(i[1], i[2]) for i in self.list_bridges])
 
     def get_type_closing_data(self):
-        if self._file_extension == "xyz":
-            self.raise_popup_menu('Not possible to choose a type of loop closing for .xyz files.')
-        if not self.is_original_pdb:
+        if len(self.pdb_bridges) == 0:
             self.raise_popup_menu('No bridge has been detected in the file. Please use na option "choose two atoms '
                                   'to form a bridge"')
         if hasattr(self, "bridge_selected") and None is self.bridge_selected:
             self.raise_popup_menu('No bridge type selected. Please select correct one.')
 
         chain = self.chain_index.get()
-        list_atoms = []
-        list_atoms_br = []
-        list_args = []
-
-        for i in list(self.pdb_bridges):
-            elem = i.split(" ")
-
-            if len(elem) > 2:
-                if int(elem[-2]) > int(elem[-1]):
-                    bridge = (elem[0], elem[-1], elem[-2])
-                else:
-                    bridge = (elem[0], elem[-2], elem[-1])
-                if bridge[0] == (self.bridge_selected.upper()) or bridge[0] == (self.bridge_selected.upper() + "-like"):
-                    list_atoms_br.append(bridge)
-                else:
-                    list_atoms.append(bridge)
-        if len(list_atoms_br) > 0:  # A bridge - specified in bridge-type-selection - exists
-            self.type_bridge_exists = True
-            for i in list_atoms_br:
-                if not list_args.__contains__(self.program_execution + self._full_path_to_file + "_" + chain + ".xyz " +
-                                                      i[1] + " " + i[2]):
-                    list_args.append(
-                        self.program_execution + self._full_path_to_file + "_" + chain + ".xyz " + i[1] + " " + i[2])
-                    self.list_bridges.append(i)
-        else:
+        self.list_bridges, self.type_bridge_exists = lasso_pipeline.bridge_loops(self.pdb_bridges,
+                                                                                 self.bridge_selected)
+        if not self.type_bridge_exists:
             if hasattr(self, "bridge_found") and self.bridge_found.winfo_exists():
                 self.bridge_found.withdraw()
             self.bridge_found = Pmw.MessageDialog(self.parent, title=' ', defaultbutton=0,
@@ -1320,30 +1573,20 @@ class PyLassoBase:
                                                                              "calculations were conducted "
                                                                              "automatically.", self.hint_width))
             self.bridge_found.geometry("+%d+%d" % (self.screen_width / 2 - 150, self.screen_height / 2))
-            self.type_bridge_exists = False
-
-            for i in list_atoms:
-                if not list_args.__contains__(self.program_execution + self._full_path_to_file + "_" + chain + ".xyz " +
-                                                      i[1] + " " + i[2]):
-                    list_args.append(
-                        self.program_execution + self._full_path_to_file + "_" + chain + ".xyz " + i[1] + " " + i[2])
-                    self.list_bridges.append(i)
-        return list_args
+        return lasso_pipeline.loop_commands(self.program_execution, self._full_path_to_file + "_" + chain + ".xyz",
+                                            [(i[1], i[2]) for i in self.list_bridges])
 
     def get_own_closing_data(self):
         self.validate_loop_list()
         chain = self.chain_index.get()
-        list_args = []
+        loops = []
 
         for i in self.loops_list:
             if (len(i[0].getvalue()) == 0) or len(i[1].getvalue()) == 0:
                 break
-            if not list_args.__contains__(self.program_execution + self._full_path_to_file + "_" + chain + ".xyz " + str(
-                    i[0].getvalue()) + " " + str(i[1].getvalue())):
-                list_args.append(
-                    self.program_execution + self._full_path_to_file + "_" + chain + ".xyz " + str(i[0].getvalue()) +
-                    " " + str(i[1].getvalue()))
-        return list_args
+            loops.append((i[0].getvalue(), i[1].getvalue()))
+        return lasso_pipeline.loop_commands(self.program_execution, self._full_path_to_file + "_" + chain + ".xyz",
+                                            loops)
 
     def validate_loop_list(self):
         if len(self.loops_list[0][0].getvalue()) == 0 and len(self.loops_list[0][1].getvalue()) == 0:
@@ -1374,23 +1617,23 @@ class PyLassoBase:
         cmd.deselect()
 
 
-    def move_files_to_polymer_directory(self):
+    def move_files_to_polymer_directory(self, is_gln=None):
+        """
+            Moves the resulting files by their absolute paths, without changing the working directory, as it runs on
+            the worker thread of start_task. The directory to return to is left in current_working_dir for the main
+            thread (restore_working_directory).
+        """
+        if is_gln is None:
+            is_gln = self.is_gln_checkbutton_selected.get()
         self.current_working_dir = self._full_path_to_dir if platform.system() == 'Windows' else system_working_directory
-        directory = self.create_polymer_directory(self._filename.replace(".", "_"))
-        directory_in_workspace = os.path.join(self._full_path_to_dir, directory)
-
-        os.chdir(directory_in_workspace)
-
-        if self.is_gln_checkbutton_selected.get():
-            self.separate_files_to_directory(self._full_path_to_dir, os.path.join(directory_in_workspace, "_GLN"), "matrixGLN_")
-        self.separate_files_to_directory(self._full_path_to_dir, os.path.join(directory_in_workspace, "_barycentric"),
-                                         "barycentric_", "F_PYsvgBari_")
-        self.separate_files_to_directory(self._full_path_to_dir,  os.path.join(directory_in_workspace, "_surfaces"), "surface_")
-        self.separate_files_to_directory(self._full_path_to_dir,  os.path.join(directory_in_workspace, "_smooth"), "_smooth.pdb")
-        self.separate_files_to_directory(self._full_path_to_dir,  directory_in_workspace, self._filename + "_")
-        os.chdir(self.current_working_dir)
+        self.create_polymer_directory(self._filename.replace(".", "_"))
+        lasso_pipeline.move_results(self._full_path_to_file, is_gln)
         print("  Resulting files moved to separate directories...")
 
+    def restore_working_directory(self):
+        if hasattr(self, "current_working_dir"):
+            os.chdir(self.current_working_dir)
+
     def create_polymer_directory(self, prot):
         direct = os.sep.join(self._full_path_to_file.split(os.sep)[:-1]) + os.sep + prot
 
@@ -1402,13 +1645,7 @@ class PyLassoBase:
         return direct.split(os.sep)[-1]
 
     def separate_files_to_directory(self, source, target, *files):
-        if not os.path.exists(target):
-            os.makedirs(target)
-        for filename in os.listdir(source):
-            for arg in files:
-                if filename.__contains__(arg):
-                    shutil.move(os.path.join(source, filename),
-                                os.path.join(target, filename))
+        lasso_pipeline.separate_files(source, target, *files)
 
     ####################################################################################################################
     #                                       1. CREATE TRAJECTORY RESULT WINDOW
@@ -1539,31 +1776,54 @@ class PyLassoBase:
     #                                     FILL TRAJECTORY WINDOW WITH DATA
     ####################################################################################################################
 
+    def calculate_lasso_in_trajectory(self):
+        """
+            Runs the detection on the worker thread of start_task, show_trajectory_lasso then fills the window with
+            its results and the charts of the trajectory.
+        """
+        advanced = self.get_trajectory_advanced()
+        is_gln = self.is_gln_checkbutton_selected.get()
+
+        def detect(progress, cancellation):
+            convert_pdb_2_5columns.convert_pdb(self._full_path_to_file)
+
+            self.update_trajectory_name("lasso")
+            tmp_filename = self._filename + "_" + self.chains[0] + "_lasso.xyz"
+            self.user_data = [self.program_execution + self._full_path_to_dir + os.sep + tmp_filename + " " +
+                              self.trajectory_chain_loop_indexes[0] + " " + self.trajectory_chain_loop_indexes[1] +
+                              " " + advanced]
+            self.call_lasso_detection(progress, cancellation)
+            self.move_files_to_polymer_directory(is_gln)
+
+        self.start_task("Detecting lassos in the trajectory...", detect, self.show_trajectory_lasso)
+
+    def show_trajectory_lasso(self, _):
+        self.restore_working_directory()
+        self.window_parent = self.win_trajectory_lasso_information.interior()
+
+        self.display_lasso_information_table()
+        if not all(elem.is_error() for elem in self.results):
+            self.create_lasso_information_buttons()
+            self.create_surface_hints()
+
+        reversed_trajectory_lasso_set = list(set(self.retrieved_trajectory_lassos))
+        if len(self.retrieved_frames) == 0:
+            self.draw_error_charts("Given step is bigger than total number of frames. There is nothing to draw.",
+                                   self.win_lasso_type.interior(), self.win_atoms_piercing_lasso.interior())
+        elif all(lasso.__contains__("ERR") for lasso in reversed_trajectory_lasso_set):
+            self.draw_error_charts("Please use ''Ignore an inappropriate length of a bridge and Ca-Ca bonds'' "
+                                   "option to ignore\ninappropriate length between consecutive  atoms or the "
+                                   "loop closing atoms - the bridge.",
+                                   self.win_lasso_type.interior(), self.win_atoms_piercing_lasso.interior())
+        else:
+            self.draw_lassos_type_chart()
+            self.draw_atoms_piercing_lasso_chart()
+
     def invoke_trajectory_window_buttons(self, clicked_button):
         if clicked_button == "Show":
             self.get_chart_data_from_file()
             self.set_trajectory_analysis_log()
             self.calculate_lasso_in_trajectory()
-
-            self.window_parent = self.win_trajectory_lasso_information.interior()
-
-            self.display_lasso_information_table()
-            if not all(elem.__contains__("ERROR") for elem in self.output_data):
-                self.create_lasso_information_buttons()
-                self.create_surface_hints()
-
-            reversed_trajectory_lasso_set = list(set(self.retrieved_trajectory_lassos))
-            if len(self.retrieved_frames) == 0:
-                self.draw_error_charts("Given step is bigger than total number of frames. There is nothing to draw.",
-                                       self.win_lasso_type.interior(), self.win_atoms_piercing_lasso.interior())
-            elif all(lasso.__contains__("ERR") for lasso in reversed_trajectory_lasso_set):
-                self.draw_error_charts("Please use ''Ignore an inappropriate length of a bridge and Ca-Ca bonds'' "
-                                       "option to ignore\ninappropriate length between consecutive  atoms or the "
-                                       "loop closing atoms - the bridge.",
-                                       self.win_lasso_type.interior(), self.win_atoms_piercing_lasso.interior())
-            else:
-                self.draw_lassos_type_chart()
-                self.draw_atoms_piercing_lasso_chart()
         else:
             self.given_frames = []
 
@@ -1594,6 +1854,7 @@ class PyLassoBase:
         self.retrieved_frames = []
         self.retrieved_trajectory_lassos = []
         self.retrieved_trajectory_crossings = []
+        self.chart_frames = {}
 
         idx_and_lasso = (0, -3) if self.is_detailed_out.get() else (0, -1)
 
@@ -1687,14 +1948,59 @@ class PyLassoBase:
         if len(cmd.get_names(type="selections")) > 0:
             cmd.delete(name="sele")
 
+    def scatter_lassos_types(self, ax):
+        """
+            Draws every frame of the trajectory on the chart of lasso types, one scatter collection per type (Other
+            for the types without a position), instead of an artist per frame. The positions of the frames drawn by
+            every collection are kept in chart_frames for picked_frame.
+        """
+        frames = np.array([float(i) for i in self.retrieved_frames])
+        groups = {}
+        for idx, lasso in enumerate(self.retrieved_trajectory_lassos):
+            groups.setdefault(lasso if lasso in self.lasso_info_tuple else 'Other', []).append(idx)
+        for lasso, positions in groups.items():
+            y, color = self.lasso_info_tuple[lasso]
+            collection = ax.scatter(frames[positions], np.full(len(positions), y), color=color, picker=3)
+            self.chart_frames[collection] = np.array(positions)
+
+    def scatter_piercings(self, ax):
+        """
+            Draws the piercing atoms of every frame of the trajectory on the chart of piercings, one scatter
+            collection for the positive and one for the negative piercings, keeping their frames in chart_frames.
+        """
+        frames, atoms = {"+": [], "-": []}, {"+": [], "-": []}
+        for idx, crossings in enumerate(self.retrieved_trajectory_crossings):
+            if crossings in ("|", "ERR"):
+                continue
+            for crossing in crossings:
+                sign = "+" if crossing[0] == "+" else "-"
+                frames[sign].append(idx)
+                atoms[sign].append(float(crossing[1:]))
+        x = np.array([float(i) for i in self.retrieved_frames])
+        for sign, color in (("+", "#008000"), ("-", "#0000FF")):
+            if frames[sign]:
+                collection = ax.scatter(x[frames[sign]], np.array(atoms[sign]), color=color, picker=3)
+                self.chart_frames[collection] = np.array(frames[sign])
+
+    def picked_frame(self, event):
+        """
+            Position in retrieved_frames of the frame picked on a trajectory chart - of the picked point of the
+            collection closest to the mouse - or None if the artist is not a collection of the charts.
+        """
+        positions = self.chart_frames.get(event.artist)
+        if positions is None or len(event.ind) == 0:
+            return None
+        ind = event.ind
+        if event.mouseevent.xdata is not None:
+            ind = ind[np.argsort(np.abs(event.artist.get_offsets()[ind, 0] - event.mouseevent.xdata), kind="stable")]
+        return int(positions[ind[0]])
+
     def display_frame_in_pymol_on_pick(self, event):
-        if isinstance(event.artist, Line2D):
+        pos_frame = self.picked_frame(event)
+        if pos_frame is not None:
             if hasattr(self, "lasinf_surface_button") and self.lasinf_surface_button.winfo_exists():
                 self.lasinf_surface_button.configure(state="disabled")
                 self.lasinf_smooth_button.configure(state="disabled")
-            artist = event.artist
-            selected_frame = artist.get_xdata()[0]
-            pos_frame = self.retrieved_frames.index(selected_frame)
             crossings = self.retrieved_trajectory_crossings[pos_frame]
             step = int(self.step.getvalue()) if len(self.step.getvalue()) != 0 else 1
 
@@ -1704,7 +2010,7 @@ class PyLassoBase:
                 self.mark_crossings_on_trajectory(crossings)
 
     def create_annotations(self, artist):
-        if not mplt.cbook.iterable(artist):
+        if not np.iterable(artist):
             artist = [artist]
         self.display_all = False
         self.axes = list(set(art.axes for art in artist))
@@ -1726,32 +2032,29 @@ class PyLassoBase:
         return annotation
 
     def display_annotation(self, event):
-        x, y = event.artist.get_xdata()[0], event.artist.get_ydata()[0]
+        pos = self.picked_frame(event)
         annotation = self.annotations[event.artist.axes]
 
-        if x is not None:
+        if pos is not None:
             if not self.display_all:
                 for ann in list(self.annotations.values()):
                     ann.set_visible(False)
-            annotation.xy = x, y
-            pos = list(self.axes[0].get_yticks()).index(y)
-            type_lasso = list(self.axes[0].get_yticklabels())[pos].get_text()
+            x, type_lasso = self.retrieved_frames[pos], self.retrieved_trajectory_lassos[pos]
+            y = self.lasso_info_tuple[type_lasso if type_lasso in self.lasso_info_tuple else 'Other'][0]
+            annotation.xy = float(x), y
 
             if type_lasso == "ERR":
                 annotation.set_text("ERROR!\nFrame: %s" % (x))
             elif type_lasso == 'L0':
                 annotation.set_text("Type of lasso: %s\nFrame: %s" % ('L0', x))
             else:
-                pos = self.retrieved_frames.index(x)
                 crossings = self.retrieved_trajectory_crossings[pos]
                 cross = ""
                 for i in crossings:
                     cross += i + " "
-                if type_lasso == "Other":
-                    type_lasso = self.retrieved_trajectory_lassos[int(float(x))]
                 annotation.set_text("Type of lasso: %s\nPiercings: %s\nFrame: %s" % (type_lasso, cross, x))
 
-            if int(float(x)) > int(float(self.retrieved_frames[len(self.retrieved_frames) / 2])):
+            if pos > len(self.retrieved_frames) // 2:
                 annotation.set_ha("right")
             else:
                 annotation.set_ha("left")
@@ -1847,39 +2150,38 @@ class PyLassoBase:
                                       'error in the selected frame. Please try another frame.')
             tmp_frames_validate.append(frame)
 
-        tmp_frames_command = []
-        self.frames_to_invoke = []
-        for i in tmp_frames_validate:
-            self.given_frame = i
-            os.chdir(self._full_path_to_dir)
-            self.create_file_containing_frame()
-            self.create_frame_file_dir()
-
-            detailed = (" -sframe " + ("2 " if self.is_detailed_alg.get() else "1 ")) \
-                if not self.is_detailed_out_frame.get() else ""
-            command = self.program_execution + self.file_frame_name + " " + self.trajectory_chain_loop_indexes[0] \
-                      + " " + self.trajectory_chain_loop_indexes[1] + " " + self.get_trajectory_advanced() + detailed
-            if not self.frames_to_invoke.__contains__(command):
-                self.frames_to_invoke.append(command)
-                tmp_frames_command.append(i)
-
-        self.given_frames = tmp_frames_command
-
-        self.user_data = self.frames_to_invoke
-
-        self.call_lasso_detection()
-
-        os.chdir(self._full_path_to_dir)
-        tmp = self.current_working_dir
-        self.current_working_dir = self._full_path_to_dir
-
-        for i in self.given_frames:
-            self.separate_files_to_directory(self._full_path_to_dir, os.getcwd() + os.sep +
-                                             self._filename.replace(".", "_") + os.sep + "frame_" + str(i),
-                                             "frame_" + str(i))
-        self.current_working_dir = tmp
-        os.chdir(self.current_working_dir)
-
+        # the options are read from the interface here, the frames are extracted and analysed in the background
+        detailed = (" -sframe " + ("2 " if self.is_detailed_alg.get() else "1 ")) \
+            if not self.is_detailed_out_frame.get() else ""
+        options = " " + self.trajectory_chain_loop_indexes[0] + " " + self.trajectory_chain_loop_indexes[1] + " " + \
+                  self.get_trajectory_advanced() + detailed
+        frames_directory = os.path.join(self._full_path_to_dir, self._filename.replace(".", "_"))
+
+        def detect(progress, cancellation):
+            tmp_frames_command = []
+            self.frames_to_invoke = []
+            for i in tmp_frames_validate:
+                self.given_frame = i
+                self.create_file_containing_frame()
+                self.create_frame_file_dir()
+
+                command = self.program_execution + self.file_frame_name + options
+                if not self.frames_to_invoke.__contains__(command):
+                    self.frames_to_invoke.append(command)
+                    tmp_frames_command.append(i)
+                cancellation.check()
+
+            self.given_frames = tmp_frames_command
+            self.user_data = self.frames_to_invoke
+            self.call_lasso_detection(progress, cancellation)
+
+            for i in self.given_frames:
+                self.separate_files_to_directory(self._full_path_to_dir,
+                                                 os.path.join(frames_directory, "frame_" + str(i)), "frame_" + str(i))
+
+        self.start_task("Detecting lassos in the frames...", detect, self.show_trajectory_frame)
+
+    def show_trajectory_frame(self, _):
         for line in self.array_of_results:
             for row in line:
                 row.grid_forget()
@@ -1900,11 +2202,19 @@ class PyLassoBase:
     def create_file_containing_frame(self):
         self.file_frame_name = self._full_path_to_dir + os.sep + self._filename + "_" + self.chains[0] + "_" + \
                                "_frame_" + str(self.given_frame) + ".xyz"
-        frame_file = open(self.file_frame_name, "w")
-        frame_found = False
         path_to_traj_dir = self._full_path_to_dir + os.sep + self._filename.replace(".", "_") + os.sep + \
                            self._filename + "_" + self.chains[0] + ".xyz"
 
+        # the binary cache may end before the last frames (if it could not be updated), the index covers them all
+        if self.frame_cache[0] != path_to_traj_dir:
+            self.frame_cache = (path_to_traj_dir, [convert_pdb_2_5columns.open_frame_cache(path_to_traj_dir[:-4]),
+                                                   convert_pdb_2_5columns.open_frame_index(path_to_traj_dir[:-4])])
+        for frames in self.frame_cache[1]:
+            if frames is not None and frames.write_xyz(self.given_frame, self.file_frame_name):
+                return
+
+        frame_file = open(self.file_frame_name, "w")
+        frame_found = False
         with open(path_to_traj_dir) as f:
             for idx, line in enumerate(f):
                 if frame_found:
@@ -1937,7 +2247,7 @@ class PyLassoBase:
         self.win_lasso_info.resizable(0, 0)
         self.show_bridges()
 
-        if not all(x.__contains__("ERROR") for x in self.output_data):
+        if not all(x.is_error() for x in self.results):
             if not all((len(elem[0]) == 0 and len(elem[1]) == 0) for elem in self.lassos):
                 self.create_shallow_lasso_button()
             if self.is_gln_checkbutton_selected.get():
@@ -2056,18 +2366,16 @@ class PyLassoBase:
             no_lassos.grid(sticky="swen", column=1, columnspan=9, row=0)
             return
 
-        for idx, elem in enumerate(self.output_data):
-            elem = elem.split("SMOOTH")[0]
+        for idx, result in enumerate(self.results):
             row_element = []
-            if elem.__contains__("ERROR"):
+            if result.is_error():
                 row_element.append(self.create_error_loop_range(idx, cell_height))
-                row_element.append(self.create_error(cell_height, elem))
+                row_element.append(self.create_error(cell_height, result))
             else:
-                split_elements = re.split(' ', elem)
-                n_end_length = self.get_n_crossings(split_elements)
-                c_end_length = self.get_c_crossings(split_elements)
+                n_end_length = "".join(i + ", " for i in result.n_piercings)
+                c_end_length = "".join(i + ", " for i in result.c_piercings)
 
-                l = self.itemise_types_of_lasso(split_elements, n_end_length.split(" "), c_end_length.split(" "))
+                l = self.itemise_types_of_lasso(result)
                 self.lassos.append(l)
 
                 n_end_length = self.textwrap_n_crossings(n_end_length)
@@ -2075,19 +2383,19 @@ class PyLassoBase:
 
                 cell_height = max(textwrap.fill(n_end_length, 16).count("\n"),
                                   textwrap.fill(c_end_length, 16).count("\n")) + 1
+                loop_range = str(result.first) + "-" + str(result.last)
                 for idx2, clicked_button in enumerate(
-                        (split_elements[-4], (split_elements[1] + "-" + split_elements[2]),
-                         int(split_elements[2]) - int(split_elements[1]) + 1,
-                         n_end_length, c_end_length, int(split_elements[1]) - int(chain_ends[0]),
-                         int(chain_ends[1]) - int(split_elements[2]), str(int(float(split_elements[-2]))))):
-                    if clicked_button == (split_elements[1] + "-" + split_elements[2]):
+                        (result.lasso, loop_range, result.loop_length(),
+                         n_end_length, c_end_length, result.first - int(chain_ends[0]),
+                         int(chain_ends[1]) - result.last, str(int(result.area)))):
+                    if clicked_button == loop_range:
                         if hasattr(self, "warning_gaps") and self.warning_gaps:
                             not_found = True
                             i = 0
                             chain = self.chain_index.get()
                             while i < self.warning_gaps.__len__() and not_found:
-                                if chain == self.warning_gaps[i][0] and int(split_elements[1]) <= \
-                                        int(self.warning_gaps[i][1]) and int(split_elements[2]) >= \
+                                if chain == self.warning_gaps[i][0] and result.first <= \
+                                        int(self.warning_gaps[i][1]) and result.last >= \
                                         int(self.warning_gaps[i][2]):
                                     row_element.append(self.create_loop_range_interior(clicked_button, cell_height))
                                     not_found = False
@@ -2108,8 +2416,8 @@ class PyLassoBase:
                                     wrap="word", bd=0,
                                     highlightthickness=0, background="white"))
                         self.color_crossings(row_element[-1], clicked_button, 0)
-                    elif clicked_button == split_elements[-4]:
-                        row_res_element = self.create_bridge_type_interior(split_elements, clicked_button, idx,
+                    elif clicked_button == result.lasso:
+                        row_res_element = self.create_bridge_type_interior(result, clicked_button, idx,
                                                                            cell_height)
                         row_element.append(row_res_element)
                     else:
@@ -2193,9 +2501,7 @@ class PyLassoBase:
     def get_bridge_images(self):
         img_bridges = {}
 
-        bridges = {"SS": "SS", "AMIDE": "Amide", "AMIDE-like": "Amide", "ESTER": "Ester", "ESTER-like": "Ester",
-                   "THIOESTER": "Thioester", "THIOESTER-like": "Thioester", "OTHER": "Other"}
-        for k, v in bridges.items():
+        for k, v in bridge_images.items():
             img_bridges[k] = tk.PhotoImage(file=os.path.join(plugin_path + os.sep + "img", v + self._img_extension))
         tmp_label_bridge = tk.Label(self.fr_loop_closing_bridge.interior())
         tmp_label_bridge.image = img_bridges
@@ -2212,11 +2518,11 @@ class PyLassoBase:
         loop_range.tag_config("spacing1", spacing1=6 + spacing)
         return loop_range
 
-    def create_error(self, spacing, txt):
+    def create_error(self, spacing, result):
         width = 115 if self.is_trajectory else 14
         error = tk.Text(self.window_parent, bd=0, height=spacing + 1, padx=5, pady=0, bg="white", width=width,
                         highlightthickness=0)
-        error.insert("1.0", errors[int(re.split(' ', txt)[0][-3])])
+        error.insert("1.0", errors.get(result.error, result.error_message))
         error.tag_add("center", 1.0, "end")
         error.tag_configure("center", justify='center')
         error.tag_add("spacing1", 1.0, "end")
@@ -2224,22 +2530,6 @@ class PyLassoBase:
         error.configure(state="disabled")
         return error
 
-    def get_n_crossings(self, elem):
-        n_end_length = ""
-
-        if int(elem[4]) != 0:
-            for j in range(8, (8 + int(elem[4]))):
-                n_end_length += elem.__getitem__(j) + ", "
-        return n_end_length
-
-    def get_c_crossings(self, elem):
-        c_end_length = ""
-
-        if int(elem[5]) != 0:
-            for j in range(5 + 2 + 2 + int(elem[4]), 5 + 2 + 2 + int(elem[4]) + int(elem[5])):
-                c_end_length += elem.__getitem__(j) + ", "
-        return c_end_length
-
     def textwrap_n_crossings(self, n):
         if None is not self.lassos[-1] and len(self.lassos[-1][0]) > 0:
             return textwrap.fill(" ".join(self.lassos[-1][0][1])[:-1], 16)
@@ -2287,7 +2577,7 @@ class PyLassoBase:
 
     def create_bridge_type_interior(self, var, text, idx, height):
         hints_result_window = Pmw.Balloon(self.window_parent, relmouse="both")
-        img_lasso = str(var[-4]).replace("+", "").replace("-", "").replace("N", "").replace("C", "")
+        img_lasso = str(var.lasso).replace("+", "").replace("-", "").replace("N", "").replace("C", "")
 
         row_res_elem = tk.Text(self.window_parent, bg="white", width=15, height=height + 1, padx=0, pady=0,
                                wrap="word", bd=0, highlightthickness=0)
@@ -2370,16 +2660,16 @@ class PyLassoBase:
                                        padx=5, pady=gui_par('GLN_MATRICES_PADY'))
 
             chain = self.chain_index.get()
-            res_beg = self.output_data[self.displayed_lasso].split(" ")[1]
-            res_end = self.output_data[self.displayed_lasso].split(" ")[2]
+            res_beg = str(self.results[self.displayed_lasso].first)
+            res_end = str(self.results[self.displayed_lasso].last)
 
             file_path = self._filename.replace(".", "_")
             is_smoothed = "_smooth" if self.lasinf_smooth_display.get() else ""
 
             filename1 = self._full_path_to_dir + os.sep + file_path + os.sep + "_GLN" + os.sep + "matrixGLN_" + \
-                        self._filename + "_" + chain + "_" + res_beg + "_" + res_end + "_t1" + is_smoothed + ".py"
+                        self._filename + "_" + chain + "_" + res_beg + "_" + res_end + "_t1" + is_smoothed + ".npz"
             filename2 = self._full_path_to_dir + os.sep + file_path + os.sep + "_GLN" + os.sep + "matrixGLN_" + \
-                        self._filename + "_" + chain + "_" + res_beg + "_" + res_end + "_t2" + is_smoothed + ".py"
+                        self._filename + "_" + chain + "_" + res_beg + "_" + res_end + "_t2" + is_smoothed + ".npz"
 
             gln_matrix_1 = mplt.figure.Figure(figsize=(self.gln_figsize, self.gln_figsize), dpi=self.gln_dpi,
                                               facecolor=gui_par('FACECOLOR'))
@@ -2398,26 +2688,16 @@ class PyLassoBase:
             c_terminus_error = textwrap.fill("The GLN matrix has not been generated.The length of the C-terminus "
                                              "is less than 5 amino acids.", 35)
 
-            if n_end < 5:
+            if n_end < 5 or not os.path.exists(filename1):
                 self.draw_gln_empty(ax1, n_terminus_error)
             else:
-                imp.load_source("matrix_1", filename1)
-                import matrix_1
-                try:
-                    matrix_1.draw_gln_matrices(ax1)
-                    is_displayed[0] = True
-                except:
-                    self.draw_gln_empty(ax1, n_terminus_error)
-            if c_end < 5:
+                self.draw_gln_matrix(ax1, filename1)
+                is_displayed[0] = True
+            if c_end < 5 or not os.path.exists(filename2):
                 self.draw_gln_empty(ax2, c_terminus_error)
             else:
-                imp.load_source("matrix_2", filename2)
-                import matrix_2
-                try:
-                    matrix_2.draw_gln_matrices(ax2)
-                    is_displayed[1] = True
-                except:
-                    self.draw_gln_empty(ax2, c_terminus_error)
+                self.draw_gln_matrix(ax2, filename2)
+                is_displayed[1] = True
 
             canvas = FigureCanvasTkAgg(gln_matrix_1, master=self.win_gln_matrices.interior())
             canvas.get_tk_widget().grid(column=0, row=0)
@@ -2444,6 +2724,31 @@ class PyLassoBase:
                 self.win_gln_matrices.grid_forget()
             self.pymol_view_details(self.displayed_lasso)
 
+    def draw_gln_matrix(self, ax, filename):
+        """
+            Draws the GLN matrix saved by gln.save_matrix as a single image: the cell of the fragment a-b (residue
+            indices) covers [a, a + 1) x [b, b + 1), so clicks map to residues by int(). The minimum and the maximum
+            are marked as in the matrices of detect_lassos.
+        """
+        residues, matrix = gln.load_matrix(filename)
+        x_min, x_max = int(residues[0]), int(residues[-1]) + 1
+        ax.imshow(gln.gln_colors(matrix.T), extent=(x_min, x_max, x_max, x_min), interpolation="nearest")
+        ax.set_xlim([x_min, x_max])
+        ax.set_ylim([x_max, x_min])
+        ax.set_xlabel('Residue ID (beginning of a segment)')
+        ax.set_ylabel('Residue ID (end of a segment)')
+
+        size = x_max - x_min
+        minimum, maximum = gln.extremes(matrix)
+        for row, ((a, b), value), name in ((0.09, minimum, "min"), (0.15, maximum, "max")):
+            color = gln.gln_colors(value)
+            ax.add_patch(Circle((residues[a] + 0.5, residues[b] + 0.5), 0.02 * size, facecolor=color, linewidth=.7,
+                                edgecolor="black"))
+            ax.add_patch(Circle((x_min + 0.532 * size, x_min + row * size), 0.02 * size, facecolor=color,
+                                linewidth=.7, edgecolor="black"))
+            ax.text(x_min + 0.57 * size, x_min + (row + 0.01) * size, name + ' GLN = ' + str(round(value * 100) / 100),
+                    style='italic', fontsize=12)
+
     def draw_gln_empty(self, ax, text):
         ax.text(0.15, 0.5, text, fontsize=12)
         ax.get_xaxis().set_visible(False)
@@ -2487,8 +2792,8 @@ class PyLassoBase:
     def create_view_details_buttons(self):
         self.btns_view_details = []
 
-        for idx, elem in enumerate(self.output_data):
-            if len(elem) != 0 and not elem.__contains__("ERROR"):
+        for idx, result in enumerate(self.results):
+            if not result.is_error():
                 self.btns_view_details.append(tk.Button(self.window_parent, text="view details",
                                                         command=lambda x=idx: self.pymol_view_details(x)))
                 self.btns_view_details[-1].grid(column=0, row=1 + idx)
@@ -2598,37 +2903,17 @@ class PyLassoBase:
                 text.tag_config("spacing1", spacing1=0)
             text.configure(state="disabled")
 
-    def itemise_types_of_lasso(self, elem, n_end, c_end):
+    def itemise_types_of_lasso(self, result):
         """
-            Method reads from an element given as an argument n_end lengths and c_end lengths extended on shallow
-            lassos. The values are then put into a list, which structure is equal to
-                        [[[deep_n_end_lengths], [all_n_end_lengths],[[deep_c_end_lengths], [all_c_end_lengths]]
+            Method reads from a result n_end lengths and c_end lengths extended on shallow lassos. The values are then
+            put into a list, which structure is equal to
+                        [[[all_n_end_lengths], [deep_n_end_lengths]],[[all_c_end_lengths], [deep_c_end_lengths]]]
         """
         types_of_lassos = [[], []]
-        if elem[4] != elem[4 + 3 + int(elem[4]) + 1 + int(elem[5]) + 2]:
-            shallow_n_end = []
-            if int(elem[4]) != 0:
-                if len(n_end) == 0:
-                    types_of_lassos[0] = []
-                else:
-                    for j in range((8 + int(elem[4])) + 2 + int(elem[5]) + 4,
-                                   (8 + int(elem[4])) + 2 + int(elem[5]) + 4 + int(elem[4 + 3 + int(elem[4]) + 1
-                                           + int(elem[5]) + 2])):
-                        shallow_n_end.append(elem.__getitem__(j) + ",")
-                    types_of_lassos[0] = [n_end[:-1], shallow_n_end]
-        if elem[5] != elem[5 + 2 + int(elem[4]) + 1 + int(elem[5]) + 3]:
-            if len(c_end) == 0:
-                types_of_lassos[1] = []
-            else:
-                shallow_c_end = []
-                if int(elem[5]) != 0:
-                    for j in range(9 + int(elem[4]) + int(elem[5]) + 5 + int(
-                            elem[9 + int(elem[4]) + int(elem[5]) + 1]) + 1,
-                                   9 + int(elem[4]) + int(elem[5]) + 5 + int(
-                                       elem[9 + int(elem[4]) + int(elem[5]) + 1]) + 1
-                                           + int(elem[9 + int(elem[4]) + int(elem[5]) + 2])):
-                        shallow_c_end.append(elem.__getitem__(j) + ",")
-                    types_of_lassos[1] = [c_end[:-1], shallow_c_end]
+        if result.has_shallow_n:
+            types_of_lassos[0] = [[i + "," for i in result.n_piercings], [i + "," for i in result.n_deep_piercings]]
+        if result.has_shallow_c:
+            types_of_lassos[1] = [[i + "," for i in result.c_piercings], [i + "," for i in result.c_deep_piercings]]
         return types_of_lassos
 
     def mark_crossings_on_sequence(self):
@@ -2756,8 +3041,8 @@ class PyLassoBase:
             cmd.load(self._filename)
 
         atom = "ca"
-        res_beg = self.output_data[chosen_lasso].split(" ")[1]
-        res_end = self.output_data[chosen_lasso].split(" ")[2]
+        res_beg = str(self.results[chosen_lasso].first)
+        res_end = str(self.results[chosen_lasso].last)
         file_ = self._filename.replace(' ', '')[:-4]
 
         if not self.is_trajectory:
@@ -2821,7 +3106,7 @@ class PyLassoBase:
 
         file_path = self._filename.replace(".", "_")
         if self.is_trajectory:
-            frame = self.output_data[chosen_lasso].split(" ")[0].split("_")[-3]
+            frame = self.results[chosen_lasso].name.split("_")[-3]
             if hasattr(self, "given_frames") and len(self.given_frames) != 0:
                 file_with_coord = file_path + os.sep + "frame_" + frame + os.sep + "surface_" + self._filename + "_" + \
                                   chain + "__frame_" + frame + "_" + res_beg + "_" + res_end + ".jms"
@@ -2923,14 +3208,14 @@ class PyLassoBase:
                                   '(e.g. press the button ''view details'') and try again.')
 
         atom = "ca"
-        res_beg = self.output_data[self.displayed_lasso].split(" ")[1]
-        res_end = self.output_data[self.displayed_lasso].split(" ")[2]
+        res_beg = str(self.results[self.displayed_lasso].first)
+        res_end = str(self.results[self.displayed_lasso].last)
 
         if self.is_trajectory:
             chain = self.chains[0]
             atom1 = "residue " + res_beg + " and name " + atom
             atom2 = "residue " + res_end + " and name " + atom
-            frame = self.output_data[self.displayed_lasso].split(" ")[0].split("_")[-3]
+            frame = self.results[self.displayed_lasso].name.split("_")[-3]
 
             if hasattr(self, "given_frames") and len(self.given_frames) != 0:
                 step = int(self.step.getvalue()) if len(self.step.getvalue()) != 0 else 1
@@ -3027,8 +3312,8 @@ class PyLassoBase:
         file_path = self._filename.replace(".", "_")
         is_smoothed = "_smooth" if self.lasinf_smooth_display.get() else ""
 
-        res_beg = self.output_data[self.displayed_lasso].split(" ")[1]
-        res_end = self.output_data[self.displayed_lasso].split(" ")[2]
+        res_beg = str(self.results[self.displayed_lasso].first)
+        res_end = str(self.results[self.displayed_lasso].last)
         filename = self._full_path_to_dir + os.sep + file_path + os.sep + "_surfaces" + os.sep + "surface_" + \
                    self._filename + "_" + chain + "_" + res_beg + "_" + res_end + "_GLN1" + is_smoothed + ".txt"
 
@@ -3048,8 +3333,8 @@ class PyLassoBase:
             self.lasinf_surface_button.select()
 
             atom = "ca"
-            res_beg = self.output_data[self.displayed_lasso].split(" ")[1]
-            res_end = self.output_data[self.displayed_lasso].split(" ")[2]
+            res_beg = str(self.results[self.displayed_lasso].first)
+            res_end = str(self.results[self.displayed_lasso].last)
 
             file_path = self._filename.replace(".", "_")
             if self.is_trajectory:
@@ -3059,7 +3344,7 @@ class PyLassoBase:
                 atom2 = "residue " + res_end + " and name " + atom
                 br_selection = "(SMOOTH_CHAIN_" + chain + " and residue " + res_beg + " and name " + atom \
                                + ")+(SMOOTH_CHAIN_" + chain + " and residue " + res_end + " and name " + atom + ")"
-                frame = self.output_data[self.displayed_lasso].split(" ")[0].split("_")[-3]
+                frame = self.results[self.displayed_lasso].name.split("_")[-3]
 
                 if hasattr(self, "given_frames") and len(self.given_frames) != 0:
                     file_with_smooth_vert = file_path + os.sep + "frame_" + frame + os.sep + self._filename + "_" + \
@@ -3239,7 +3524,6 @@ class PyLassoLinux(PyLassoBase):
         self._file_extension = ""
         self._img_extension = ".png"
         self.program_execution = plugin_path + os.sep + "detect_lassos "
-        self.python_compiler = [self.get_python_exec(), plugin_path + os.sep + 'convert_pdb_2_5columns.py']
         self.img_button_height = 22
         self.img_button_width = 75
         self.view_btn_width = 3
@@ -3250,6 +3534,7 @@ class PyLassoLinux(PyLassoBase):
         self.gln_figsize = 5
         self.gln_dpi = 95
         self.lassos = []
+        self.result_cache = result_cache.default_cache()
         self.hint_width = 60
         # Advanced variables
         self.is_stable = tk.IntVar()
@@ -3261,74 +3546,26 @@ class PyLassoLinux(PyLassoBase):
         self.load_file()
 
 
-    def convert_to_5columns_format(self):
-        self.pdb_bridges = None
-        all_bridges = None
-
-        if self.is_trajectory:
-            all_bridges = subprocess.Popen(self.python_compiler + (self._full_path_to_file + " -f -t").split(" "),
-                                           stdout=subprocess.PIPE).communicate()[0]
-        else:
-            all_bridges = subprocess.Popen(self.python_compiler + [self._full_path_to_file],
-                                           stdout=subprocess.PIPE).communicate()[0].decode('utf-8')
-        all_bridges = all_bridges.splitlines()
-        if self.is_trajectory:
-            self.pdb_bridges = all_bridges
-        else:
-            chain = self.chain_index.get()
-            file_with_bridge = (self._full_path_to_file + "_" + chain)
-
-            all_bridges = list(filter(len, all_bridges))
-            self.pdb_bridges = [i for i in all_bridges if i.__contains__(file_with_bridge) or
-                                                i.__contains__("WARNING")]
-
     ####################################################################################################################
     #                                               EXECUTE PROGRAM 2/2
     ####################################################################################################################
 
 
-    def call_lasso_detection(self):
+    def call_lasso_detection(self, progress=None, cancellation=None):
         self.output_data = []
         try:
-            for i in self.user_data:
-                process = subprocess.Popen(i.split(" "), cwd=self._full_path_to_dir, stdout=subprocess.PIPE).communicate()[0]
-                self.output_data.append(process.decode('utf-8'))
+            self.output_data = lasso_pipeline.run_commands(self.user_data, cwd=self._full_path_to_dir,
+                                                           cache=self.result_cache, cancellation=cancellation,
+                                                           progress=progress)
             self.output_data = list(filter(len, self.output_data))
+        except lasso_pipeline.Cancelled:
+            raise
         except Exception:
             print("Something went wrong with executable file. Please make sure you changed access permission to " \
                   "it (can be obtained by typing in console chmod a+x detect_lassos).")
+        self.results = [lasso_pipeline.parse_result(i) for i in self.output_data]
         print("  Data passed to program and executed...")
 
-    def call_gln_generator(self):
-        #TODO - this script doesn't work at all - by Pawel Rubach
-        return
-        # iterate_list = self.user_data
-        # chain = self.chain_index.get()
-        #
-        # for i in iterate_list:
-        #     command = i.split(" ")
-        #     res = [command[2], command[3]]
-        #     matrix1 = self.python_compiler[0] + " matrixGLNtoPNG.py matrixGLN_" + self._filename + "_" + chain + "_" + \
-        #               res[0] + "_" + res[1] + "_t1"
-        #     matrix2 = self.python_compiler[0] + " matrixGLNtoPNG.py matrixGLN_" + self._filename + "_" + chain + \
-        #               "_" + res[0] + "_" + res[1] + "_t2"
-        #     subprocess.Popen(matrix1.split(" "), stdout=subprocess.PIPE).communicate()[0]
-        #     subprocess.Popen(matrix2.split(" "), stdout=subprocess.PIPE).communicate()[0]
-
-    def separate_smooth_crossings_from_output(self):
-        self.smooth_crossings = []
-
-        for i in self.output_data:
-            elem = i.split("\n")
-            elem = list(filter(len, elem))
-            smooth_cross = elem[-1]
-            if smooth_cross.__contains__("ERROR"):
-                self.smooth_crossings.append([])
-            else:
-                n_cross = self.get_n_crossings(smooth_cross.split(" "))
-                c_cross = self.get_c_crossings(smooth_cross.split(" "))
-                self.smooth_crossings.append((n_cross + c_cross).split(" "))
-
     def get_greatest_gap(self):
         chain = self.chain_index.get()
         max = 0
@@ -3337,34 +3574,19 @@ class PyLassoLinux(PyLassoBase):
                 max = int(int(i[2]) - int(i[1]))
         return str(max)
 
-    def call_program_for_artifacts(self):
+    def call_program_for_artifacts(self, progress=None, cancellation=None):
         self.output_data = []
-        self.is_artifact = True
-        self.stable_lasso.deselect()
-        self.enable_parametrization_of_algorithm()
-        self.user_data = self.generate_invoking_commands()
-
-        for i in self.user_data:
-            self.output_data.append(subprocess.Popen(i.split(" "), stdout=subprocess.PIPE).communicate()[0].decode('utf-8'))
+        self.output_data = lasso_pipeline.run_commands(self.user_data, cache=self.result_cache,
+                                                       cancellation=cancellation, progress=progress)
         self.output_data = list(filter(len, self.output_data))
+        self.results = [lasso_pipeline.parse_result(i) for i in self.output_data]
+        self.separate_smooth_crossings_from_output()
         print("  Modified data passed to program again and executed...")
 
     ####################################################################################################################
     #                                     FILL TRAJECTORY WINDOW WITH DATA
     ####################################################################################################################
 
-    def calculate_lasso_in_trajectory(self):
-        subprocess.Popen(self.python_compiler + [self._full_path_to_file],
-                         stdout=subprocess.PIPE).communicate()[0].splitlines()
-
-        self.update_trajectory_name("lasso")
-        tmp_filename = self._filename + "_" + self.chains[0] + "_lasso.xyz"
-        self.user_data = [self.program_execution + self._full_path_to_dir + os.sep + tmp_filename + " " +
-                          self.trajectory_chain_loop_indexes[0] + " " + self.trajectory_chain_loop_indexes[1] +
-                          " " + self.get_trajectory_advanced()]
-        self.call_lasso_detection()
-        self.move_files_to_polymer_directory()
-
     def update_trajectory_name(self, name):
         for f in os.listdir(self._full_path_to_dir):
             if f.__contains__(self._filename) and f != self._filename \
@@ -3411,8 +3633,6 @@ class PyLassoLinux(PyLassoBase):
         ax.set_xlabel('Frame')
         ax.set_ylabel('Lasso type')
 
-        xticks_divider = 140.0 if not self.is_pymol_2 else 100.0
-        xticks_dist = int(ceil(len(self.retrieved_frames) / xticks_divider))
         self.lasso_info_tuple = {}
         x_min = float(self.retrieved_frames[0])
         x_max = float(self.retrieved_frames[-1])
@@ -3442,25 +3662,13 @@ class PyLassoLinux(PyLassoBase):
             ax.set_ylim([-1, len(set(self.retrieved_trajectory_lassos))])
 
         # draw chart, where x - frames and y - types of lasso
-        for idx in range(0, len(self.retrieved_frames[:-1]), xticks_dist):
-            if not self.retrieved_trajectory_lassos[idx] == "ERR" and idx < len(self.retrieved_frames[:-1]):
-                try:
-                    color = self.lasso_info_tuple[self.retrieved_trajectory_lassos[idx]][1]
-                    ax.plot(self.retrieved_frames[idx], self.lasso_info_tuple[self.retrieved_trajectory_lassos[idx]][0],
-                            marker="o", c=color, picker=3)
-                except KeyError:
-                    color = self.lasso_info_tuple['Other'][1]
-                    ax.plot(self.retrieved_frames[idx], self.lasso_info_tuple['Other'][0], marker="o", c=color,
-                            picker=3)
-            else:
-                color = self.lasso_info_tuple['ERR'][1]
-                ax.plot(self.retrieved_frames[idx], self.lasso_info_tuple['ERR'][0], marker="o", c=color, picker=3)
+        self.scatter_lassos_types(ax)
 
         canvas = FigureCanvasTkAgg(chart_lassos_type, master=self.win_lasso_type.interior())
         canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=1)
         canvas._tkcanvas.pack(side=tk.TOP, fill=tk.BOTH, expand=1)
         canvas.draw()
-        self.create_annotations(ax.lines)
+        self.create_annotations(ax.collections)
         canvas.mpl_connect('pick_event', self.display_frame_in_pymol_on_pick)
 
 #########
@@ -3473,8 +3681,6 @@ class PyLassoLinux(PyLassoBase):
         ax.set_xlabel('Frame')
         ax.set_ylabel('Atom index')
 
-        xticks_divider = 140.0 if not self.is_pymol_2 else 100.0
-        xticks_dist = int(ceil(len(self.retrieved_frames) / xticks_divider))
         y_max = int(float(self.trajectory_chain_range[0]))
         y_min = int(float(self.trajectory_chain_range[-1]))
         ax.tick_params(axis='both', labelsize=9)
@@ -3482,18 +3688,7 @@ class PyLassoLinux(PyLassoBase):
             tick.set_rotation(50)
 
         # draw chart, where x - frames and y - atom crossing
-        zipped_frames_crossings = list(zip(self.retrieved_frames, self.retrieved_trajectory_crossings))
-        rect_width = 0
-        for idx in range(0, len(self.retrieved_frames[:-1]), xticks_dist):
-            if not zipped_frames_crossings[idx][1].__contains__("|") or zipped_frames_crossings[idx][1] != "|":
-                if not zipped_frames_crossings[idx][1].__contains__("ERR"):
-                    for i in range(len(zipped_frames_crossings[idx][1])):
-                        color = "#008000" if zipped_frames_crossings[idx][1][i][0] == "+" else "#0000FF"
-                        ax.plot(self.retrieved_frames[idx], float(zipped_frames_crossings[idx][1][i][1:]), marker="o",
-                                c=color)
-            elif self.is_pymol_2:
-                ax.plot(self.retrieved_frames[idx], 0, marker="o", c="white", markeredgewidth=0.0)
-            rect_width += 1
+        self.scatter_piercings(ax)
 
         if not self.is_pymol_2:
             x_min = float(self.retrieved_frames[0])
@@ -3506,16 +3701,18 @@ class PyLassoLinux(PyLassoBase):
             ax.add_patch(
                 Rectangle((x_min - 1, rect_x), x_max - x_min + 2, rect_y - rect_x, facecolor="orange", linewidth=0))
         else:
-            x_min = int(float(self.retrieved_frames[0]))
+            x_min = float(self.retrieved_frames[0])
+            x_max = float(self.retrieved_frames[-1])
             # draw orange rectangle
             rect_x = int(self.trajectory_chain_loop_indexes[0])
             rect_y = int(self.trajectory_chain_loop_indexes[-1])
-            ax.add_patch(Rectangle((x_min, rect_x), rect_width, rect_y - rect_x, facecolor="orange", linewidth=0))
+            ax.add_patch(Rectangle((x_min, rect_x), x_max - x_min, rect_y - rect_x, facecolor="orange", linewidth=0))
 
         canvas = FigureCanvasTkAgg(chart_atoms_piercing, master=self.win_atoms_piercing_lasso.interior())
         canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=1)
         canvas._tkcanvas.pack(side=tk.TOP, fill=tk.BOTH, expand=1)
         canvas.draw()
+        canvas.mpl_connect('pick_event', self.display_frame_in_pymol_on_pick)
 
 
 class PyLassoWindows(PyLassoBase):
@@ -3543,7 +3740,6 @@ class PyLassoWindows(PyLassoBase):
         self._file_extension = ""
         self._img_extension = ".gif"
         self.program_execution = plugin_path + os.sep + "detect_lassos.exe "
-        self.python_compiler = 'pythonw.exe ' + plugin_path + os.sep + 'convert_pdb_2_5columns.py'
         self.img_button_height = 16
         self.img_button_width = 60
         self.view_btn_width = 5
@@ -3555,6 +3751,7 @@ class PyLassoWindows(PyLassoBase):
         self.gln_dpi = 70
         self.hull_width = 880
         self.lassos = []
+        self.result_cache = result_cache.default_cache()
         self.hint_width = 60
         # Advanced variables
         self.is_stable = tk.IntVar()
@@ -3565,77 +3762,21 @@ class PyLassoWindows(PyLassoBase):
 
         self.load_file()
 
-    def get_python_exec(self):
-        if sys.version_info.major == 3:
-            res = os.popen(["python3", "--version"], stdout=subprocess.PIPE).read()
-            if res and res[0].find("Python 3") >= 0:
-                return "python3"
-            else:
-                "python"
-        else:
-            "python"
-
-    def convert_to_5columns_format(self):
-        self.pdb_bridges = None
-        all_bridges = None
-
-        if self.is_trajectory:
-            all_bridges = os.popen(self.python_compiler + " " + self._full_path_to_file + " -f -t").read()
-        else:
-            all_bridges = os.popen(self.python_compiler + " " + self._full_path_to_file).read().splitlines()
-        if self.is_trajectory:
-            self.pdb_bridges = all_bridges
-        else:
-            chain = self.chain_index.get()
-            file_with_bridge = (self._full_path_to_file + "_" + chain)
-
-            all_bridges = list(filter(len, all_bridges))
-            self.pdb_bridges = [i for i in all_bridges if i.__contains__(file_with_bridge) or
-                                i.__contains__("WARNING")]
-
-
-    def call_lasso_detection(self):
+    def call_lasso_detection(self, progress=None, cancellation=None):
         self.output_data = []
         try:
-            for i in self.user_data:
-                process = subprocess.Popen(i.split(" "), cwd=self._full_path_to_dir, stdout=subprocess.PIPE).communicate()[0]
-                self.output_data.append(process.decode('utf-8'))
+            self.output_data = lasso_pipeline.run_commands(self.user_data, cwd=self._full_path_to_dir,
+                                                           cache=self.result_cache, cancellation=cancellation,
+                                                           progress=progress)
             self.output_data = list(filter(len, self.output_data))
+        except lasso_pipeline.Cancelled:
+            raise
         except Exception:
             print("Something went wrong with executable file. Please make sure you changed access permission to " \
                   "it (can be obtained by typing in console chmod a+x detect_lassos).")
+        self.results = [lasso_pipeline.parse_result(i) for i in self.output_data]
         print("  Data passed to program and executed...")
 
-    def call_gln_generator(self):
-        # TODO - this script doesn't work at all - by Pawel Rubach
-        return
-        # iterate_list = self.user_data
-        # chain = self.chain_index.get()
-        #
-        # for i in iterate_list:
-        #     command = i.split(" ")
-        #     res = [command[2], command[3]]
-        #     matrix1 = self.python_compiler[0] + " matrixGLNtoPNG.py matrixGLN_" + self._filename + "_" + chain + "_" + \
-        #               res[0] + "_" + res[1] + "_t1"
-        #     matrix2 = self.python_compiler[0] + " matrixGLNtoPNG_V2.py matrixGLN_" + self._filename + "_" + chain + \
-        #               "_" + res[0] + "_" + res[1] + "_t2"
-        #     os.popen(matrix1)
-        #     os.popen(matrix2)
-
-    def separate_smooth_crossings_from_output(self):
-        self.smooth_crossings = []
-
-        for i in self.output_data:
-            elem = i.split("\r\n")
-            elem = list(filter(len, elem))
-            smooth_cross = elem[-1]
-            if smooth_cross.__contains__("ERROR"):
-                self.smooth_crossings.append([])
-            else:
-                n_cross = self.get_n_crossings(smooth_cross.split(" "))
-                c_cross = self.get_c_crossings(smooth_cross.split(" "))
-                self.smooth_crossings.append((n_cross + c_cross).split(" "))
-
     def get_greatest_gap(self):
         chain = self.chain_index.get()
         max = 0
@@ -3644,33 +3785,19 @@ class PyLassoWindows(PyLassoBase):
                 max = int(int(i[2]) - int(i[1]))
         return str(max)
 
-    def call_program_for_artifacts(self):
+    def call_program_for_artifacts(self, progress=None, cancellation=None):
         self.output_data = []
-        self.is_artifact = True
-        self.stable_lasso.deselect()
-        self.enable_parametrization_of_algorithm()
-        self.user_data = self.generate_invoking_commands()
-
-        for i in self.user_data:
-            self.output_data.append(os.popen(i).read())
+        self.output_data = lasso_pipeline.run_commands(self.user_data, cache=self.result_cache,
+                                                       cancellation=cancellation, progress=progress)
         self.output_data = list(filter(len, self.output_data))
+        self.results = [lasso_pipeline.parse_result(i) for i in self.output_data]
+        self.separate_smooth_crossings_from_output()
         print("  Modified data passed to program again and executed...")
 
     ####################################################################################################################
     #                                     FILL TRAJECTORY WINDOW WITH DATA
     ####################################################################################################################
 
-    def calculate_lasso_in_trajectory(self):
-        os.popen(self.python_compiler + " " + self._full_path_to_file)
-
-        self.update_trajectory_name("lasso")
-        tmp_filename = self._filename + "_" + self.chains[0] + "_lasso.xyz"
-        self.user_data = [self.program_execution + self._full_path_to_dir + os.sep + tmp_filename + " " +
-                          self.trajectory_chain_loop_indexes[0] + " " + self.trajectory_chain_loop_indexes[1] +
-                          " " + self.get_trajectory_advanced()]
-        self.call_lasso_detection()
-        self.move_files_to_polymer_directory()
-
     def update_trajectory_name(self, name):
         for f in os.listdir(self._full_path_to_dir):
             if f.__contains__(self._filename) and f != self._filename \
@@ -3717,8 +3844,6 @@ class PyLassoWindows(PyLassoBase):
         ax.set_xlabel('Frame')
         ax.set_ylabel('Lasso type')
 
-        xticks_divider = 140.0 if not self.is_pymol_2 else 100.0
-        xticks_dist = int(ceil(len(self.retrieved_frames) / xticks_divider))
         self.lasso_info_tuple = {}
         x_min = float(self.retrieved_frames[0])
         x_max = float(self.retrieved_frames[-1])
@@ -3748,25 +3873,13 @@ class PyLassoWindows(PyLassoBase):
         ax.set_yticklabels(y_values)
 
         # draw chart, where x - frames and y - types of lasso
-        for idx in range(0, len(self.retrieved_frames[:-1]), xticks_dist):
-            if not self.retrieved_trajectory_lassos[idx] == "ERR" and idx < len(self.retrieved_frames[:-1]):
-                try:
-                    color = self.lasso_info_tuple[self.retrieved_trajectory_lassos[idx]][1]
-                    ax.plot(self.retrieved_frames[idx], self.lasso_info_tuple[self.retrieved_trajectory_lassos[idx]][0],
-                            marker="o", c=color, picker=3)
-                except KeyError:
-                    color = self.lasso_info_tuple['Other'][1]
-                    ax.plot(self.retrieved_frames[idx], self.lasso_info_tuple['Other'][0], marker="o", c=color,
-                            picker=3)
-            else:
-                color = self.lasso_info_tuple['ERR'][1]
-                ax.plot(self.retrieved_frames[idx], self.lasso_info_tuple['ERR'][0], marker="o", c=color, picker=3)
+        self.scatter_lassos_types(ax)
 
         canvas = FigureCanvasTkAgg(chart_lassos_type, master=self.win_lasso_type.interior())
         canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=1)
         canvas._tkcanvas.pack(side=tk.TOP, fill=tk.BOTH, expand=1)
         canvas.draw()
-        self.create_annotations(ax.lines)
+        self.create_annotations(ax.collections)
         canvas.mpl_connect('pick_event', self.display_frame_in_pymol_on_pick)
 
 ###########
@@ -3778,8 +3891,6 @@ class PyLassoWindows(PyLassoBase):
         ax.set_xlabel('Frame')
         ax.set_ylabel('Atom index')
 
-        xticks_divider = 140.0 if not self.is_pymol_2 else 100.0
-        xticks_dist = int(ceil(len(self.retrieved_frames) / xticks_divider))
         y_min = int(float(self.trajectory_chain_range[0]))
         y_max = int(float(self.trajectory_chain_range[-1]))
 
@@ -3789,18 +3900,7 @@ class PyLassoWindows(PyLassoBase):
             tick.set_rotation(50)
 
         # draw chart, where x - frames and y - atom crossing
-        zipped_frames_crossings = list(zip(self.retrieved_frames, self.retrieved_trajectory_crossings))
-        rect_width = 0
-        for idx in range(0, len(self.retrieved_frames[:-1]), xticks_dist):
-            if not zipped_frames_crossings[idx][1].__contains__("|") or zipped_frames_crossings[idx][1] != "|":
-                if not zipped_frames_crossings[idx][1].__contains__("ERR"):
-                    for i in range(len(zipped_frames_crossings[idx][1])):
-                        color = "#008000" if zipped_frames_crossings[idx][1][i][0] == "+" else "#0000FF"
-                        ax.plot(self.retrieved_frames[idx], int(zipped_frames_crossings[idx][1][i][1:]), marker="o",
-                                c=color)
-            elif self.is_pymol_2:
-                ax.plot(self.retrieved_frames[idx], 0, marker="o", c="white", markeredgewidth=0.0)
-            rect_width += 1
+        self.scatter_piercings(ax)
 
         if not self.is_pymol_2:
             x_min = float(self.retrieved_frames[0])
@@ -3812,16 +3912,18 @@ class PyLassoWindows(PyLassoBase):
             rect_y = int(self.trajectory_chain_loop_indexes[-1])
             ax.add_patch(Rectangle((x_min - 1, rect_x), x_max - x_min+2, rect_y - rect_x, facecolor="orange", linewidth=0))
         else:
-            x_min = int(float(self.retrieved_frames[0]))
+            x_min = float(self.retrieved_frames[0])
+            x_max = float(self.retrieved_frames[-1])
             # draw orange rectangle
             rect_x = int(self.trajectory_chain_loop_indexes[0])
             rect_y = int(self.trajectory_chain_loop_indexes[-1])
-            ax.add_patch(Rectangle((x_min, rect_x), rect_width, rect_y - rect_x, facecolor="orange", linewidth=0))
+            ax.add_patch(Rectangle((x_min, rect_x), x_max - x_min, rect_y - rect_x, facecolor="orange", linewidth=0))
 
         canvas = FigureCanvasTkAgg(chart_atoms_piercing, master=self.win_atoms_piercing_lasso.interior())
         canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=1)
         canvas._tkcanvas.pack(side=tk.TOP, fill=tk.BOTH, expand=1)
         canvas.draw()
+        canvas.mpl_connect('pick_event', self.display_frame_in_pymol_on_pick)
 
 
 
@@ -3851,7 +3953,6 @@ class PyLassoDarwin(PyLassoLinux):
             self._file_extension = ""
             self._img_extension = ".gif"
             self.program_execution = plugin_path + os.sep + "detect_lassos "
-            self.python_compiler = [plugin_path + os.sep + 'convert_pdb_2_5columns.py']
             self.img_button_height = 22
             self.img_button_width = 75
             self.view_btn_width = 3
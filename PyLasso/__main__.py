@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+# PyLasso: batch lasso detection without PyMOL and the graphic interface, e.g.
+#   python -m PyLasso -sm 5 structures/*.pdb > lassos.tsv
+# ----------------------------------------------------------------------
+import argparse
+import glob
+import os
+import platform
+import sys
+
+from PyLasso import plugin_path
+import convert_pdb_2_5columns
+import gln
+import lasso_pipeline
+import matrixGLNtoPNG
+import result_cache
+
+
+def get_arguments():
+    parser = argparse.ArgumentParser(prog="python -m PyLasso",
+                                     description="Detects lassos in PDB structures without PyMOL. The resulting files "
+                                                 "are moved to a directory next to every structure and a summary "
+                                                 "(one loop per line) is printed to the standard output.")
+    parser.add_argument('structures', nargs="+", help="PDB files or glob patterns")
+    parser.add_argument('-c', '--chain', action="append", dest="chains", default=None,
+                        help="chain to analyse (may be repeated, all chains by default)")
+    parser.add_argument('-m', '--mode', choices=["automatic", "type", "loops", "contacts"], default="automatic",
+                        help="closing of loops: all bridges found in the file (automatic), bridges of the type given "
+                             "by --bridge-type, loops given by --loop or all pairs of residues whose CA atoms are "
+                             "3.1-10 A apart (contacts, no surfaces and pictures are written)")
+    parser.add_argument('-b', '--bridge-type', dest="bridge_type", default="SS",
+                        choices=["SS", "Amide", "Ester", "Thioester", "Other"], help="bridge type for the type mode")
+    parser.add_argument('-l', '--loop', nargs=2, action="append", dest="loops", default=[], metavar=("I", "J"),
+                        help="residues closing a loop for the loops mode (may be repeated)")
+    parser.add_argument('--bridge-cutoff', type=float, default=None, dest="bridge_cutoff",
+                        help="for files without SSBOND and LINK records, where bridges are proposed from the geometry "
+                             "(disulfides between close cysteines), take also all residues with CA atoms closer than "
+                             "this distance as bridges")
+    parser.add_argument('--min-loop', type=int, default=lasso_pipeline.MIN_CONTACT_LOOP, dest="min_loop",
+                        help="shortest loop scanned in the contacts mode")
+    parser.add_argument('-sm', '--smooth', default="", help="number of smoothing iterations")
+    parser.add_argument('--stable', action="store_true", default=False,
+                        help="keep the stable lassos only (no -redAC, -redEnd and -redBr)")
+    parser.add_argument('-redAC', default="10", help="minimal distance between crossings")
+    parser.add_argument('-redEnd', default="3", help="minimal distance between a crossing and the end of the chain")
+    parser.add_argument('-redBr', default="3", help="minimal distance between a crossing and the bridge")
+    parser.add_argument('-cd', action="store_true", default=False,
+                        help="ignore an inappropriate length of a bridge and Ca-Ca bond")
+    parser.add_argument('--gln', action="store_true", default=False, help="generate GLN matrices")
+    parser.add_argument('--gln-png', action="store_true", default=False, dest="gln_png",
+                        help="render the GLN matrices (with --gln) into PNG pictures after all structures")
+    parser.add_argument('--cache', action="store_true", default=False,
+                        help="take the results computed before from the cache in ~/.pylasso/cache (PYLASSO_CACHE, "
+                             "bounded by PYLASSO_CACHE_SIZE megabytes) and store the new ones")
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help="number of detect_lassos processes run at the same time (number of CPUs by default)")
+    parser.add_argument('-e', '--engine', choices=["binary", "numpy"], default=lasso_pipeline.default_engine(),
+                        help="detect_lassos program (binary, the default) or the experimental Python engine running "
+                             "in this process (numpy), not yet validated against detect_lassos")
+    parser.add_argument('--program', default=os.path.join(plugin_path, "detect_lassos" +
+                                                          (".exe" if platform.system() == 'Windows' else "")),
+                        help="path to the detect_lassos program")
+    return parser.parse_args()
+
+
+def get_structures(patterns):
+    structures = []
+    for pattern in patterns:
+        found = sorted(glob.glob(pattern)) or [pattern]
+        structures += [os.path.abspath(i) for i in found if os.path.abspath(i) not in structures]
+    return structures
+
+
+def get_loops(args, chain_data, xyz_file):
+    """
+        Returns the loops of the chain as (bridge type, first residue, last residue).
+    """
+    if args.mode == "loops":
+        return [("-", i[0], i[1]) for i in args.loops]
+    if args.mode == "contacts":
+        return [("contact", i[0], i[1]) for i in lasso_pipeline.contact_loops(xyz_file, args.min_loop)]
+    loops, found = lasso_pipeline.bridge_loops(chain_data.get_bridges(),
+                                               args.bridge_type if args.mode == "type" else None)
+    if not found:
+        print("  " + args.bridge_type + " bridge was not found. Further calculations were conducted automatically.",
+              file=sys.stderr)
+    return loops
+
+
+def detect_lassos(path, args):
+    """
+        Yields (chain, loop, summary) for every loop of the structure as soon as its result is ready.
+    """
+    directory = os.path.dirname(path)
+    reductions = None if args.stable else (args.redAC, args.redEnd, args.redBr)
+    options = lasso_pipeline.detection_options(args.gln, args.smooth, args.cd, reductions, args.mode != "contacts")
+
+    chains, chain_data = convert_pdb_2_5columns.convert_pdb(
+        path, find_bridges=not convert_pdb_2_5columns.contains_bridge_records(path), cutoff=args.bridge_cutoff)
+    for chain in chains:
+        if args.chains and chain not in args.chains:
+            continue
+        xyz_file = path + "_" + chain + ".xyz"
+        loops = get_loops(args, chain_data[chain], xyz_file)
+        commands = lasso_pipeline.loop_commands(args.program + " ", xyz_file, [(i[1], i[2]) for i in loops])
+        outputs = lasso_pipeline.iter_commands([i + options for i in commands], cwd=directory, workers=args.workers,
+                                               engine=args.engine, cache=args.cache)
+        for loop, output in zip(loops, outputs):
+            result = lasso_pipeline.parse_result(output)
+            if args.gln and not result.is_error():
+                gln.generate_gln(xyz_file, result.first, result.last, directory,
+                                 int(args.smooth) if args.smooth.isdigit() else 0, args.cache)
+            yield chain, loop, lasso_pipeline.result_summary(result)
+
+    if os.path.exists(os.path.join(directory, "niewaznypliczek.txt")):
+        os.remove(os.path.join(directory, "niewaznypliczek.txt"))
+    lasso_pipeline.move_results(path, args.gln)
+
+
+def main():
+    args = get_arguments()
+    if args.mode == "loops" and len(args.loops) == 0:
+        sys.exit("At least one loop must be given with --loop in the loops mode.")
+    if args.engine == "binary" and not os.path.exists(args.program):
+        sys.exit("The detect_lassos program was not found: " + args.program)
+
+    if args.engine == "numpy":
+        print("  The numpy engine is experimental: surfaces and borderline piercings may differ from detect_lassos.",
+              file=sys.stderr)
+    args.cache = result_cache.default_cache() if args.cache else None
+    print("\t".join(["file", "chain", "bridge", "first", "last", "lasso", "N_piercings", "C_piercings", "area"]))
+    failed = 0
+    gln_directories = []
+    for path in get_structures(args.structures):
+        try:
+            for chain, loop, summary in detect_lassos(path, args):
+                print("\t".join([os.path.basename(path), chain, loop[0], str(loop[1]), str(loop[2])] + summary))
+                sys.stdout.flush()
+        except Exception as e:
+            print("  ### " + path + ": " + str(e), file=sys.stderr)
+            failed += 1
+        gln_directories.append(os.path.join(os.path.dirname(path), os.path.basename(path).replace(".", "_"), "_GLN"))
+
+    if args.gln and args.gln_png:
+        _, errors = matrixGLNtoPNG.render_matrices([i for i in gln_directories if os.path.isdir(i)], args.workers)
+        for error in errors:
+            print("  ### " + error, file=sys.stderr)
+        failed += len(errors)
+    if args.cache is not None:
+        args.cache.evict()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
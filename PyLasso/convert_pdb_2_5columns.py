@@ -2,141 +2,513 @@
 import sys
 import numpy as np
 import argparse
+import hashlib
+import itertools
+import json
 import re
-from os import rename, remove
+import struct
+from os import rename, remove, replace, linesep, utime
+from os.path import abspath, basename, dirname, exists, getmtime, getsize, join
 from shutil import copyfile
 
 date = "05.06.2017"
-parser = argparse.ArgumentParser(prog="convert_columns", formatter_class=argparse.RawDescriptionHelpFormatter,
-                                 description="#################################################################\n\
-#	convert_column - script converting PDB to XYZ files.	#\n\
-#	Date: 02.10.2015, version from " + date + "		#\n\
-#       Author: Pawel Dabrowski-Tumanski			#\n\
-#	p.dabrowski [at] cent.uw.edu.pl				#\n\
-#	version 2.1						#\n\
-#################################################################")
-parser.add_argument('input_file', action="store", help="The input PDB file")
-parser.add_argument('-t', '--trajectory', action="store_true", dest="traj", default=False,
-                    help="Declare, that the input file is a trajectory")
-parser.add_argument('-f', '--fourcolumn', action="store_true", dest="fourcolumn", default=False,
-                    help="Print XYZ output in 4-column format (default 5-column)")
-parser.add_argument('-r', action="store_true", dest="romek", default=False,
-                    help=argparse.SUPPRESS)
-parser.add_argument('--version', action='version', version='%(prog)s 2.1')
-
-args = parser.parse_args()
 
-global find_index, amino_acids
+global amino_acids
 
 ################################ Possible amino acids ################################
 amino_acids = ['ALA', 'ARG', 'ASN', 'ASP', 'CYS', 'GLU', 'GLN', 'GLY', 'HIS', 'ILE', 'LEU', 'LYS', 'MET', 'PHE', 'PRO',
                'SER', 'THR', 'TRP', 'TYR', 'VAL', 'BTC', 'FCY', 'GGL']
 
+################################ Bridges found from geometry ################################
+SS_MAX_DIST = 2.5  # SG-SG distance of a disulfide bond (2.05 A) with a margin for models
+SS_CA_DIST = (4.4, 6.8)  # CA-CA distance of disulfide bonded cysteines, for chains with CA atoms only
+TRAJ_CHECKPOINT = "_traj.ckpt"  # suffix of the checkpoint written by parse_traj next to its outputs
+
 
 ################################ Functions ################################
-def find_index(number, arr):
-    for k in range(len(arr)):
-        if (arr[k][0] == number):
-            return k
+time_pattern = re.compile("t=[ ]*([0-9]+\.[0-9]+|[0-9]+)")
+model_pattern = re.compile("[0-9]+\.[0-9]+|[0-9]+")
+
 
+def contact_pairs(xyz, min_length, min_dist, max_dist):
+    """
+        Positions (i, j), i < j, of all atom pairs at a distance between min_dist and max_dist that close loops of
+        at least min_length atoms, ordered by i and j. Atoms are put into cubic cells of the size max_dist, so only
+        atoms of neighbouring cells are compared.
+    """
+    cells = np.floor((xyz - xyz.min(axis=0)) / max_dist).astype(int) + 1  # a margin of empty cells around
+    shape = cells.max(axis=0) + 2
+    keys = np.ravel_multi_index(cells.T, shape)
+    order = np.argsort(keys, kind="stable")
+    keys = keys[order]
 
-def parse_traj(name, out, four):
-    f = open(name, 'r')
+    first, second = [], []
+    for offset in itertools.product((-1, 0, 1), repeat=3):
+        neighbours = np.ravel_multi_index((cells + offset).T, shape)
+        begin = np.searchsorted(keys, neighbours, "left")
+        counts = np.searchsorted(keys, neighbours, "right") - begin
+        i = np.repeat(np.arange(len(xyz)), counts)
+        j = order[np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(begin, counts)]
+        long_enough = j - i + 1 >= min_length
+        first.append(i[long_enough])
+        second.append(j[long_enough])
+    i, j = np.concatenate(first), np.concatenate(second)
+    dist = np.linalg.norm(xyz[j] - xyz[i], axis=1)
+    close = (dist >= min_dist) & (dist <= max_dist)
+    i, j = i[close], j[close]
+    order = np.lexsort((j, i))
+    return i[order], j[order]
+
+
+def iter_traj_frames(name, offset=0):
+    """
+        Reads the trajectory one frame at a time, from the byte offset of a frame (0 - the beginning). Yields the time
+        of the frame, its blocks - one per TER-separated part of the frame - as (slot, chains, rows) tuples, where
+        slot is the number of TER records preceding the block in the frame, chains lists the chain identifiers of the
+        block and rows are (index, x, y, z, residue) tuples of its CA atoms - and the byte offset of the record giving
+        the time of the frame, from which the reading can be resumed (None for frames without such a record). A last
+        line without a newline is not read.
+    """
     got_chain = 0
-    nextchain = 0
-    new_chain = 1
     art_time = 0
     new_model = 0
     time_changed = 0
     oldtime = 0
     time = 'unset'
-    chains = []
-    names = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnoprstuvwxyz"
-    output = open(out + '_' + str(nextchain) + '.xyz', 'w')
-
-    for line in f:
-        if ((line[0:6] == "TITLE ") or (line[0:6] == "REMARK")) and len(
-                re.findall("t=[ ]*([0-9]+\.[0-9]+|[0-9]+)", line)) > 0 and got_chain == 0:
-            if not output.closed:
-                output.close()
-            nextchain = 0
-            output = open(out + '_' + str(nextchain) + '.xyz', 'a')
-            if re.findall("(t=[ ]*[0-9]+\.[0-9]+)|(t=[ ]*[0-9]+)", line)[0][0] != '':
-                time = re.findall("(t=[ ]*[0-9]+\.[0-9]+)|(t=[ ]*[0-9]+)", line)[0][0][2:].strip()
-                time = "{0:.5f}".format(float(time))
-            else:
-                time = re.findall("(t=[ ]*[0-9]+\.[0-9]+)|(t=[ ]*[0-9]+)", line)[0][1][2:].strip()
-                time = "{0:.5f}".format(float(time))
-            got_chain = 1
-            new_chain = 1
-        if (line[0:6] == "MODEL ") and got_chain == 0:
-            if not output.closed: output.close()
-            nextchain = 0
-            output = open(out + '_' + str(nextchain) + '.xyz', 'a')
-            if re.findall("([0-9]+\.[0-9]+)|([0-9]+)", line)[0][0] != '':
-                time = re.findall("([0-9]+\.[0-9]+)|([0-9]+)", line)[0][0]
-                time = "{0:.5f}".format(float(time))
-            else:
-                time = re.findall("([0-9]+\.[0-9]+)|([0-9]+)", line)[0][1]
-                time = "{0:.5f}".format(float(time))
-            got_chain = 1
-            new_chain = 1
-            new_model = 1
-        if (line[0:6] == "TER   "):
-            output.close()
-            new_chain = 1
-            nextchain = nextchain + 1
-            output = open(out + '_' + str(nextchain) + '.xyz', 'a')
-        if ((line[0:6] == "ATOM  ") or (line[0:6] == "HETATM")) and (line[12:16].strip() == "CA"):
+    frame_time = None
+    seen = set()  # chains of the current frame, used when the trajectory has no time records
+    slot = 0
+    blocks = [(slot, [], [])]
+    start = None
+    position = offset
+
+    input_file = open(name, 'rb')
+    input_file.seek(offset)
+    for raw_line in input_file:
+        if not raw_line.endswith(b"\n"):
+            break  # the trajectory is still being written, the line is read at the next conversion
+        line = raw_line.decode('latin-1')
+        line_start, position = position, position + len(raw_line)
+        record = line[0:6]
+        if ((record == "ATOM  ") or (record == "HETATM")) and (line[12:16].strip() == "CA"):
+            chain = line[21]
             if time == 'unset':
                 art_time = 1
-                time = 0
-                time = "{0:.5f}".format(float(time))
+                time = "{0:.5f}".format(0.0)
             if (art_time == 1) and (new_model == 1):
                 oldtime = oldtime + 1
-                time = oldtime
-                time = "{0:.5f}".format(float(time))
+                time = "{0:.5f}".format(float(oldtime))
                 new_model = 0
                 time_changed = 1
-            if (new_chain == 1):
-                if (line[21] in chains) and (art_time == 1) and (time_changed == 0):
-                    time = time + 1
-                    time = "{0:.5f}".format(float(time))
-                output.write("t " + str(time) + "\n")
-                new_chain = 0
-            if four == False:
-                output.write(
-                    str(int(line[22:26])) + "  " + str(float(line[30:38])) + " " + str(float(line[38:46])) + " " + str(
-                        float(line[46:54])) + " " + str(line[17:20]) + "\n")
-            if four == True:
-                output.write(
-                    str(int(line[22:26])) + "  " + str(float(line[30:38])) + " " + str(float(line[38:46])) + " " + str(
-                        float(line[46:54])) + "\n")
+                seen = set()
+            block_chains, rows = blocks[-1][1], blocks[-1][2]
+            if (len(rows) == 0):
+                if (chain in seen) and (art_time == 1) and (time_changed == 0):
+                    ### a chain repeated without any frame delimiter starts the next frame
+                    time = "{0:.5f}".format(float(time) + 1)
+                    seen = set()
+                if (frame_time != time) and (frame_time is not None):
+                    yield frame_time, blocks[:-1], start
+                    blocks = blocks[-1:]
+                    start = None
+                frame_time = time
+            rows.append((int(line[22:26]), float(line[30:38]), float(line[38:46]), float(line[46:54]), line[17:20]))
+            if chain not in block_chains:
+                block_chains.append(chain)
+            seen.add(chain)
             got_chain = 0
             time_changed = 0
-            if line[21] not in chains: chains.append(line[21])
-        if (line[0:6] == "ENDMDL"): new_model = 1
-    if not output.closed: output.close()
-    f.close()
-
-    for k in range(len(chains)):
-        if chains[k] != ' ':
-            rename(out + '_' + str(k) + '.xyz', out + '_' + chains[k] + '.xyz')
-        else:
-            rename(out + '_' + str(k) + '.xyz', out + '_' + names[k] + '.xyz')
-    if chains[0] != ' ':
-        copyfile(out + '_' + chains[0] + '.xyz', out + '.xyz')
+        elif (record == "TER   "):
+            slot = slot + 1
+            blocks.append((slot, [], []))
+        elif (record == "ENDMDL"):
+            new_model = 1
+        elif (got_chain == 0) and ((record == "TITLE ") or (record == "REMARK") or (record == "MODEL ")):
+            if (record == "MODEL "):
+                time = model_pattern.search(line).group(0)
+                new_model = 1
+            else:
+                match = time_pattern.search(line)
+                if match is None:
+                    continue
+                time = match.group(1)
+            time = "{0:.5f}".format(float(time))
+            got_chain = 1
+            yield frame_time, blocks, start
+            frame_time = None
+            slot = 0
+            blocks = [(slot, [], [])]
+            start = line_start
+    input_file.close()
+    yield frame_time, blocks, start
+
+
+class ResumeError(Exception):
+    pass
+
+
+def traj_digest(name, offset):
+    """
+        Digest of the bytes of the trajectory before the offset, which tells whether it only grew since a checkpoint.
+    """
+    digest = hashlib.sha256()
+    input_file = open(name, 'rb')
+    while offset > 0:
+        block = input_file.read(min(offset, 1 << 20))
+        if not block:
+            break
+        digest.update(block)
+        offset -= len(block)
+    input_file.close()
+    return digest.hexdigest()
+
+
+def truncate_file(name, size):
+    output_file = open(name, 'r+b')
+    output_file.truncate(size)
+    output_file.close()
+
+
+def parse_traj(name, out, four, resume=None):
+    """
+        Writes every chain of the trajectory to out_<chain>.xyz with the index of its frames (.idx, see FrameIndex)
+        and their binary copy (.npy/.npz, see FrameCache), and the first chain also to out.xyz. The last frame may
+        be incomplete if the trajectory is still being written, so the state before it - the byte offset of its time
+        record in the trajectory and the sizes of the outputs - is saved as a checkpoint in out + TRAJ_CHECKPOINT.
+        With resume (a checkpoint read by load_traj_checkpoint) the outputs are cut back to it and only the frames
+        from the offset on are parsed and appended; ResumeError is raised if they bring a new chain. Returns the
+        number of frames of the first chain kept from the checkpoint (0 without resume).
+    """
+    chains = [] if resume is None else resume["chains"]
+    names = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnoprstuvwxyz"
+    if four == False:
+        row_format = "%d  %s %s %s %s\n"
     else:
-        copyfile(out + '_A.xyz', out + '.xyz')
-    for i in range(k + 1, nextchain + 1):
-        remove(out + '_' + str(i) + '.xyz')
+        row_format = "%d  %s %s %s\n"
+    outputs = {}
+    caches = {}
+    offsets = {}  # slot -> [bytes written, (time, offset, length) of every frame]
+    nextchain = 0
+    main_output = None
+    if resume is not None:
+        for slot, chain_name in resume["slots"].items():
+            xyz_bytes, idx_bytes, cache_frames, _, cache_valid = resume["outputs"][chain_name]
+            truncate_file(out + '_' + chain_name + '.xyz', xyz_bytes)
+            truncate_file(out + '_' + chain_name + '.idx', idx_bytes)
+            outputs[slot] = open(out + '_' + chain_name + '.xyz', 'a', buffering=1 << 20)
+            caches[slot] = FrameCacheWriter(out + '_' + chain_name, cache_frames, cache_valid)
+            offsets[slot] = [xyz_bytes, []]
+        truncate_file(out + '.xyz', resume["outputs"][resume["slots"][0]][0])
+        main_output = open(out + '.xyz', 'a', buffering=1 << 20)
+
+    snapshot = None  # (offset in the trajectory, {slot: (bytes, frames in the index, frames in the cache, valid)})
+    resumable = True
+    new_chain = False
+    for time, blocks, start in iter_traj_frames(name, 0 if resume is None else resume["offset"]):
+        if time is not None:
+            if start is None:
+                resumable = False
+            else:
+                snapshot = (start, dict((slot, (offsets[slot][0], len(offsets[slot][1]), len(caches[slot].times),
+                                                caches[slot].valid)) for slot in offsets))
+        for slot, block_chains, rows in blocks:
+            nextchain = slot
+            if slot not in outputs:
+                if resume is not None:
+                    if len(rows) == 0:
+                        continue
+                    new_chain = True
+                    break
+                outputs[slot] = open(out + '_' + str(slot) + '.xyz', 'w', buffering=1 << 20)
+                caches[slot] = FrameCacheWriter(out + '_' + str(slot))
+                offsets[slot] = [0, []]
+            if (len(rows) == 0):
+                continue
+            caches[slot].add(time, rows)
+            if four == False:
+                lines = [row_format % row for row in rows]
+            else:
+                lines = [row_format % row[:4] for row in rows]
+            text = "t " + time + "\n" + "".join(lines)
+            outputs[slot].write(text)
+            if main_output is not None and slot == 0:
+                main_output.write(text)
+            length = len(text) + (len(linesep) - 1) * (len(rows) + 1)  # text mode writes os.linesep for "\n"
+            offsets[slot][1].append((time, offsets[slot][0], length))
+            offsets[slot][0] += length
+            for chain in block_chains:
+                if chain not in chains:
+                    if resume is not None:
+                        new_chain = True
+                        break
+                    chains.append(chain)
+        if new_chain:
+            break
+    for output in outputs.values():
+        output.close()
+    if main_output is not None:
+        main_output.close()
+    for cache in caches.values():
+        cache.close()
+    if new_chain:
+        raise ResumeError("New chain in the trajectory")
+    slot_names = dict((k, chains[k] if chains[k] != ' ' else names[k]) for k in range(len(chains)))
+    index_lines = {}
+    for slot in offsets:
+        index_lines[slot] = ["%s %d %d\n" % frame for frame in offsets[slot][1]]
+        if resume is None:
+            output = open(out + '_' + str(slot) + '.idx', 'w')
+        else:
+            output = open(out + '_' + slot_names[slot] + '.idx', 'a')
+        output.writelines(index_lines[slot])
+        output.close()
+
+    if resume is None:
+        for k in range(len(chains)):
+            rename(out + '_' + str(k) + '.xyz', out + '_' + slot_names[k] + '.xyz')
+            rename(out + '_' + str(k) + '.idx', out + '_' + slot_names[k] + '.idx')
+            caches[k].rename(out + '_' + slot_names[k])
+        copyfile(out + '_' + slot_names[0] + '.xyz', out + '.xyz')
+        for i in range(k + 1, nextchain + 1):
+            remove(out + '_' + str(i) + '.xyz')
+            remove(out + '_' + str(i) + '.idx')
+            caches[i].remove()
+
+    if exists(out + TRAJ_CHECKPOINT):
+        remove(out + TRAJ_CHECKPOINT)
+    if resumable and snapshot is not None:
+        checkpoint = {"offset": snapshot[0], "digest": traj_digest(name, snapshot[0]), "four": four, "chains": chains,
+                      "slots": slot_names, "outputs": {}}
+        for slot, chain_name in slot_names.items():
+            xyz_bytes, frames, cache_frames, cache_valid = snapshot[1].get(slot, (0, 0, 0, True))
+            idx_bytes = sum(len(line) + len(linesep) - 1 for line in index_lines.get(slot, [])[:frames])
+            if resume is not None:
+                idx_bytes += resume["outputs"][chain_name][1]
+                frames += resume["outputs"][chain_name][3]
+            checkpoint["outputs"][chain_name] = [xyz_bytes, idx_bytes, cache_frames, frames, cache_valid]
+        output = open(out + TRAJ_CHECKPOINT, 'w')
+        json.dump(checkpoint, output)
+        output.close()
+    return 0 if resume is None else resume["outputs"][resume["slots"][0]][3]
+
+
+def load_traj_checkpoint(name, four, previous):
+    """
+        Reads the checkpoint of an earlier conversion of the trajectory (see parse_traj) from the directory its
+        outputs were moved to (e.g. the polymer directory of the plugin) and moves them back next to the trajectory.
+        Returns None if there is no checkpoint or the trajectory changed other than by appending frames.
+    """
+    directory, base = dirname(abspath(name)), basename(name)
+    if not exists(join(previous, base + TRAJ_CHECKPOINT)):
+        return None
+    input_file = open(join(previous, base + TRAJ_CHECKPOINT), 'r')
+    try:
+        checkpoint = json.load(input_file)
+    except ValueError:
+        return None
+    finally:
+        input_file.close()
+    if checkpoint["four"] != four or getsize(name) < checkpoint["offset"] or \
+            traj_digest(name, checkpoint["offset"]) != checkpoint["digest"]:
+        return None
+    checkpoint["slots"] = dict((int(slot), chain_name) for slot, chain_name in checkpoint["slots"].items())
+    for chain_name in checkpoint["outputs"]:
+        for extension in ('.xyz', '.idx', '.npy', '.npz', TRAJ_CHECKPOINT):
+            path = base + ('_' + chain_name + extension if extension != TRAJ_CHECKPOINT else extension)
+            if exists(join(previous, path)) and abspath(previous) != directory:
+                replace(join(previous, path), join(directory, path))
+        xyz_bytes, idx_bytes = checkpoint["outputs"][chain_name][:2]
+        path = join(directory, base + '_' + chain_name)
+        if not (exists(path + '.xyz') and exists(path + '.idx')) or getsize(path + '.xyz') < xyz_bytes or \
+                getsize(path + '.idx') < idx_bytes:
+            return None
+    if 0 not in checkpoint["slots"]:
+        return None
+    main = join(directory, base + '.xyz')
+    if exists(join(previous, base + '.xyz')) and abspath(previous) != directory:
+        replace(join(previous, base + '.xyz'), main)
+    if not exists(main) or getsize(main) < checkpoint["outputs"][checkpoint["slots"][0]][0]:
+        copyfile(join(directory, base + '_' + checkpoint["slots"][0] + '.xyz'), main)
+    return checkpoint
+
+
+######### binary copy of the trajectory frames
+def npy_header(frames, residues):
+    """
+        Header of a .npy file with a frames x residues x 3 float32 array. The number of frames is written with a fixed
+        width, so the header can be overwritten in place once all frames are known.
+    """
+    header = "{'descr': '<f4', 'fortran_order': False, 'shape': (%12d, %d, 3), }" % (frames, residues)
+    header += " " * ((64 - (len(header) + 11) % 64) % 64) + "\n"
+    return np.lib.format.magic(1, 0) + struct.pack("<H", len(header)) + header.encode("latin1")
+
+
+class FrameCacheWriter:
+    """
+        Writes the frames of one chain to <path>.npy (frames x residues x 3, float32) as they come and their times
+        and residue numbers to <path>.npz. If the residues change between frames, the cache ends at the last frame
+        before the change (valid is then False). With frames, the cache written before is kept up to its first
+        `frames` frames and continued if it had not ended.
+    """
+    def __init__(self, path, frames=None, valid=True):
+        self.path = path
+        self.output = None
+        self.times = []
+        self.resid = None
+        self.valid = valid
+        self.ended = False  # a resumed cache that had ended before, left as it is
+        if frames is None:
+            return
+        if not (exists(path + '.npy') and exists(path + '.npz')):
+            self.valid = valid and frames == 0
+            return
+        if not valid:
+            self.ended = True
+            return
+        metadata = np.load(path + '.npz')
+        self.resid = metadata['resid'].tolist()
+        self.times = metadata['time'].tolist()[:frames]
+        self.output = open(path + '.npy', 'r+b')
+        self.output.seek(len(npy_header(0, len(self.resid))) + len(self.times) * len(self.resid) * 12)
+        self.output.truncate()
+
+    def add(self, time, rows):
+        if not self.valid:
+            return
+        resid = [row[0] for row in rows]
+        if self.output is None:
+            self.resid = resid
+            self.output = open(self.path + '.npy', 'wb', buffering=1 << 20)
+            self.output.write(npy_header(0, len(resid)))
+        elif resid != self.resid:
+            self.valid = False
+            return
+        np.array([row[1:4] for row in rows], dtype=np.float32).tofile(self.output)
+        self.times.append(float(time))
+
+    def close(self):
+        if self.ended:
+            utime(self.path + '.npz')  # still up to date with the appended .xyz file, see open_frame_cache
+        if self.output is None:
+            return
+        self.output.seek(0)
+        self.output.write(npy_header(len(self.times), len(self.resid)))
+        self.output.close()
+        np.savez(self.path + '.npz', time=np.array(self.times), resid=np.array(self.resid, dtype=np.int32))
+
+    def rename(self, path):
+        if (self.output is not None):
+            rename(self.path + '.npy', path + '.npy')
+            rename(self.path + '.npz', path + '.npz')
+        self.path = path
+
+    def remove(self):
+        if (self.output is not None):
+            remove(self.path + '.npy')
+            remove(self.path + '.npz')
+
+
+class FrameCache:
+    """
+        Memory-mapped frames of one chain written by parse_traj. A frame is looked up by its time, formatted as in the
+        .xyz file (e.g. "10.00000").
+    """
+    def __init__(self, path):
+        metadata = np.load(path + '.npz')
+        self.resid = metadata['resid']
+        self.positions = {"{0:.5f}".format(time): k for k, time in enumerate(metadata['time'].tolist())}
+        self.frames = np.load(path + '.npy', mmap_mode='r')
+
+    def frame(self, time):
+        if time not in self.positions:
+            return None
+        return self.frames[self.positions[time]]
+
+    def write_xyz(self, time, name, residue="ABC"):
+        """
+            Saves the frame in the 5-column .xyz format. Returns False if there is no such frame.
+        """
+        frame = self.frame(time)
+        if frame is None:
+            return False
+        output_file = open(name, 'w')
+        output_file.writelines("%d %.3f %.3f %.3f %s\n" % (index, x, y, z, residue) for index, (x, y, z) in
+                               zip(self.resid.tolist(), frame.tolist()))
+        output_file.close()
+        return True
+
+
+class FrameIndex:
+    """
+        Byte offsets of the frames in the text <path>.xyz trajectory, read from <path>.idx, so a frame can be read
+        with a single seek.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.positions = {}
+        index_file = open(path + '.idx', 'r')
+        for line in index_file:
+            time, offset, length = line.split()
+            self.positions.setdefault(time, (int(offset), int(length)))
+        index_file.close()
+
+    def frame(self, time):
+        """
+            Returns the coordinate lines of the frame, without its time line, or None if there is no such frame.
+        """
+        if time not in self.positions:
+            return None
+        offset, length = self.positions[time]
+        input_file = open(self.path + '.xyz', 'rb')
+        input_file.seek(offset)
+        lines = input_file.read(length).decode().splitlines()
+        input_file.close()
+        return lines[1:]
+
+    def write_xyz(self, time, name, residue="ABC"):
+        """
+            Saves the frame with the residue name appended to every line. Returns False if there is no such frame.
+        """
+        lines = self.frame(time)
+        if lines is None:
+            return False
+        output_file = open(name, 'w')
+        output_file.writelines(line + " " + residue + "\n" for line in lines)
+        output_file.close()
+        return True
+
+
+def open_frame_index(path):
+    """
+        Returns the FrameIndex of <path>.xyz, or None if it was not written or is older than the .xyz file.
+    """
+    if not exists(path + '.idx') or getmtime(path + '.idx') < getmtime(path + '.xyz'):
+        return None
+    return FrameIndex(path)
+
+
+def open_frame_cache(path):
+    """
+        Returns the FrameCache of <path>.xyz, or None if it was not written or is older than the .xyz file.
+    """
+    if not (exists(path + '.npy') and exists(path + '.npz')):
+        return None
+    if exists(path + '.xyz') and getmtime(path + '.npz') < getmtime(path + '.xyz'):
+        return None
+    return FrameCache(path)
 
 
 class Chain:
     def __init__(self, name):
         self.name = name
         self.residues = []
-        self.coordinates = []
+        self.ca_atoms = []  # (index, [x, y, z], residue) collected while reading the file
+        self.sulfur_atoms = []  # (index, [x, y, z]) of the SG atoms of cysteines
+        self.index = np.zeros(0, dtype=int)
+        self.xyz = np.zeros((0, 3))  # NaN for residues without coordinates
+        self.resname = np.zeros(0, dtype='<U3')
+        self.interpolated = np.zeros(0, dtype=bool)
+        self.positions = {}  # residue number -> position in the arrays
         self.bridges = []
         self.missing = []
         self.gaps = []
@@ -144,7 +516,7 @@ class Chain:
         self.sheet = []
 
     def find_length(self):
-        self.length = max(len(self.residues), len(self.coordinates))
+        self.length = max(len(self.residues), len(self.index))
 
     def add_residue(self, line):
         line = line[19:70]
@@ -166,28 +538,78 @@ class Chain:
         self.missing.append([missing, residue])
 
     def add_coordinate(self, index, coordinate, residue):
-        if (len(self.coordinates) == 0):
-            for k in range(len(self.missing)):
-                if (index > self.missing[k][0]):
-                    self.coordinates.append([self.missing[k][0], [], self.missing[k][1]])
-            self.coordinates.append([index, coordinate, residue])
+        self.ca_atoms.append((index, coordinate, residue))
+
+    def add_sulfur(self, index, coordinate):
+        self.sulfur_atoms.append((index, coordinate))
+
+    ######### building coordinate arrays
+    def build_coordinates(self):
+        """
+            Converts the collected CA atoms into arrays. Gaps in the numbering are filled with positions placed evenly
+            on the segment joining their ends, each one step from the previous one and rounded to 3 decimals, as the
+            earlier versions did.
+        """
+        if (len(self.ca_atoms) == 0):
+            return
+        head = [self.missing[k] for k in range(len(self.missing)) if (self.ca_atoms[0][0] > self.missing[k][0])]
+        index = np.array([m[0] for m in head] + [atom[0] for atom in self.ca_atoms], dtype=int)
+        xyz = np.array([[np.nan] * 3 for m in head] + [atom[1] for atom in self.ca_atoms], dtype=float)
+        resname = np.array([m[1] for m in head] + [atom[2] for atom in self.ca_atoms], dtype='<U3')
+        self.ca_atoms = []
+
+        diff = np.diff(index)
+        fill = np.where(diff > 1, diff - 1, 0)
+        self.gaps = [[int(diff[k]), int(index[k]), int(index[k + 1])] for k in np.flatnonzero(diff > 1)]
+        ### gap k gets residues index[k] + 1, ..., index[k + 1] - 1 - a linspace between its ends for each gap
+        start = np.repeat(np.arange(len(diff)), fill)
+        step = np.arange(len(start)) - np.repeat(np.cumsum(fill) - fill, fill) + 1
+        position = np.arange(len(index)) + np.concatenate(([0], np.cumsum(fill)))
+
+        self.interpolated = np.ones(len(index) + len(start), dtype=bool)
+        self.interpolated[position] = False
+        self.index = np.empty(len(self.interpolated), dtype=int)
+        self.index[position] = index
+        self.index[self.interpolated] = index[start] + step
+        self.xyz = np.empty((len(self.interpolated), 3))
+        self.xyz[position] = xyz
+        filled = []
+        for k in np.flatnonzero(diff > 1):
+            shift = ((xyz[k + 1] - xyz[k]) / diff[k]).tolist()
+            current = xyz[k].tolist()
+            for _ in range(fill[k]):
+                current = [round(current[m] + shift[m], 3) for m in range(3)]
+                filled.append(current)
+        self.xyz[self.interpolated] = np.array(filled).reshape(-1, 3)
+        self.resname = np.full(len(self.interpolated), "XXX", dtype='<U3')
+        self.resname[position] = resname
+
+    def add_empty(self, index, residues, front=False):
+        """
+            Adds residues without coordinates at the beginning or at the end of the chain.
+        """
+        current = [self.index, self.xyz, self.resname, self.interpolated]
+        added = [np.asarray(index, dtype=int), np.full((len(index), 3), np.nan), np.asarray(residues, dtype='<U3'),
+                 np.zeros(len(index), dtype=bool)]
+        if (front):
+            parts = zip(added, current)
         else:
-            diff = index - self.coordinates[len(self.coordinates) - 1][0]
-            if (diff > 1):
-                x = self.coordinates[len(self.coordinates) - 1][1][0]
-                y = self.coordinates[len(self.coordinates) - 1][1][1]
-                z = self.coordinates[len(self.coordinates) - 1][1][2]
-                vec_diff = [(coordinate[0] - x) / diff, (coordinate[1] - y) / diff, (coordinate[2] - z) / diff]
-                self.gaps.append([diff, self.coordinates[len(self.coordinates) - 1][0], index])
-            for k in range(diff - 1):
-                x = round(x + vec_diff[0], 3)
-                y = round(y + vec_diff[1], 3)
-                z = round(z + vec_diff[2], 3)
-                #    res=self.missing[find_index(index-diff+k+1,self.missing)][1]
-                #    if (res==None):
-                res = "XXX"
-                self.coordinates.append([index - diff + k + 1, [x, y, z], res])
-            self.coordinates.append([index, coordinate, residue])
+            parts = zip(current, added)
+        self.index, self.xyz, self.resname, self.interpolated = [np.concatenate(part) for part in parts]
+
+    def select(self, mask):
+        self.index = self.index[mask]
+        self.xyz = self.xyz[mask]
+        self.resname = self.resname[mask]
+        self.interpolated = self.interpolated[mask]
+
+    def build_positions(self):
+        self.positions = {}
+        for k, number in enumerate(self.index.tolist()):
+            self.positions.setdefault(number, k)
+
+    def find_position(self, number):
+        return self.positions.get(number)
 
     ######### characterize the bond type
     def bond_type(self, res1, atom1, Nend, res2, atom2, Cend):
@@ -235,34 +657,30 @@ class Chain:
 
     ######## check, whether it is N- or C-end
     def N_end(self, index):
-        if (index == self.coordinates[0][0]):
+        if (index == self.index[0]):
             return True
         else:
             return False
 
     def C_end(self, index):
-        if (index == self.coordinates[len(self.coordinates) - 1][0]):
+        if (index == self.index[-1]):
             return True
         else:
             return False
 
     ######### cleaning data
     def clean(self):
+        self.build_coordinates()
         ### adding C-end
-        if (len(self.coordinates) != 0):
-            for k in range(len(self.missing)):
-                if (self.coordinates[len(self.coordinates) - 1][0] < self.missing[k]):
-                    self.coordinates.append([self.missing[k][0], [], self.missing[k][1]])
-        else:
-            for k in range(len(self.missing)):
-                self.coordinates.append([self.missing[k][0], [], self.missing[k][1]])
-                ### clearing double CA atoms
-        for k in range(len(self.coordinates) - 1, 0, -1):
-            if (self.coordinates[k][0] == self.coordinates[k - 1][0]):
-                self.coordinates.pop(k)
-                #   if (self.coordinates_residue[k][0]==self.coordinates[k-1][0]):
-                #    self.coordinates_residue.pop(k)
-                ### clearing non-protein links
+        tail = [self.missing[k] for k in range(len(self.missing)) if
+                (len(self.index) == 0 or self.index[-1] < self.missing[k][0])]
+        self.add_empty([m[0] for m in tail], [m[1] for m in tail])
+        ### clearing double CA atoms
+        keep = np.ones(len(self.index), dtype=bool)
+        keep[1:] = (self.index[1:] != self.index[:-1])
+        self.select(keep)
+        self.build_positions()
+        ### clearing non-protein links
         for k in range(len(self.bridges) - 1, -1, -1):
             if ((self.bridges[k][1] not in amino_acids) or (self.bridges[k][4] not in amino_acids)):
                 self.bridges.pop(k)
@@ -278,33 +696,30 @@ class Chain:
                                                     self.bridges[k][5], self.C_end(self.bridges[k][6]))
                 ### removing bonds and links which do not exist!
         for k in range(len(self.bridges) - 1, -1, -1):
-            if (find_index(self.bridges[k][3], self.coordinates) == None or find_index(self.bridges[k][6],
-                                                                                       self.coordinates) == None):
+            if (self.find_position(self.bridges[k][3]) == None or self.find_position(self.bridges[k][6]) == None):
                 self.bridges.pop(k)
                 ### removing amide bonds used to extend the backbone
         for k in range(len(self.bridges) - 1, -1, -1):
             if ((self.bridges[k][0] == "AMIDE-like") and (abs(
-                    find_index(self.bridges[k][3], self.coordinates) - find_index(self.bridges[k][6],
-                                                                                  self.coordinates)) == 1)):
+                    self.find_position(self.bridges[k][3]) - self.find_position(self.bridges[k][6])) == 1)):
                 self.bridges.pop(k)
                 ### dealing with different number of residues in different parts of PDB file
-        k = len(self.residues) - len(self.coordinates)
+        k = len(self.residues) - len(self.index)
         if (k > 0):
             check = 1  # check=1, if residues in N-terminus are same
-            for i in range(min(k, len(self.residues), len(self.coordinates))):
-                if (self.residues[i] != self.coordinates[i][2]):
+            for i in range(min(k, len(self.residues), len(self.index))):
+                if (self.residues[i] != self.resname[i]):
                     check = 0
             if (check == 0):
-                for i in range(k):
-                    self.coordinates.insert(0, [self.coordinates[0][0] - 1, [], ""])
+                self.add_empty(np.arange(self.index[0] - k, self.index[0]), [""] * k, front=True)
             else:
-                if (len(self.residues) != 0 and len(self.coordinates) != 0):
-                    for i in range(len(self.residues) - k, len(self.residues), 1):
-                        self.coordinates.append([self.coordinates[len(self.coordinates) - 1][0] + 1, [], ""])
+                if (len(self.residues) != 0 and len(self.index) != 0):
+                    self.add_empty(np.arange(self.index[-1] + 1, self.index[-1] + k + 1), [""] * k)
+            self.build_positions()
         if (k < 0):
             check = 1  # check=1, if residues in N-terminus are same
             for i in range(k):
-                if (self.residues[i] != self.coordinates[i][2]):
+                if (self.residues[i] != self.resname[i]):
                     check = 0
             if (check == 0):
                 for i in range(k):
@@ -316,63 +731,103 @@ class Chain:
         self.find_length()
         ######### checking gaps
 
+    def get_gaps(self):
+        """
+            Returns the gaps longer than one residue as (chain, residue before, residue after, length) tuples.
+        """
+        return [(self.name, self.gaps[k][1], self.gaps[k][2], self.gaps[k][0] - 1) for k in range(len(self.gaps))
+                if (self.gaps[k][0] > 2)]
+
     def check_gaps(self):
         communicate = "\n"
-        for k in range(len(self.gaps)):
-            if (self.gaps[k][0] > 2):
-                communicate += "WARNING!!! In chain " + self.name + " there is a gap of length " + str(
-                    self.gaps[k][0] - 1) + " between residues " + str(self.gaps[k][1]) + " and " + str(
-                    self.gaps[k][2]) + "\n"
+        for gap in self.get_gaps():
+            communicate += "WARNING!!! In chain " + gap[0] + " there is a gap of length " + str(
+                gap[3]) + " between residues " + str(gap[1]) + " and " + str(gap[2]) + "\n"
         communicate = communicate[:-1]
         return communicate
 
     ######### printing data
     def chain_print(self, PDB, four):
-        output_file = open(PDB + "_" + self.name + ".xyz", 'w')
-        print(self.check_gaps())
+        index = self.index.tolist()
+        xyz = self.xyz.tolist()
+        has_coordinates = (~np.isnan(self.xyz[:, 0])).tolist()
         if (len(self.residues) == self.length):
-            for k in range(min(self.length, len(self.coordinates))):
-                if (self.coordinates[k][1] != []) and (four == False):
-                    output_file.write(str(self.coordinates[k][0]) + " " + str(self.coordinates[k][1][0]) + " " + str(
-                        self.coordinates[k][1][1]) + " " + str(self.coordinates[k][1][2]) + " " + str(
-                        self.residues[k]) + "\n")
-                if (self.coordinates[k][1] != []) and (four == True):
-                    output_file.write(str(self.coordinates[k][0]) + " " + str(self.coordinates[k][1][0]) + " " + str(
-                        self.coordinates[k][1][1]) + " " + str(self.coordinates[k][1][2]) + "\n")
+            residues = self.residues
         else:
-            for k in range(self.length):
-                if (self.coordinates[k][1] != []) and (four == False):
-                    output_file.write(str(self.coordinates[k][0]) + " " + str(self.coordinates[k][1][0]) + " " + str(
-                        self.coordinates[k][1][1]) + " " + str(self.coordinates[k][1][2]) + " " + str(
-                        self.coordinates[k][2]) + "\n")
-                if (self.coordinates[k][1] != []) and (four == True):
-                    output_file.write(str(self.coordinates[k][0]) + " " + str(self.coordinates[k][1][0]) + " " + str(
-                        self.coordinates[k][1][1]) + " " + str(self.coordinates[k][1][2]) + "\n")
+            residues = self.resname.tolist()
+        rows = [k for k in range(min(self.length, len(index))) if has_coordinates[k]]
+
+        output_file = open(PDB + "_" + self.name + ".xyz", 'w')
+        if (four == False):
+            output_file.writelines(str(index[k]) + " " + str(xyz[k][0]) + " " + str(xyz[k][1]) + " " + str(
+                xyz[k][2]) + " " + str(residues[k]) + "\n" for k in rows)
+        else:
+            output_file.writelines(
+                str(index[k]) + " " + str(xyz[k][0]) + " " + str(xyz[k][1]) + " " + str(xyz[k][2]) + "\n" for k in
+                rows)
         output_file.close()
         output_file = open(PDB + "_" + self.name + ".pdb", 'w')
         for k in range(len(self.helix)):
             output_file.write(self.helix[k])
         for k in range(len(self.sheet)):
             output_file.write(self.sheet[k])
-        if (len(self.residues) == self.length):
-            for k in range(min(self.length, len(self.coordinates))):
-                if (self.coordinates[k][1] != []):
-                    output_file.write(
-                        "ATOM  %(atom)5s  CA  %(resname)3s A%(res)4s    %(x)8s%(y)8s%(z)8s  1.00  1.00           C\n" % {
-                            "atom": self.coordinates[k][0], "res": self.coordinates[k][0], "resname": self.residues[k],
-                            "x": self.coordinates[k][1][0], "y": self.coordinates[k][1][1],
-                            "z": self.coordinates[k][1][2]})
-        else:
-            for k in range(self.length):
-                if (self.coordinates[k][1] != []):
-                    output_file.write(
-                        "ATOM  %(atom)5s  CA  %(resname)3s A%(res)4s    %(x)8s%(y)8s%(z)8s  1.00  1.00           C\n" % {
-                            "atom": self.coordinates[k][0], "res": self.coordinates[k][0],
-                            "resname": self.coordinates[k][2], "x": self.coordinates[k][1][0],
-                            "y": self.coordinates[k][1][1], "z": self.coordinates[k][1][2]})
+        output_file.writelines(
+            "ATOM  %(atom)5s  CA  %(resname)3s A%(res)4s    %(x)8s%(y)8s%(z)8s  1.00  1.00           C\n" % {
+                "atom": index[k], "res": index[k], "resname": residues[k], "x": xyz[k][0], "y": xyz[k][1],
+                "z": xyz[k][2]} for k in rows)
         output_file.write("END\n")
         output_file.close()
 
+    ######### bridges closing the loops
+    def get_bridges(self):
+        """
+            Returns the bridges of the chain as (type, residue 1, residue 2) tuples.
+        """
+        return [(self.bridges[k][0], self.bridges[k][3], self.bridges[k][6]) for k in range(len(self.bridges))]
+
+    ######### bridges found from geometry
+    def find_bridges(self, cutoff=None):
+        """
+            Proposes the bridges of a chain without SSBOND and LINK records from its geometry: SS bridges between
+            cysteines whose SG atoms are at most SS_MAX_DIST apart (SS-like between cysteines whose CA atoms are
+            SS_CA_DIST apart if the chain has CA atoms only) and, with a cutoff given, OTHER bridges between all
+            residues whose CA atoms are at most cutoff apart. Close pairs are found with a cell list, so the
+            search takes O(N log N) time. The bridges are added in the format of the records and cleaned the same
+            way.
+        """
+        pairs = []
+        if (len(self.sulfur_atoms) > 0):
+            index = np.array([atom[0] for atom in self.sulfur_atoms], dtype=int)
+            xyz = np.array([atom[1] for atom in self.sulfur_atoms], dtype=float)
+            first, second = contact_pairs(xyz, 2, 0.0, SS_MAX_DIST)
+            pairs += [("SS", index[i], index[j]) for i, j in zip(first, second)]
+        else:
+            cysteines = np.flatnonzero((self.resname == "CYS") & ~self.interpolated & ~np.isnan(self.xyz[:, 0]))
+            if (len(cysteines) > 1):
+                first, second = contact_pairs(self.xyz[cysteines], 2, SS_CA_DIST[0], SS_CA_DIST[1])
+                pairs += [("SS-like", self.index[cysteines[i]], self.index[cysteines[j]])
+                          for i, j in zip(first, second)]
+        if (cutoff is not None):
+            present = np.flatnonzero(~self.interpolated & ~np.isnan(self.xyz[:, 0]))
+            if (len(present) > 1):
+                first, second = contact_pairs(self.xyz[present], 2, 0.0, cutoff)
+                pairs += [("OTHER", self.index[present[i]], self.index[present[j]]) for i, j in zip(first, second)]
+
+        found = set((bridge[3], bridge[6]) for bridge in self.bridges)
+        for bridge_type, res1, res2 in pairs:
+            res1, res2 = int(min(res1, res2)), int(max(res1, res2))
+            if ((res1, res2) in found) or (res2 - res1 < 5):
+                continue
+            if (self.find_position(res1) == None or self.find_position(res2) == None):
+                continue
+            found.add((res1, res2))
+            resname1 = str(self.resname[self.find_position(res1)])
+            resname2 = str(self.resname[self.find_position(res2)])
+            if (bridge_type == "SS"):
+                self.bridges.append([bridge_type, resname1, "SG", res1, resname2, "SG", res2])
+            else:
+                self.bridges.append([bridge_type, resname1, "CA", res1, resname2, "CA", res2])
+
     ######### printing commands to program
     def commands_print(self, PDB, flag=0):
         for k in range(len(self.bridges)):
@@ -388,115 +843,196 @@ class Chain:
                 ######### finding distance between residues
 
     def find_distance(self, res1, res2):
-        for k in range(len(self.coordinates)):
-            if (self.coordinates[k][0] == res1):
-                vec1 = self.coordinates[k][1]
-            if (self.coordinates[k][0] == res2):
-                vec2 = self.coordinates[k][1]
-        print(np.linalg.norm(np.asarray(vec1) - np.asarray(vec2)))
+        print(np.linalg.norm(self.xyz[self.find_position(res1)] - self.xyz[self.find_position(res2)]))
 
     ######### finding index of first residue with coordinates
     def find_first(self):
-        for k in range(len(self.coordinates)):
-            if (self.coordinates[k][1] != []):
-                return self.coordinates[k][0]
-
+        present = np.flatnonzero(~np.isnan(self.xyz[:, 0]))
+        if (len(present) > 0):
+            return int(self.index[present[0]])
 
-if (args.romek == True):
-    import webbrowser
 
-    webbrowser.open("https://www.youtube.com/watch?v=niiYv09hHOI")
-    sys.exit(0)
 
-################################ Main part ################################
-### search for chains and build chain classes
-
-if args.traj:
-    parse_traj(args.input_file, args.input_file, args.fourcolumn)
-
-else:
+######### reading the whole PDB file in a single pass
+def parse_pdb(name):
+    """
+        Reads the PDB file once and dispatches every record to the Chain it belongs to. Chains are returned in the
+        order of their first appearance in SEQRES or ATOM records. If all atoms have an empty chain identifier, the
+        consecutive TER-separated segments are treated as artificial chains named A, B, C, ...
+    """
     chains = []
-    input_file = open(args.input_file, 'r')
+    chain_data = {}
+    closed = set()
+    segments = [Chain(' ')]
+    cross_chain_bridges = []
     ternum = 0
     terfound = 1
     tercount = 1
-    art_chains = 0
     names = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnoprstuvwxyz"
+
+    def builder(chain):
+        if chain not in chain_data:
+            chain_data[chain] = Chain(chain)
+        return chain_data[chain]
+
+    input_file = open(name, 'r')
     for line in input_file:
-        if (line[0:6] == "SEQRES"):
+        record = line[0:6]
+        if (record == "SEQRES"):
             if (line[11] not in chains):
                 chains.append(line[11])
-        if (line[0:4] == "ATOM"):
-            terfound = 0
-            if (line[21] not in chains):
-                chains.append(line[21])
-        if (line[0:3] == "TER") and (terfound == 0) and (tercount == 1):
-            ternum = ternum + 1
-            terfound = 1
-        if (line[0:3] == "END"):
-            if (terfound == 0) and (tercount == 1): ternum = ternum + 1
-            tercount = 0
-    if (tercount == 1) and (terfound == 0): ternum = ternum + 1
-    input_file.close()
-    if len(chains) == 1 and chains[0] == ' ' and ternum > 0:
-        chains = []
-        art_chains = 1
-        for k in range(ternum):
-            chains.append(names[k])
-
-    ### fill the chain class information
-    cross_chain_bridges = []
-    chain_data = {}
-    ternum = 0
-    for k in range(len(chains)):
-        chain_data[chains[k]] = Chain(chains[k])
-        input_file = open(args.input_file, 'r')
-        for line in input_file:
-            if ((line[0:10] == "REMARK 465") and (line[15:18] in amino_acids) and (
-                    line[19] == chains[k]) and isinstance(
-                line[21:26], int)):
-                chain_data[chains[k]].add_missing(int(line[21:26]), line[15:18])
-            if ((line[0:6] == "SEQRES") and (line[11] == chains[k])):
-                chain_data[chains[k]].add_residue(line)
-            if ((line[0:5] == "HELIX") and (line[19] == chains[k]) and (line[31] == chains[k])):
-                chain_data[chains[k]].add_helix(line)
-            if ((line[0:5] == "SHEET") and (line[21] == chains[k]) and (line[32] == chains[k])):
-                chain_data[chains[k]].add_sheet(line)
-            if ((line[0:6] == "SSBOND") and (line[15] == chains[k]) and (line[29] == chains[k])):
-                chain_data[chains[k]].add_bridge(
+            if (line[11] not in closed):
+                builder(line[11]).add_residue(line)
+        elif ((line[0:10] == "REMARK 465") and (line[15:18] in amino_acids) and (line[19] not in closed) and
+              isinstance(line[21:26], int)):
+            builder(line[19]).add_missing(int(line[21:26]), line[15:18])
+        elif (record[0:5] == "HELIX"):
+            if (line[19] == line[31]) and (line[19] not in closed):
+                builder(line[19]).add_helix(line)
+        elif (record[0:5] == "SHEET"):
+            if (line[21] == line[32]) and (line[21] not in closed):
+                builder(line[21]).add_sheet(line)
+        elif (record == "SSBOND"):
+            if (line[15] == line[29]) and (line[15] not in closed):
+                builder(line[15]).add_bridge(
                     ["SS", line[11:14], "S", int(line[17:21]), line[25:28], "S", int(line[31:35])])
-            if ((line[0:6] == "SSBOND") and (line[15] != line[29])):
+            if (line[15] != line[29]):
                 cross_chain_bridges.append(
                     ["SS", line[15], line[11:14], "S", int(line[17:21]), line[29], line[25:28], "S", int(line[31:35])])
-            if ((line[0:4] == "LINK") and (line[21] == chains[k]) and (line[51] == chains[k])):
-                chain_data[chains[k]].add_bridge(
+        elif (record[0:4] == "LINK"):
+            if (line[21] == line[51]) and (line[21] not in closed):
+                builder(line[21]).add_bridge(
                     ["LINK", line[17:20], line[12:16].strip(), int(line[22:26]), line[47:50], line[42:46].strip(),
                      int(line[52:56])])
-            if ((line[0:4] == "LINK") and (line[21] != line[51])):
+            if (line[21] != line[51]):
                 cross_chain_bridges.append(
                     ["LINK", line[21], line[17:20], line[12:16].strip(), int(line[22:26]), line[51], line[47:50],
                      line[42:46].strip(), int(line[52:56])])
-            if ((line[0:6] == "HETATM") and (line[13:15] == "CA") and (line[21] == chains[k])):
-                chain_data[chains[k]].add_coordinate(int(line[22:26]),
-                                                     [float(line[30:38]), float(line[38:46]), float(line[46:54])],
-                                                     line[17:20])
-            if ((line[0:6] == "HETATM") and (line[13:15] == "CA") and (k == ternum) and (art_chains == 1)):
-                chain_data[chains[k]].add_coordinate(int(line[22:26]),
-                                                     [float(line[30:38]), float(line[38:46]), float(line[46:54])],
-                                                     line[17:20])
-            if ((line[0:4] == "ATOM") and (line[13:15] == "CA") and (line[21] == chains[k])):
-                chain_data[chains[k]].add_coordinate(int(line[22:26]),
-                                                     [float(line[30:38]), float(line[38:46]), float(line[46:54])],
-                                                     line[17:20])
-            if ((line[0:4] == "ATOM") and (line[13:15] == "CA") and (k == ternum) and (art_chains == 1)):
-                chain_data[chains[k]].add_coordinate(int(line[22:26]),
-                                                     [float(line[30:38]), float(line[38:46]), float(line[46:54])],
-                                                     line[17:20])
-            if ((line[0:3] == "TER") and (len(chain_data[chains[k]].coordinates) != 0)):
-                break
-            if ((line[0:3] == "TER") and (len(chain_data[chains[k]].coordinates) == 0)):
+        elif (record[0:4] == "ATOM") or (record == "HETATM"):
+            if (record[0:4] == "ATOM"):
+                terfound = 0
+                if (line[21] not in chains):
+                    chains.append(line[21])
+            if (line[13:15] == "CA"):
+                coordinate = [float(line[30:38]), float(line[38:46]), float(line[46:54])]
+                if (line[21] not in closed):
+                    builder(line[21]).add_coordinate(int(line[22:26]), coordinate, line[17:20])
+                if (line[21] == ' ') and (tercount == 1):
+                    segments[-1].add_coordinate(int(line[22:26]), coordinate, line[17:20])
+            elif (line[12:16] == " SG ") and (line[17:20] == "CYS"):
+                coordinate = [float(line[30:38]), float(line[38:46]), float(line[46:54])]
+                if (line[21] not in closed):
+                    builder(line[21]).add_sulfur(int(line[22:26]), coordinate)
+                if (line[21] == ' ') and (tercount == 1):
+                    segments[-1].add_sulfur(int(line[22:26]), coordinate)
+        elif (record[0:3] == "TER"):
+            closed.update(chain for chain in chain_data if len(chain_data[chain].ca_atoms) != 0)
+            if (terfound == 0) and (tercount == 1):
                 ternum = ternum + 1
-        input_file.close()
-        chain_data[chains[k]].clean()  # clean bridges data - do not comment
-        chain_data[chains[k]].chain_print(args.input_file, args.fourcolumn)  # save coordinates to .xyz and .pdb file
-        chain_data[chains[k]].commands_print(args.input_file, 2)
+                terfound = 1
+                segments.append(Chain(' '))
+        elif (record[0:3] == "END"):
+            if (terfound == 0) and (tercount == 1):
+                ternum = ternum + 1
+            tercount = 0
+    input_file.close()
+    if (tercount == 1) and (terfound == 0):
+        ternum = ternum + 1
+
+    ### all atoms without chain identifier - every segment between TER records becomes a separate chain
+    if len(chains) == 1 and chains[0] == ' ' and ternum > 0:
+        chains = []
+        for k in range(ternum):
+            chain = builder(names[k])
+            chain.ca_atoms = segments[k].ca_atoms
+            chain.sulfur_atoms = segments[k].sulfur_atoms
+            chains.append(names[k])
+    for chain in chains:
+        builder(chain)
+    return chains, chain_data, cross_chain_bridges
+
+
+def contains_bridge_records(name):
+    """
+        Checks whether the PDB file has any SSBOND or LINK record.
+    """
+    with open(name, 'r') as input_file:
+        for line in input_file:
+            if (line[0:6] == "SSBOND") or (line[0:4] == "LINK"):
+                return True
+    return False
+
+
+def convert_pdb(name, four=False, find_bridges=False, cutoff=None):
+    """
+        Converts the PDB file into per-chain .xyz and .pdb files saved next to the input file. Returns the list of
+        chains and the dictionary of the cleaned Chain objects, which hold the gaps and bridges of every chain. With
+        find_bridges the bridges of chains without SSBOND and LINK records are proposed from the geometry (see
+        Chain.find_bridges).
+    """
+    chains, chain_data, cross_chain_bridges = parse_pdb(name)
+    for chain in chains:
+        chain_data[chain].clean()  # clean bridges data - do not comment
+        if (find_bridges) and (len(chain_data[chain].bridges) == 0):
+            chain_data[chain].find_bridges(cutoff)
+        chain_data[chain].chain_print(name, four)  # save coordinates to .xyz and .pdb file
+    return chains, chain_data
+
+
+def convert_trajectory(name, four=False, previous=None):
+    """
+        Converts the trajectory into per-chain .xyz files with all frames, saved next to the input file. With previous
+        (the directory with the files of an earlier conversion) only the frames appended since then are parsed, if
+        the trajectory only grew. Returns the number of frames of the first chain kept from the earlier conversion.
+    """
+    if previous is not None:
+        resume = load_traj_checkpoint(name, four, previous)
+        if resume is not None:
+            try:
+                return parse_traj(name, name, four, resume)
+            except ResumeError:
+                pass
+    return parse_traj(name, name, four)
+
+
+################################ Main part ################################
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="convert_columns", formatter_class=argparse.RawDescriptionHelpFormatter,
+                                     description="#################################################################\n\
+#	convert_column - script converting PDB to XYZ files.	#\n\
+#	Date: 02.10.2015, version from " + date + "		#\n\
+#       Author: Pawel Dabrowski-Tumanski			#\n\
+#	p.dabrowski [at] cent.uw.edu.pl				#\n\
+#	version 2.1						#\n\
+#################################################################")
+    parser.add_argument('input_file', action="store", help="The input PDB file")
+    parser.add_argument('-t', '--trajectory', action="store_true", dest="traj", default=False,
+                        help="Declare, that the input file is a trajectory")
+    parser.add_argument('-f', '--fourcolumn', action="store_true", dest="fourcolumn", default=False,
+                        help="Print XYZ output in 4-column format (default 5-column)")
+    parser.add_argument('-i', '--incremental', action="store_true", dest="incremental", default=False,
+                        help="With -t, convert only the frames appended since the previous conversion")
+    parser.add_argument('-b', '--find-bridges', action="store_true", dest="find_bridges", default=False,
+                        help="Propose bridges from the geometry for chains without SSBOND and LINK records")
+    parser.add_argument('-c', '--cutoff', action="store", dest="cutoff", type=float, default=None,
+                        help="With -b, propose also bridges between all residues with CA atoms closer than cutoff")
+    parser.add_argument('-r', action="store_true", dest="romek", default=False,
+                        help=argparse.SUPPRESS)
+    parser.add_argument('--version', action='version', version='%(prog)s 2.1')
+
+    args = parser.parse_args()
+
+    if (args.romek == True):
+        import webbrowser
+
+        webbrowser.open("https://www.youtube.com/watch?v=niiYv09hHOI")
+        sys.exit(0)
+
+    if args.traj:
+        convert_trajectory(args.input_file, args.fourcolumn,
+                           dirname(abspath(args.input_file)) if args.incremental else None)
+    else:
+        chains, chain_data = convert_pdb(args.input_file, args.fourcolumn, args.find_bridges, args.cutoff)
+        for chain in chains:
+            print(chain_data[chain].check_gaps())
+            chain_data[chain].commands_print(args.input_file, 2)
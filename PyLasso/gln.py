@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+# PyLasso: Gaussian linking numbers (GLN) between the loop and its tails, computed with NumPy.
+# ----------------------------------------------------------------------
+import os
+import sys
+import time
+
+import numpy as np
+
+import lasso_engine
+import result_cache
+
+MIN_TAIL = 5  # shorter tails (in residues) get no GLN matrix
+
+
+def segment_gln(starts1, ends1, starts2, ends2, chunk=1 << 20):
+    """
+        Gaussian linking numbers of every segment of the first set with every segment of the second one - the
+        exact formula for two straight segments (the solid angle of Klenin and Langowski divided by 4 pi).
+        Returns an (n1 x n2) array; segments sharing an atom or lying on one line give 0. Rows are processed in
+        parts of at most `chunk` pairs to bound the memory.
+    """
+    result = np.zeros((len(starts1), len(starts2)))
+    step = max(1, chunk // max(1, len(starts2)))
+    for k in range(0, len(starts1), step):
+        p1, p2 = starts1[k:k + step, np.newaxis], ends1[k:k + step, np.newaxis]
+        r13, r14 = starts2 - p1, ends2 - p1
+        r23, r24 = starts2 - p2, ends2 - p2
+        normals = [np.cross(r13, r14), np.cross(r14, r24), np.cross(r24, r23), np.cross(r23, r13)]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            normals = [n / np.linalg.norm(n, axis=2)[..., np.newaxis] for n in normals]
+            omega = sum(np.arcsin(np.clip(np.einsum('ijk,ijk->ij', normals[m], normals[(m + 1) % 4]), -1.0, 1.0))
+                        for m in range(4))
+        sign = np.sign(np.einsum('ijk,ijk->ij', np.cross(ends2 - starts2, p2 - p1), r13))
+        result[k:k + step] = np.nan_to_num(omega * sign) / (4 * np.pi)
+    return result
+
+
+def tail_gln(loop, tail):
+    """
+        GLN of every segment of the tail (atom k to k + 1) with the loop closed by the bridge.
+    """
+    return segment_gln(tail[:-1], tail[1:], loop, np.roll(loop, -1, axis=0)).sum(axis=1)
+
+
+def gln_matrix(loop, tail):
+    """
+        GLN between the loop and every fragment of the tail: matrix[a, b] for the fragment from atom a to atom b of
+        the tail, NaN for a >= b. The fragments are not summed one by one - matrix[a, b] = S[b] - S[a], where S are
+        the cumulative sums of the GLN of single segments, so the n x n fragments cost only n x m segment pairs.
+        Returns the matrix and the GLN of single segments.
+    """
+    single = tail_gln(loop, tail)
+    cumulative = np.concatenate(([0.0], np.cumsum(single)))
+    matrix = cumulative[np.newaxis, :] - cumulative[:, np.newaxis]
+    matrix[np.tril_indices(len(cumulative))] = np.nan
+    return matrix, single
+
+
+def gln_colors(values, scale=1.0):
+    """
+        RGB colours (0-1) of GLN values: blue for positive, red for negative and white for 0, saturated at
+        |value| >= scale. NaN values are white.
+    """
+    values = np.nan_to_num(np.asarray(values, dtype=float))
+    fade = 1.0 - np.clip(np.abs(values) / scale, 0.0, 1.0)
+    colors = np.ones(values.shape + (3,))
+    colors[..., 0] = np.where(values > 0, fade, 1.0)
+    colors[..., 1] = fade
+    colors[..., 2] = np.where(values < 0, fade, 1.0)
+    return colors
+
+
+def tail_matrices(index, xyz, i, j):
+    """
+        GLN matrices of the N-terminal (t1) and C-terminal (t2) tail of the loop closed by atoms i and j. The
+        segments touching the bridge atoms are left out, as in the search for piercings. Returns a dictionary
+        {"t1": (residue indices of the tail, matrix, GLN of single segments), "t2": ...} without the tails shorter
+        than MIN_TAIL residues.
+    """
+    loop = xyz[i:j + 1]
+    tails = {"t1": np.arange(0, i), "t2": np.arange(j + 1, len(xyz))}
+    matrices = {}
+    for name, positions in tails.items():
+        if len(positions) >= MIN_TAIL:
+            matrix, single = gln_matrix(loop, xyz[positions])
+            matrices[name] = (index[positions], matrix, single)
+    return matrices
+
+
+def save_matrix(path, residues, matrix, first, last):
+    """
+        Saves the matrix of a tail as a compressed .npz archive: the residue indices of the tail, the matrix (float32,
+        NaN for a >= b) and the loop (first, last).
+    """
+    np.savez_compressed(path, residues=np.asarray(residues, dtype=np.int32), gln=matrix.astype(np.float32),
+                        loop=np.array([first, last], dtype=np.int32))
+
+
+def load_matrix(path):
+    """
+        Reads a matrix saved by save_matrix. Returns the residue indices of the tail and the matrix.
+    """
+    with np.load(path) as data:
+        return data["residues"], data["gln"]
+
+
+def extremes(matrix):
+    """
+        Positions (a, b) and values of the minimum and the maximum of the matrix.
+    """
+    low, high = np.nanargmin(matrix), np.nanargmax(matrix)
+    return (np.unravel_index(low, matrix.shape), matrix.flat[low]), (np.unravel_index(high, matrix.shape),
+                                                                     matrix.flat[high])
+
+
+def write_segment_colors(path, matrices):
+    """
+        Writes the GLN of single segments of both tails with their colours (scaled to the largest one), a line
+        "segment k id residue RGB r g b GLN value" per segment, which the plugin uses to colour the chain.
+    """
+    scale = max([np.abs(single).max() for _, _, single in matrices.values()] + [1e-12])
+    with open(path, "w") as f:
+        for residues, _, single in matrices.values():
+            colors = gln_colors(single, scale)
+            f.writelines("segment %d id %d RGB %.4f %.4f %.4f GLN %.6f\n" % (k, residues[k], colors[k][0],
+                                                                            colors[k][1], colors[k][2], single[k])
+                         for k in range(len(single)))
+
+
+def generate_gln(xyz_file, first, last, output_dir=None, smooth=0, cache=None):
+    """
+        Computes the GLN matrices of the tails of the loop first-last (residue indices) of the chain in the .xyz file
+        and writes them next to the files of detect_lassos: matrixGLN_<file>_<first>_<last>_t1.npz and _t2.npz (see
+        save_matrix) and surface_<file>_<first>_<last>_GLN1.txt (colours of segments), with a second set of files
+        (_smooth) for the smoothed chain if smooth > 0. With a result_cache.ResultCache the files computed before are
+        copied from it. Returns the paths of the written files.
+    """
+    if output_dir is None:
+        output_dir = os.path.dirname(os.path.abspath(xyz_file))
+    if cache is not None:
+        entry = cache.entry(xyz_file, first, last, "-sm_nr " + str(smooth), "gln " + result_cache.file_digest(__file__))
+        written = cache.restore(entry, xyz_file, output_dir)
+        if written is not None:
+            return [os.path.join(output_dir, i) for i in written.split()]
+        written = generate_gln(xyz_file, first, last, output_dir, smooth)
+        cache.store(entry, xyz_file, "\n".join(os.path.basename(i) for i in written), output_dir,
+                    [os.path.basename(i) for i in written])
+        return written
+
+    index, xyz, _ = lasso_engine.read_xyz(xyz_file)
+    i, j = lasso_engine.check_chain(index, xyz, int(first), int(last), check_distances=False)
+    base = os.path.basename(xyz_file)[:-4] + "_" + str(first) + "_" + str(last)
+
+    chains = [("", xyz)]
+    if smooth > 0:
+        chains.append(("_smooth", lasso_engine.smooth_chain(xyz, i, j, smooth)))
+    written = []
+    for suffix, coordinates in chains:
+        matrices = tail_matrices(index, coordinates, i, j)
+        for name, (residues, matrix, _) in matrices.items():
+            written.append(os.path.join(output_dir, "matrixGLN_" + base + "_" + name + suffix + ".npz"))
+            save_matrix(written[-1], residues, matrix, first, last)
+        if matrices:
+            written.append(os.path.join(output_dir, "surface_" + base + "_GLN1" + suffix + ".txt"))
+            write_segment_colors(written[-1], matrices)
+    return written
+
+
+def benchmark(residues=300, repeats=5):
+    """
+        Times the GLN matrix of the tails of a random chain with its middle third as the loop: every fragment summed
+        from the segment pairs and the cumulative sums of gln_matrix.
+    """
+    xyz = lasso_engine.random_chain(residues)
+    i, j = residues // 3, 2 * residues // 3
+    loop, tail = xyz[i:j + 1], xyz[:i]
+    print("  %d residues, tail of %d atoms, loop of %d atoms" % (residues, len(tail), len(loop)))
+
+    def fragments():
+        pairs = segment_gln(tail[:-1], tail[1:], loop, np.roll(loop, -1, axis=0))
+        return np.array([[pairs[a:b].sum() for b in range(len(tail))] for a in range(len(tail))])
+
+    for name, function, n in (("fragment by fragment", fragments, 1),
+                              ("gln_matrix", lambda: gln_matrix(loop, tail)[0], repeats)):
+        start = time.perf_counter()
+        for _ in range(n):
+            function()
+        print("  %-22s %10.2f ms" % (name, (time.perf_counter() - start) / n * 1000))
+
+
+if __name__ == "__main__":
+    benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 300)
@@ -0,0 +1,813 @@
+# -*- coding: utf-8 -*-
+# PyLasso: lasso detection in NumPy, run in the same process instead of the detect_lassos program.
+# ----------------------------------------------------------------------
+import os
+import sys
+import time
+
+import numpy as np
+
+import convert_pdb_2_5columns
+
+MIN_BRIDGE_DIST = 3.1
+MAX_BRIDGE_DIST = 10.0
+MIN_CA_DIST = 2.0
+MAX_CA_DIST = 4.2
+DEFAULT_REDUCTIONS = (10, 3, 3)  # redAC, redEnd, redBr
+GRID_CELL = 12.0  # angstrom, about three Ca-Ca bonds
+GRID_MIN_TESTS = 20000  # segment-triangle tests above which the tails are searched through a TriangleGrid
+GRID_MAX_SHARE = 0.05  # share of all the tests above which the grid gives way to the matrix products
+COHERENCE_RMSD = 1.0  # angstrom, RMSD to the last computed frame of a trajectory below which it may be carried over
+COHERENCE_RETEST = 0.25  # share of the close segment-triangle pairs tested again above which a frame is recomputed
+TRAJECTORY_HEADER = 8  # lines before the first frame in the traj_*.txt output, as written by detect_lassos
+
+
+class EngineError(Exception):
+    """
+        Failure reported in the way of detect_lassos - "ERROR(code): message".
+    """
+    def __init__(self, code, message):
+        Exception.__init__(self, "ERROR(%d): %s" % (code, message))
+        self.code = code
+
+
+def read_xyz(path):
+    """
+        Reads the .xyz file (index x y z residue per line) and returns the residue indices, the CA coordinates and
+        the residue names. For a trajectory only the first frame is read.
+    """
+    if not os.path.exists(path):
+        raise EngineError(0, "We couldn't open the file: " + path)
+    index, xyz, resname = [], [], []
+    with open(path, "r") as f:
+        for line in f:
+            words = line.split()
+            if len(words) == 0:
+                continue
+            if words[0].startswith("t"):
+                if index:
+                    break
+                continue
+            index.append(int(words[0]))
+            xyz.append([float(words[1]), float(words[2]), float(words[3])])
+            resname.append(words[4] if len(words) > 4 else "XXX")
+    if len(index) == 0:
+        raise EngineError(4, "Empty file " + path)
+    return np.array(index), np.array(xyz, dtype=float), resname
+
+
+def check_chain(index, xyz, first, last, check_distances=True):
+    """
+        Checks the chain and the loop the way detect_lassos does and returns the positions of the bridge residues.
+    """
+    if np.any(np.diff(index) <= 0):
+        k = int(np.argmax(np.diff(index) <= 0))
+        if index[k] == index[k + 1] and np.allclose(xyz[k], xyz[k + 1]):
+            raise EngineError(1, "Problem with data - two identical atoms with id " + str(index[k]))
+        raise EngineError(3, "problem with data - id " + str(index[k + 1]) + " is following id " + str(index[k]) +
+                          ". The end.")
+    positions = np.searchsorted(index, [first, last])
+    if first >= last or positions[1] >= len(index) or index[positions[0]] != first or index[positions[1]] != last:
+        raise EngineError(6, "Wrong arguments in the program'(begin,end)=(" + str(first) + "," + str(last) + ")")
+    i, j = int(positions[0]), int(positions[1])
+    if j - i + 1 < 3:
+        raise EngineError(7, "There are less than 3 points in the loop => no aim for triangulation. The end.")
+    if check_distances:
+        dist = np.linalg.norm(xyz[1:] - xyz[:-1], axis=1)
+        if np.any(dist < MIN_CA_DIST) or np.any(dist > MAX_CA_DIST):
+            k = int(np.argmax((dist < MIN_CA_DIST) | (dist > MAX_CA_DIST)))
+            raise EngineError(2, "problem with data - dist between ids " + str(index[k]) + " and " +
+                              str(index[k + 1]) + " is %.2f" % dist[k])
+        bridge = np.linalg.norm(xyz[j] - xyz[i])
+        if bridge > MAX_BRIDGE_DIST:
+            raise EngineError(8, "There is no bridge - distance between chosen atoms is greater than %.1f"
+                              % MAX_BRIDGE_DIST)
+        if bridge < MIN_BRIDGE_DIST:
+            raise EngineError(8, "There is no bridge - distance between chosen atoms is smaller than %.1f"
+                              % MIN_BRIDGE_DIST)
+    return i, j
+
+
+def contact_pairs(xyz, min_length=3, min_dist=MIN_BRIDGE_DIST, max_dist=MAX_BRIDGE_DIST):
+    """
+        Positions (i, j), i < j, of all atom pairs at a distance accepted for a bridge that close loops of at least
+        min_length atoms (see convert_pdb_2_5columns.contact_pairs).
+    """
+    return convert_pdb_2_5columns.contact_pairs(xyz, min_length, min_dist, max_dist)
+
+
+def smooth_chain(xyz, i, j, iterations):
+    """
+        Smooths the chain by averaging every atom with its neighbours. The ends of the chain and the bridge atoms
+        stay in place.
+    """
+    xyz = xyz.copy()
+    fixed = xyz[[0, i, j, len(xyz) - 1]]
+    for _ in range(iterations):
+        xyz[1:-1] = (xyz[:-2] + xyz[1:-1] + xyz[2:]) / 3.0
+        xyz[[0, i, j, len(xyz) - 1]] = fixed
+    return xyz
+
+
+def loop_surface(xyz, i, j):
+    """
+        Triangulates the loop closed by the bridge i-j: a fan of triangles (barycenter, atom k, atom k + 1), the last
+        one closing the loop through the bridge. Returns the triangles as a (T, 3, 3) array.
+    """
+    loop = xyz[i:j + 1]
+    centre = loop.mean(axis=0)
+    triangles = np.empty((len(loop), 3, 3))
+    triangles[:, 0] = centre
+    triangles[:, 1] = loop
+    triangles[:, 2] = np.roll(loop, -1, axis=0)
+    return triangles
+
+
+def surface_area(triangles):
+    return 0.5 * np.linalg.norm(np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0]),
+                                axis=1).sum()
+
+
+def segment_crossings(start, end, triangles, eps=1e-12):
+    """
+        Crossings of the segment start-end with the triangles (Moller-Trumbore). Returns the indices of the crossed
+        triangles and the signs of the crossings: +1 when the segment goes along the normal of the triangle (the
+        loop orientation), -1 otherwise. Of the edges shared by two triangles of the fan only one counts.
+    """
+    v0 = triangles[:, 0]
+    e1 = triangles[:, 1] - v0
+    e2 = triangles[:, 2] - v0
+    d = end - start
+    h = np.cross(d, e2)
+    a = np.einsum('ij,ij->i', e1, h)
+    ok = np.abs(a) > eps
+    f = np.where(ok, 1.0 / np.where(ok, a, 1.0), 0.0)
+    s = start - v0
+    u = f * np.einsum('ij,ij->i', s, h)
+    q = np.cross(s, e1)
+    v = f * np.einsum('j,ij->i', d, q)
+    t = f * np.einsum('ij,ij->i', e2, q)
+    hit = ok & (u >= 0) & (v > 0) & (u + v <= 1) & (t >= 0) & (t < 1)
+    crossed = np.nonzero(hit)[0]
+    signs = np.sign(np.einsum('j,ij->i', d, np.cross(e1[crossed], e2[crossed]))).astype(int)
+    return crossed, signs
+
+
+def box_cells(lo, hi):
+    """
+        All grid cells of the boxes given by their lowest and highest cells (n x 3 each). Returns the index of the
+        box and the cell (m x 3) of every box-cell pair.
+    """
+    dims = hi - lo + 1
+    counts = dims.prod(axis=1)
+    owner = np.repeat(np.arange(len(lo)), counts)
+    local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    dims = dims[owner]
+    z, rest = local % dims[:, 2], local // dims[:, 2]
+    y, x = rest % dims[:, 1], rest // dims[:, 1]
+    return owner, lo[owner] + np.stack([x, y, z], axis=1)
+
+
+class TriangleGrid:
+    """
+        Uniform grid over the bounding boxes of the surface triangles. Every cell lists the triangles whose boxes
+        overlap it, so a segment is only tested against the triangles of the cells its own box overlaps.
+    """
+    def __init__(self, triangles, cell=GRID_CELL):
+        self.triangles = triangles
+        self.cell = float(cell)
+        low, high = triangles.min(axis=1), triangles.max(axis=1)
+        self.origin = low.min(axis=0)
+        self.shape = np.floor((high.max(axis=0) - self.origin) / self.cell).astype(int) + 1
+        owner, cells = box_cells(self.to_cell(low), self.to_cell(high))
+        keys = np.ravel_multi_index(cells.T, self.shape)
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.owner = owner[order]
+
+    def to_cell(self, points):
+        return np.floor((points - self.origin) / self.cell).astype(int)
+
+    def candidates(self, starts, ends, limit=None):
+        """
+            Segment-triangle pairs whose bounding boxes share a cell, ordered by segment and triangle, or None if
+            the cells list more than `limit` pairs - in compact chains the long triangles of the fan fill most cells
+            around the barycentre and testing all the pairs is faster.
+        """
+        lo = self.to_cell(np.minimum(starts, ends))
+        hi = self.to_cell(np.maximum(starts, ends))
+        inside = np.nonzero(np.all(hi >= 0, axis=1) & np.all(lo < self.shape, axis=1))[0]
+        owner, cells = box_cells(np.clip(lo[inside], 0, self.shape - 1), np.clip(hi[inside], 0, self.shape - 1))
+        keys = np.ravel_multi_index(cells.T, self.shape)
+        first = np.searchsorted(self.keys, keys, "left")
+        counts = np.searchsorted(self.keys, keys, "right") - first
+        if limit is not None and counts.sum() > limit:
+            return None
+        position = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(first, counts)
+        pairs = np.unique(inside[np.repeat(owner, counts)] * len(self.triangles) + self.owner[position])
+        return pairs // len(self.triangles), pairs % len(self.triangles)
+
+
+def segments_crossings(starts, ends, triangles, grid=None, eps=1e-12, chunk=1 << 20, pairs=None):
+    """
+        Crossings of all segments starts[k]-ends[k] with all triangles at once (Moller-Trumbore written with scalar
+        triple products). Without a grid the segments crossing the plane of a triangle are found with two
+        (segments x 3) by (3 x triangles) matrix products, segments processed in parts of at most `chunk`
+        segment-triangle pairs to bound the memory; with a TriangleGrid of the triangles only the pairs sharing a
+        cell of the grid are tested (unless they are not much fewer than all the pairs), and with pairs (indices of
+        segments and of triangles) only those pairs. The pairs crossing the plane are then tested against the edges
+        of the triangle. Returns the indices of the crossing segments, the
+        indices of the crossed triangles and the signs as in segment_crossings, ordered by segment.
+    """
+    starts = np.asarray(starts, dtype=float).reshape(-1, 3)
+    ends = np.asarray(ends, dtype=float).reshape(-1, 3)
+    v0 = triangles[:, 0]
+    e1 = triangles[:, 1] - v0
+    e2 = triangles[:, 2] - v0
+    normal = np.cross(e1, e2)
+    v0_normal = np.einsum('ij,ij->i', v0, normal)
+
+    if pairs is None and grid is not None:
+        pairs = grid.candidates(starts, ends, GRID_MAX_SHARE * len(starts) * len(triangles))
+    if pairs is not None:
+        seg, tri = pairs
+        d = ends[seg] - starts[seg]
+        a = -np.einsum('ij,ij->i', d, normal[tri])                         # e1 . (d x e2)
+        t = np.einsum('ij,ij->i', starts[seg], normal[tri]) - v0_normal[tri]  # a * t
+        plane = (np.abs(a) > eps) & (t * a >= 0) & (np.abs(t) < np.abs(a))
+        parts = [(seg[plane], tri[plane], a[plane])]
+    else:
+        parts = []
+        step = max(1, chunk // max(1, len(triangles)))
+        for k in range(0, len(starts), step):
+            p = starts[k:k + step]
+            d = ends[k:k + step] - p
+            a = -(d @ normal.T)
+            t = p @ normal.T - v0_normal
+            seg, tri = np.nonzero((np.abs(a) > eps) & (t * a >= 0) & (np.abs(t) < np.abs(a)))
+            parts.append((seg + k, tri, a[seg, tri]))
+
+    e2_v0 = np.cross(e2, v0)
+    v0_e1 = np.cross(v0, e1)
+    segments, crossed, signs = [np.zeros(0, dtype=int)], [np.zeros(0, dtype=int)], [np.zeros(0, dtype=int)]
+    for seg, tri, a in parts:
+        d = ends[seg] - starts[seg]
+        m = np.cross(starts[seg], d)
+        u = (np.einsum('ij,ij->i', m, e2[tri]) - np.einsum('ij,ij->i', d, e2_v0[tri])) / a
+        v = (-np.einsum('ij,ij->i', m, e1[tri]) - np.einsum('ij,ij->i', d, v0_e1[tri])) / a
+        hit = (u >= 0) & (v > 0) & (u + v <= 1)
+        segments.append(seg[hit])
+        crossed.append(tri[hit])
+        signs.append(np.where(a[hit] > 0, -1, 1))
+    return np.concatenate(segments), np.concatenate(crossed), np.concatenate(signs)
+
+
+def tail_crossings(xyz, segments, triangles, grid=None):
+    """
+        Crossings of the tail segments (segment k joins atoms k and k + 1) with the surface, as (segment, sign,
+        triangle) in the order of the segments.
+    """
+    segments = np.fromiter(segments, dtype=int)
+    if len(segments) == 0:
+        return []
+    seg, crossed, signs = segments_crossings(xyz[segments], xyz[segments + 1], triangles, grid)
+    return [(int(segments[k]), int(sign), int(triangle)) for k, sign, triangle in zip(seg, signs, crossed)]
+
+
+def reduce_crossings(crossings, bridge, end, reductions):
+    """
+        Removes the shallow crossings of a tail given in the order from the loop to the end of the tail: those
+        closer than redEnd atoms to the end of the chain or redBr atoms to the bridge, and pairs of consecutive
+        crossings of opposite signs closer than redAC atoms to each other.
+    """
+    red_ac, red_end, red_br = reductions
+    deep = [c for c in crossings if abs(c[0] - end) >= red_end and abs(c[0] - bridge) >= red_br]
+    reduced = True
+    while reduced:
+        reduced = False
+        for k in range(len(deep) - 1):
+            if deep[k][1] != deep[k + 1][1] and abs(deep[k][0] - deep[k + 1][0]) < red_ac:
+                del deep[k:k + 2]
+                reduced = True
+                break
+    return deep
+
+
+def tail_type(signs, tail):
+    """
+        Type of the lasso made by a single tail from the signs of its crossings in the order from the loop: L when
+        the signs alternate (the tail goes back through the loop), LS (supercoiling) otherwise.
+    """
+    sign = ["-", "", "+"]
+    if all(signs[k] != signs[k + 1] for k in range(len(signs) - 1)):
+        return "L" + sign[signs[0] + 1] + str(len(signs)) + tail
+    return "LS" + str(len(signs)) + "".join(sign[s + 1] for s in signs) + tail
+
+
+def classify(n_signs, c_signs):
+    """
+        Type of the lasso (as in the lassos list of the plugin) from the signs of the deep crossings of both tails.
+    """
+    sign = ["-", "", "+"]
+    if len(n_signs) == 0 and len(c_signs) == 0:
+        return "L0"
+    if len(c_signs) == 0:
+        return tail_type(n_signs, "N")
+    if len(n_signs) == 0:
+        return tail_type(c_signs, "C")
+    return "LL" + sign[n_signs[0] + 1] + str(len(n_signs)) + "," + sign[c_signs[0] + 1] + str(len(c_signs))
+
+
+def find_lasso(index, xyz, i, j, reductions=DEFAULT_REDUCTIONS):
+    """
+        Detects the lasso of the loop closed by the atoms at positions i and j. Returns a dictionary with the
+        triangles and surface area, the crossings of both tails (all and deep ones, as (segment, sign, triangle)
+        ordered from the loop) and the lasso type.
+    """
+    triangles = loop_surface(xyz, i, j)
+    grid = TriangleGrid(triangles) if len(triangles) * (len(xyz) - len(triangles)) > GRID_MIN_TESTS else None
+    # segments touching the bridge atoms are left out - they meet the surface at its edge
+    n_all = tail_crossings(xyz, range(i - 2, -1, -1), triangles, grid)
+    c_all = tail_crossings(xyz, range(j + 1, len(xyz) - 1), triangles, grid)
+    n_deep = reduce_crossings(n_all, i, 0, reductions)
+    c_deep = reduce_crossings(c_all, j, len(xyz) - 1, reductions)
+    return {"triangles": triangles, "area": surface_area(triangles), "n_all": n_all, "c_all": c_all,
+            "n_deep": n_deep, "c_deep": c_deep,
+            "lasso": classify([c[1] for c in n_deep], [c[1] for c in c_deep])}
+
+
+def format_crossings(index, crossings):
+    """
+        Crossings labelled as detect_lassos does: the sign and the index of the first atom of the crossing segment,
+        in the order of the chain.
+    """
+    return [("+" if c[1] > 0 else "-") + str(index[c[0]]) for c in sorted(crossings)]
+
+
+def format_result(name, index, lasso):
+    """
+        The result in the layout of the detect_lassos output read by lasso_pipeline.LassoResult. Fields the engine
+        does not compute are written as "-".
+    """
+    first, last = lasso["first"], lasso["last"]
+    n_all, c_all = format_crossings(index, lasso["n_all"]), format_crossings(index, lasso["c_all"])
+    n_deep, c_deep = format_crossings(index, lasso["n_deep"]), format_crossings(index, lasso["c_deep"])
+    words = [name, str(first), str(last), str(last - first + 1), str(len(n_all)), str(len(c_all)), "-", "-"]
+    words += n_all + ["-"] + c_all + ["-", str(len(n_deep)), str(len(c_deep)), "-", "-"]
+    words += n_deep + ["-"] + c_deep + [lasso["lasso"], "-", "%.4f" % lasso["area"], "-"]
+    return " ".join(words)
+
+
+def read_trajectory(path):
+    """
+        Reads the frames of a trajectory .xyz file (a line "t <time>" before the atoms of every frame). Yields the
+        time, as written in the file, the residue indices and the CA coordinates of each frame.
+    """
+    frame_time, index, xyz = None, [], []
+    with open(path, "r") as f:
+        for line in f:
+            words = line.split()
+            if len(words) == 0:
+                continue
+            if words[0] == "t":
+                if frame_time is not None:
+                    yield frame_time, np.array(index), np.array(xyz, dtype=float)
+                frame_time, index, xyz = words[1], [], []
+                continue
+            index.append(int(words[0]))
+            xyz.append([float(words[1]), float(words[2]), float(words[3])])
+    if frame_time is not None:
+        yield frame_time, np.array(index), np.array(xyz, dtype=float)
+
+
+def superpose(reference, xyz):
+    """
+        Rotates and translates the chain onto the reference (Kabsch, without reflections). Returns the moved
+        coordinates, the RMSD and the displacements of the atoms.
+    """
+    reference_centre, centre = reference.mean(axis=0), xyz.mean(axis=0)
+    u, _, vt = np.linalg.svd((xyz - centre).T @ (reference - reference_centre))
+    rotation = vt.T @ np.diag([1.0, 1.0, np.sign(np.linalg.det(vt.T @ u.T))]) @ u.T
+    moved = (xyz - centre) @ rotation.T + reference_centre
+    shift = np.linalg.norm(moved - reference, axis=1)
+    return moved, float(np.sqrt((shift ** 2).mean())), shift
+
+
+def segment_distances(p1, q1, p2, q2, eps=1e-12):
+    """
+        Distances between the segments p1[k]-q1[k] and p2[k]-q2[k] (closest points clamped to the segments).
+    """
+    d1, d2, r = q1 - p1, q2 - p2, p1 - p2
+    a = np.maximum(np.einsum('ij,ij->i', d1, d1), eps)
+    e = np.maximum(np.einsum('ij,ij->i', d2, d2), eps)
+    b = np.einsum('ij,ij->i', d1, d2)
+    c = np.einsum('ij,ij->i', d1, r)
+    f = np.einsum('ij,ij->i', d2, r)
+    denominator = a * e - b * b
+    s = np.where(denominator > eps, np.clip((b * f - c * e) / np.maximum(denominator, eps), 0.0, 1.0), 0.0)
+    t = (b * s + f) / e
+    s = np.where(t < 0, np.clip(-c / a, 0.0, 1.0), np.where(t > 1, np.clip((b - c) / a, 0.0, 1.0), s))
+    t = np.clip(t, 0.0, 1.0)
+    return np.linalg.norm(p1 + d1 * s[:, None] - p2 - d2 * t[:, None], axis=1)
+
+
+def point_triangle_distances(points, triangles, eps=1e-12):
+    """
+        Distances between the points[k] and the triangles[k]: to the plane if the point projects inside the
+        triangle, to the nearest edge otherwise.
+    """
+    a, b, c = triangles[:, 0], triangles[:, 1], triangles[:, 2]
+    edges = [segment_distances(points, points, u, v) for u, v in ((a, b), (b, c), (c, a))]
+    e1, e2, w = b - a, c - a, points - a
+    d11, d12, d22 = [np.einsum('ij,ij->i', x, y) for x, y in ((e1, e1), (e1, e2), (e2, e2))]
+    w1, w2 = np.einsum('ij,ij->i', w, e1), np.einsum('ij,ij->i', w, e2)
+    denominator = d11 * d22 - d12 * d12
+    ok = denominator > eps
+    v = (d22 * w1 - d12 * w2) / np.where(ok, denominator, 1.0)
+    u = (d11 * w2 - d12 * w1) / np.where(ok, denominator, 1.0)
+    normal = np.cross(e1, e2)
+    plane = np.abs(np.einsum('ij,ij->i', w, normal)) / np.maximum(np.linalg.norm(normal, axis=1), eps)
+    return np.where(ok & (u >= 0) & (v >= 0) & (u + v <= 1), plane, np.minimum.reduce(edges))
+
+
+def surface_clearances(xyz, segments, triangles, limit, chunk=1 << 20):
+    """
+        Clearances of the pairs of a tail segment (atom k to k + 1) and a triangle of the surface: the smallest
+        distance between the segment and an edge of the triangle or between an end of the segment and the triangle.
+        A crossing can appear, vanish or change its sign only when the segment passes through an edge or its end
+        through the triangle, so the pair keeps its crossing while the segment and the triangle together move by
+        less than the clearance. Returns the segments, triangles and clearances of the pairs closer than the limit
+        by their bounding spheres; the clearances of the other pairs are at least the limit.
+    """
+    segments = np.asarray(segments, dtype=int)
+    found = [(np.zeros(0, dtype=int), np.zeros(0, dtype=int), np.zeros(0))]
+    if len(segments) == 0:
+        return found[0]
+    starts, ends = xyz[segments], xyz[segments + 1]
+    middles, halves = (starts + ends) / 2, np.linalg.norm(ends - starts, axis=1) / 2
+    centres = triangles.mean(axis=1)
+    radii = np.linalg.norm(triangles - centres[:, None], axis=2).max(axis=1)
+    step = max(1, chunk // len(triangles))
+    for k in range(0, len(segments), step):
+        gaps = np.linalg.norm(middles[k:k + step, None] - centres[None], axis=2) - halves[k:k + step, None] - radii
+        seg, tri = np.nonzero(gaps < limit)
+        seg += k
+        corners = triangles[tri]
+        distances = [segment_distances(starts[seg], ends[seg], corners[:, m], corners[:, (m + 1) % 3])
+                     for m in range(3)]
+        distances += [point_triangle_distances(starts[seg], corners), point_triangle_distances(ends[seg], corners)]
+        found.append((segments[seg], tri, np.minimum.reduce(distances)))
+    return tuple(np.concatenate(i) for i in zip(*found))
+
+
+def coherent_lasso(reference, index, xyz, i, j, reductions=DEFAULT_REDUCTIONS, tolerance=COHERENCE_RMSD):
+    """
+        Lasso of a trajectory frame derived from the reference - the coordinates, the lasso and the
+        surface_clearances (up to the limit) of the last fully computed frame. The frame is superposed on it; if the
+        RMSD is below the tolerance and no atom moves by half of the limit, only the pairs whose segment and
+        triangle moved by their clearance or more are tested again and the crossings of the other pairs are taken
+        from the reference. Among thousands of pairs a few nearly touch (e.g. a tail atom next to the bridge lying
+        on the surface), so most frames have some pairs to test; if they cross as in the reference, the lasso of
+        the reference is carried over as it is. Returns the lasso and whether its crossings changed, or None if the
+        frame has to be computed fully (more than COHERENCE_RETEST of the pairs to test).
+    """
+    coordinates, lasso, (seg, tri, clearance), limit = reference
+    if len(coordinates) != len(xyz):
+        return None
+    moved, rmsd, shift = superpose(coordinates, xyz)
+    centre_shift = np.linalg.norm(moved[i:j + 1].mean(axis=0) - coordinates[i:j + 1].mean(axis=0))
+    if rmsd >= tolerance or 2 * max(shift.max(), centre_shift) >= limit:
+        return None
+    loop = j - i + 1
+    retest = np.maximum(shift[seg], shift[seg + 1]) + \
+        np.maximum(np.maximum(shift[i + tri], shift[i + (tri + 1) % loop]), centre_shift) >= clearance
+    if retest.sum() > COHERENCE_RETEST * len(seg):
+        return None
+
+    # only the triangles of the pairs tested again are built, as loop_surface would build them
+    segments, retested = seg[retest], tri[retest]
+    corners = np.empty((len(retested), 3, 3))
+    corners[:, 0] = xyz[i:j + 1].mean(axis=0)
+    corners[:, 1] = xyz[i + retested]
+    corners[:, 2] = xyz[i + (retested + 1) % loop]
+    found, crossed, signs = segments_crossings(xyz[segments], xyz[segments + 1], corners,
+                                               pairs=(np.arange(len(segments)), np.arange(len(segments))))
+    tested = set(zip(segments.tolist(), retested.tolist()))
+    kept = [c for c in lasso["n_all"] + lasso["c_all"] if (c[0], c[2]) not in tested]
+    new = [(int(segments[k]), int(sign), int(retested[k])) for k, sign in zip(found, signs)]
+    if sorted(new) == sorted(c for c in lasso["n_all"] + lasso["c_all"] if (c[0], c[2]) in tested):
+        return lasso, False
+
+    crossings = kept + new
+    triangles = loop_surface(xyz, i, j)
+    n_all = sorted((c for c in crossings if c[0] < i), key=lambda c: (-c[0], c[2]))
+    c_all = sorted((c for c in crossings if c[0] > j), key=lambda c: (c[0], c[2]))
+    n_deep = reduce_crossings(n_all, i, 0, reductions)
+    c_deep = reduce_crossings(c_all, j, len(xyz) - 1, reductions)
+    return {"triangles": triangles, "area": surface_area(triangles), "n_all": n_all, "c_all": c_all,
+            "n_deep": n_deep, "c_deep": c_deep,
+            "lasso": classify([c[1] for c in n_deep], [c[1] for c in c_deep])}, True
+
+
+def trajectory_line(time, index, xyz, lasso, detailed=False):
+    """
+        Line of a frame in the traj_*.txt output in the layout of detect_lassos read by the plugin: the numbers and
+        indices of the deep piercings of both tails and the lasso type, or with detailed (-trajout 1) also all
+        piercings and the radius of gyration.
+    """
+    n_deep, c_deep = format_crossings(index, lasso["n_deep"]), format_crossings(index, lasso["c_deep"])
+    if not detailed:
+        return " ".join([time, str(len(n_deep)), str(len(c_deep)), "|"] + n_deep + ["|"] + c_deep +
+                        ["|", lasso["lasso"]])
+    n_all, c_all = format_crossings(index, lasso["n_all"]), format_crossings(index, lasso["c_all"])
+    gyration = np.sqrt(((xyz - xyz.mean(axis=0)) ** 2).sum(axis=1).mean())
+    return " ".join([time, str(len(n_all)), str(len(c_all)), "1", "X"] + n_all + ["X"] + c_all +
+                    ["XX", str(len(n_deep)), str(len(c_deep)), "X"] + n_deep + ["X"] + c_deep +
+                    ["XX", lasso["lasso"], "XX", "%.4f" % gyration])
+
+
+def detect_trajectory(xyz_file, first, last, step=1, check_distances=True, reductions=DEFAULT_REDUCTIONS,
+                      detailed=False, output_dir=None, tolerance=COHERENCE_RMSD, verify=False, cancelled=None):
+    """
+        Detects the lasso of the loop first-last in every step-th frame of the trajectory .xyz file and writes a line
+        per frame to traj_<file>_<first>_<last>.txt in output_dir (the directory of the .xyz file by default).
+        Consecutive frames barely move, so with tolerance > 0 a frame close to the last fully computed one is
+        derived from it by coherent_lasso, which tests again only the segment-triangle pairs that might have changed
+        and carries the lasso of the reference over if they did not; other frames are computed fully and become the
+        reference. With verify the derived frames are also computed fully and compared. Returns a summary: the
+        numbers of computed, carried (the lasso of the reference) and partly tested (changed crossings) frames, the
+        time and with verify the speed-up over full computation and the frames that differ.
+    """
+    if not os.path.exists(xyz_file):
+        raise EngineError(0, "We couldn't open the file: " + xyz_file)
+    if output_dir is None:
+        output_dir = os.path.dirname(os.path.abspath(xyz_file))
+    output_file = os.path.join(output_dir, "traj_" + os.path.basename(xyz_file)[:-4] + "_" + str(first) + "_" +
+                               str(last) + ".txt")
+    counts = {"frames": 0, "computed": 0, "carried": 0, "retested": 0}
+    times = {"computed": 0.0, "derived": 0.0, "verify": 0.0}
+    differ = []
+    reference = None  # coordinates, lasso, clearances and their limit of the last fully computed frame
+    with open(output_file, "w") as output:
+        for k, (frame_time, index, xyz) in enumerate(read_trajectory(xyz_file)):
+            if k % step != 0:
+                continue
+            if cancelled is not None and cancelled():
+                break
+            if counts["frames"] == 0:
+                output.write("Trajectory " + xyz_file + " analysed by the Python engine\n")
+                output.write("chain %d %d %d %d\n" % (index[0], index[-1], first, last))
+                output.write("step %d, piercings derived from similar frames below RMSD %.2f A\n" % (step, tolerance))
+                output.write("\n" * (TRAJECTORY_HEADER - 3))
+            counts["frames"] += 1
+            start = time.perf_counter()
+            try:
+                i, j = check_chain(index, xyz, first, last, check_distances)
+            except EngineError as e:
+                output.write(frame_time + " ERROR " + str(e) + "\n")
+                continue
+            derived = coherent_lasso(reference, index, xyz, i, j, reductions, tolerance) if reference else None
+            if derived is not None:
+                lasso = derived[0]
+                counts["retested" if derived[1] else "carried"] += 1
+                times["derived"] += time.perf_counter() - start
+                if verify:
+                    start = time.perf_counter()
+                    full = find_lasso(index, xyz, i, j, reductions)
+                    times["verify"] += time.perf_counter() - start
+                    if trajectory_line(frame_time, index, xyz, full, True) != \
+                            trajectory_line(frame_time, index, xyz, lasso, True):
+                        differ.append(frame_time)
+            else:
+                lasso = find_lasso(index, xyz, i, j, reductions)
+                if tolerance > 0:
+                    segments = list(range(i - 2, -1, -1)) + list(range(j + 1, len(xyz) - 1))
+                    reference = (xyz, lasso, surface_clearances(xyz, segments, lasso["triangles"], 4 * tolerance),
+                                 4 * tolerance)
+                counts["computed"] += 1
+                times["computed"] += time.perf_counter() - start
+            output.write(trajectory_line(frame_time, index, xyz, lasso, detailed) + "\n")
+            output.flush()
+
+    summary = "TRAJECTORY %s frames %d computed %d carried %d retested %d time %.3f s" % (
+        xyz_file, counts["frames"], counts["computed"], counts["carried"], counts["retested"],
+        times["computed"] + times["derived"])
+    if verify:
+        summary += " speed-up %.2f differ %d" % ((times["computed"] + times["verify"]) /
+                                                 max(1e-9, times["computed"] + times["derived"]), len(differ))
+        summary += "".join(" " + i for i in differ)
+    return summary + "\n"
+
+
+def write_jms(path, lasso):
+    """
+        Writes the surface in the JSmol format read by the plugin: the triangles, then the crossed triangles coloured
+        by the sign of the crossing (gray for shallow crossings).
+    """
+    deep = set((c[0], c[2]) for c in lasso["n_deep"] + lasso["c_deep"])
+    with open(path, "w") as f:
+        for k, triangle in enumerate(lasso["triangles"]):
+            f.write("draw polygon%d [%s]; \n" % (k, " ".join("{%.2f %.2f %.2f}" % tuple(v) for v in triangle)))
+        f.write("color $polygon* [xDDDDDD];\n")
+        for k, c in enumerate(lasso["n_all"] + lasso["c_all"]):
+            color = ("blue" if c[1] > 0 else "green") if (c[0], c[2]) in deep else "gray"
+            f.write("draw polygon_int%d [%s]; \n" % (k, " ".join("{%.2f %.2f %.2f}" % tuple(v)
+                                                                   for v in lasso["triangles"][c[2]])))
+            f.write("color $polygon_int%d %s; \n" % (k, color))
+
+
+def write_pdb(path, index, xyz, resname, chain):
+    with open(path, "w") as f:
+        for k in range(len(index)):
+            f.write("ATOM  %5d  CA  %s %s%4d    %8.3f%8.3f%8.3f  1.00  1.00           C\n"
+                    % (k + 1, resname[k], chain, index[k], xyz[k][0], xyz[k][1], xyz[k][2]))
+
+
+def detect_lassos(xyz_file, first, last, smooth=0, check_distances=True, reductions=DEFAULT_REDUCTIONS,
+                  output_dir=None, write_files=True):
+    """
+        Detects the lasso of the loop first-last (residue indices) of the chain in the .xyz file and returns the
+        output in the detect_lassos layout, with a SMOOTH line for the smoothed chain if smooth > 0. With
+        write_files the surfaces (surface_*.jms) and the smoothed chain (*_smooth.pdb) are written to output_dir
+        (the directory of the .xyz file by default), named like the files of detect_lassos.
+    """
+    try:
+        index, xyz, resname = read_xyz(xyz_file)
+        i, j = check_chain(index, xyz, first, last, check_distances)
+    except EngineError as e:
+        return str(e) + "\n"
+
+    if output_dir is None:
+        output_dir = os.path.dirname(os.path.abspath(xyz_file))
+    base = os.path.basename(xyz_file)[:-4] + "_" + str(first) + "_" + str(last)
+    chain = base.split("_")[-3] if len(base.split("_")[-3]) == 1 else "A"
+
+    lasso = find_lasso(index, xyz, i, j, reductions)
+    lasso["first"], lasso["last"] = first, last
+    output = format_result(xyz_file, index, lasso) + "\n"
+    if write_files:
+        write_jms(os.path.join(output_dir, "surface_" + base + ".jms"), lasso)
+
+    if smooth > 0:
+        smoothed = smooth_chain(xyz, i, j, smooth)
+        smooth_lasso = find_lasso(index, smoothed, i, j, reductions)
+        smooth_lasso["first"], smooth_lasso["last"] = first, last
+        output += "SMOOTH_" + format_result(xyz_file, index, smooth_lasso) + "\n"
+        if write_files:
+            write_jms(os.path.join(output_dir, "surface_" + base + "_smooth.jms"), smooth_lasso)
+            write_pdb(os.path.join(output_dir, base + "_smooth.pdb"), index, smoothed, resname, chain)
+    return output
+
+
+def default_tolerance():
+    """
+        RMSD tolerance of the temporal coherence of trajectories - PYLASSO_COHERENCE (in angstrom, 0 turns it off)
+        if set, otherwise COHERENCE_RMSD.
+    """
+    tolerance = os.environ.get("PYLASSO_COHERENCE", "")
+    return float(tolerance) if tolerance.replace(".", "", 1).isdigit() else COHERENCE_RMSD
+
+
+def run_command(command, cwd=None, cancelled=None):
+    """
+        Runs a detect_lassos command line (program file first last [options]) with the engine. Trajectories (-traj)
+        are analysed by detect_trajectory with the tolerance of default_tolerance, verified against full computation
+        if PYLASSO_COHERENCE_VERIFY is set; cancelled is checked between their frames.
+    """
+    words = list(filter(len, command.split(" ")))
+    options = dict(zip(words[4::2], words[5::2]))
+    if len(words) < 4 or not words[2].lstrip("-").isdigit() or not words[3].lstrip("-").isdigit():
+        return "ERROR(5) Wrong arguments.\n"
+
+    reductions = DEFAULT_REDUCTIONS
+    if "-redAC" in options:
+        reductions = (int(options["-redAC"]), int(options.get("-redEnd", DEFAULT_REDUCTIONS[1])),
+                      int(options.get("-redBr", DEFAULT_REDUCTIONS[2])))
+    if "-traj" in options and options["-traj"] != "0":
+        step = int(options["-step"]) if options.get("-step", "").isdigit() and int(options["-step"]) > 0 else 1
+        try:
+            return detect_trajectory(words[1], int(words[2]), int(words[3]), step,
+                                     options.get("-cd", "1") != "0", reductions, options.get("-trajout", "0") == "1",
+                                     cwd, default_tolerance(), bool(os.environ.get("PYLASSO_COHERENCE_VERIFY")),
+                                     cancelled)
+        except EngineError as e:
+            return str(e) + "\n"
+    return detect_lassos(words[1], int(words[2]), int(words[3]), smooth=int(options.get("-sm_nr", 0)),
+                         check_distances=options.get("-cd", "1") != "0", reductions=reductions, output_dir=cwd,
+                         write_files=options.get("-f", "0") != "0")
+
+
+def random_chain(residues, seed=0):
+    """
+        Random walk of Ca atoms 3.8 angstrom apart, used by the benchmark.
+    """
+    steps = np.random.default_rng(seed).normal(size=(residues - 1, 3))
+    steps *= 3.8 / np.linalg.norm(steps, axis=1)[:, None]
+    return np.vstack([np.zeros((1, 3)), np.cumsum(steps, axis=0)])
+
+
+def benchmark(residues=1000, repeats=5):
+    """
+        Times the piercing search of the tails of a random chain through the surface of its middle third: scalar
+        tests in Python, segment by segment with segment_crossings, all at once with segments_crossings and through
+        a TriangleGrid of the surface (including building the grid).
+    """
+    xyz = random_chain(residues)
+    i, j = residues // 3, 2 * residues // 3
+    triangles = loop_surface(xyz, i, j)
+    segments = np.array(list(range(i - 2, -1, -1)) + list(range(j + 1, residues - 1)))
+    print("  %d residues, %d tail segments x %d triangles = %d tests" % (residues, len(segments), len(triangles),
+                                                                       len(segments) * len(triangles)))
+
+    def python_loop():
+        found = 0
+        corners = triangles.tolist()
+        chain = xyz.tolist()
+        for k in segments:
+            p, q = chain[k], chain[k + 1]
+            d = [q[0] - p[0], q[1] - p[1], q[2] - p[2]]
+            for v0, v1, v2 in corners:
+                e1 = [v1[0] - v0[0], v1[1] - v0[1], v1[2] - v0[2]]
+                e2 = [v2[0] - v0[0], v2[1] - v0[1], v2[2] - v0[2]]
+                h = [d[1] * e2[2] - d[2] * e2[1], d[2] * e2[0] - d[0] * e2[2], d[0] * e2[1] - d[1] * e2[0]]
+                a = e1[0] * h[0] + e1[1] * h[1] + e1[2] * h[2]
+                if abs(a) < 1e-12:
+                    continue
+                s = [p[0] - v0[0], p[1] - v0[1], p[2] - v0[2]]
+                u = (s[0] * h[0] + s[1] * h[1] + s[2] * h[2]) / a
+                if u < 0 or u > 1:
+                    continue
+                r = [s[1] * e1[2] - s[2] * e1[1], s[2] * e1[0] - s[0] * e1[2], s[0] * e1[1] - s[1] * e1[0]]
+                v = (d[0] * r[0] + d[1] * r[1] + d[2] * r[2]) / a
+                t = (e2[0] * r[0] + e2[1] * r[1] + e2[2] * r[2]) / a
+                if v > 0 and u + v <= 1 and 0 <= t < 1:
+                    found += 1
+        return found
+
+    def per_segment():
+        return sum(len(segment_crossings(xyz[k], xyz[k + 1], triangles)[0]) for k in segments)
+
+    def batched():
+        return len(segments_crossings(xyz[segments], xyz[segments + 1], triangles)[0])
+
+    def grid():
+        return len(segments_crossings(xyz[segments], xyz[segments + 1], triangles, TriangleGrid(triangles))[0])
+
+    # above GRID_MAX_SHARE of the tests segments_crossings falls back to the matrix products
+    tested = len(TriangleGrid(triangles).candidates(xyz[segments], xyz[segments + 1])[0])
+    avoided = 100.0 - 100.0 * tested / (len(segments) * len(triangles))
+    print("  grid of %.1f A cells: %d tests (%.2f%% avoided)" % (GRID_CELL, tested, avoided))
+    for name, function, n in (("scalar Python", python_loop, 1), ("segment by segment", per_segment, repeats),
+                              ("segments_crossings", batched, repeats), ("TriangleGrid", grid, repeats)):
+        start = time.perf_counter()
+        for _ in range(n):
+            found = function()
+        print("  %-22s %10.2f ms  (%d crossings)" % (name, (time.perf_counter() - start) / n * 1000, found))
+
+
+def random_trajectory(path, frames, residues, noise=0.05, seed=0):
+    """
+        Writes a trajectory of a random chain fluctuating around its shape (each atom by about `noise` angstrom,
+        correlated between consecutive frames), used by the benchmark.
+    """
+    rng = np.random.default_rng(seed)
+    xyz = random_chain(residues, seed)
+    fluctuation = np.zeros_like(xyz)
+    with open(path, "w") as f:
+        for k in range(frames):
+            fluctuation = 0.9 * fluctuation + rng.normal(scale=noise * np.sqrt(1 - 0.81), size=xyz.shape)
+            f.write("t %d.00000\n" % k)
+            f.writelines("%d %.3f %.3f %.3f\n" % (n + 1, x, y, z) for n, (x, y, z) in enumerate(xyz + fluctuation))
+
+
+def benchmark_trajectory(frames=1000, residues=300, noise=0.05):
+    """
+        Times the lasso of the middle third of a fluctuating random chain (random_trajectory) over the frames,
+        computed fully in every frame and with the piercings carried over (detect_trajectory), and compares the
+        outputs.
+    """
+    import shutil
+    import tempfile
+    directory = tempfile.mkdtemp()
+    try:
+        path = os.path.join(directory, "random_A.xyz")
+        random_trajectory(path, frames, residues, noise)
+        first, last = residues // 3, 2 * residues // 3
+        lines = {}
+        for name, tolerance in (("full", 0.0), ("coherence", COHERENCE_RMSD)):
+            start = time.perf_counter()
+            summary = detect_trajectory(path, first, last, check_distances=False, detailed=True,
+                                        tolerance=tolerance, verify=True)
+            print("  %-10s %10.2f s  %s" % (name, time.perf_counter() - start, summary.split(" ", 2)[2].strip()))
+            with open(os.path.join(directory, "traj_random_A_%d_%d.txt" % (first, last))) as f:
+                lines[name] = f.readlines()[TRAJECTORY_HEADER:]
+        print("  %d frames, %d differ" % (frames, sum(a != b for a, b in zip(lines["full"], lines["coherence"]))))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "traj":
+        benchmark_trajectory(*[int(i) for i in sys.argv[2:4]], *[float(i) for i in sys.argv[4:5]])
+    else:
+        benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,616 @@
+# -*- coding: utf-8 -*-
+# PyLasso: running the detect_lassos program outside of the graphical interface.
+# ----------------------------------------------------------------------
+import json
+import os
+import re
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import convert_pdb_2_5columns
+import lasso_engine
+import result_cache
+
+MIN_CONTACT_LOOP = 10  # shortest loop (in residues) scanned in the contacts mode
+MIN_SHARD_FRAMES = 100  # fewer analysed frames are not worth another detect_lassos process
+TRAJECTORY_HEADER = 8  # lines before the first frame in the traj_*.txt output of detect_lassos
+TRAJECTORY_CHECKPOINT = ".ckpt"  # suffix of the checkpoint written next to the traj_*.txt outputs by update_trajectory
+
+
+def default_workers():
+    """
+        Number of detect_lassos processes run at the same time - PYLASSO_WORKERS if set, otherwise the number of CPUs.
+    """
+    workers = os.environ.get("PYLASSO_WORKERS", "")
+    if workers.isdigit() and int(workers) > 0:
+        return int(workers)
+    return os.cpu_count() or 1
+
+
+def default_engine():
+    """
+        Program detecting lassos - PYLASSO_ENGINE if set ("binary" for detect_lassos, "numpy" for the experimental
+        Python engine of lasso_engine), otherwise detect_lassos.
+    """
+    engine = os.environ.get("PYLASSO_ENGINE", "binary").lower()
+    return engine if engine in ("binary", "numpy") else "binary"
+
+
+def is_trajectory_command(command):
+    words = command.split(" ") + [""]
+    return "-traj" in words and words[words.index("-traj") + 1] != "0"
+
+
+class Cancelled(Exception):
+    pass
+
+
+class Cancellation:
+    """
+        Cancellation of the commands run by other threads: cancel() terminates the detect_lassos processes in
+        progress, which then raise Cancelled, as do the commands started later.
+    """
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.processes = set()
+        self.lock = threading.Lock()
+
+    def cancel(self):
+        with self.lock:
+            self.event.set()
+            for process in self.processes:
+                process.terminate()
+
+    def is_cancelled(self):
+        return self.event.is_set()
+
+    def check(self):
+        if self.event.is_set():
+            raise Cancelled("The calculations were cancelled.")
+
+    def start(self, args, cwd=None):
+        with self.lock:
+            self.check()
+            process = subprocess.Popen(args, cwd=cwd, stdout=subprocess.PIPE)
+            self.processes.add(process)
+        return process
+
+    def finish(self, process):
+        with self.lock:
+            self.processes.discard(process)
+        self.check()
+
+
+def run_command(command, cwd=None, engine="binary", cancellation=None):
+    """
+        Runs a single command given as a space separated string and returns its standard output. With the numpy
+        engine it is run in this process by lasso_engine. With a Cancellation the process can be terminated by
+        another thread (the engine stops between the frames of a trajectory).
+    """
+    if cancellation is not None:
+        cancellation.check()
+    if engine == "numpy":
+        output = lasso_engine.run_command(command, cwd, cancellation.is_cancelled if cancellation else None)
+        if cancellation is not None:
+            cancellation.check()
+        return output
+    if cancellation is None:
+        return subprocess.Popen(command.split(" "), cwd=cwd, stdout=subprocess.PIPE).communicate()[0].decode('utf-8')
+    process = cancellation.start(command.split(" "), cwd)
+    try:
+        output = process.communicate()[0].decode('utf-8')
+    finally:
+        cancellation.finish(process)
+    return output
+
+
+def engine_version(program, engine):
+    """
+        String identifying the program run for a command in the keys of the result cache: a digest of the
+        detect_lassos program or of the Python engine.
+    """
+    if engine == "numpy":
+        return "numpy " + result_cache.file_digest(lasso_engine.__file__)
+    return "binary " + result_cache.file_digest(program)
+
+
+def output_directory(command, cwd=None, engine="binary"):
+    """
+        Directory the files of a command are written to: cwd, or without it the directory of the .xyz file for the
+        numpy engine and the current directory for detect_lassos.
+    """
+    if cwd:
+        return cwd
+    if engine == "numpy":
+        return os.path.dirname(os.path.abspath(list(filter(len, command.split(" ")))[1]))
+    return os.getcwd()
+
+
+def run_cached_command(command, cwd=None, engine="binary", cache=None, cancellation=None):
+    """
+        Runs a command (see run_command) unless its result is in the cache - then the output is returned and the
+        files of the loop are restored to the output directory. New results are stored. Trajectories and malformed
+        commands are not cached.
+    """
+    words = list(filter(len, command.split(" ")))
+    if cache is None or is_trajectory_command(command) or len(words) < 4 or not os.path.isfile(words[1]) or \
+            (engine != "numpy" and not os.path.isfile(words[0])):
+        return run_command(command, cwd, engine, cancellation)
+    program, xyz_file, first, last = words[:4]
+    entry = cache.entry(xyz_file, first, last, " ".join(words[4:]), engine_version(program, engine))
+    directory = output_directory(command, cwd, engine)
+    output = cache.restore(entry, xyz_file, directory)
+    if output is None:
+        output = run_command(command, cwd, engine, cancellation)
+        if len(output) and not error_pattern.search(output):
+            cache.store(entry, xyz_file, output, directory, result_cache.result_files(directory, xyz_file, first, last))
+    return output
+
+
+def iter_commands(commands, cwd=None, workers=None, engine=None, cache=None, cancellation=None):
+    """
+        Runs independent commands (e.g. detect_lassos for different loops) concurrently, with at most `workers`
+        processes at a time, and yields the outputs in the order of the commands as soon as they are ready. With a
+        result_cache.ResultCache the results computed before are taken from it (see run_cached_command) and the
+        least recently used entries are evicted at the end. A cancelled Cancellation stops the commands with
+        Cancelled.
+    """
+    if workers is None:
+        workers = default_workers()
+    if engine is None:
+        engine = default_engine()
+    workers = max(1, min(workers, len(commands)))
+    if workers == 1:
+        for command in commands:
+            yield run_cached_command(command, cwd, engine, cache, cancellation)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for output in pool.map(lambda command: run_cached_command(command, cwd, engine, cache, cancellation),
+                                   commands):
+                yield output
+    if cache is not None:
+        cache.evict()
+
+
+def run_commands(commands, cwd=None, workers=None, engine=None, cache=None, cancellation=None, progress=None):
+    """
+        Runs independent commands concurrently (see iter_commands) and returns the outputs in the order of the
+        commands. progress is called with the number of finished commands and of all of them after every command.
+    """
+    outputs = []
+    for output in iter_commands(commands, cwd, workers, engine, cache, cancellation):
+        outputs.append(output)
+        if progress is not None:
+            progress(len(outputs), len(commands))
+    return outputs
+
+
+error_pattern = re.compile("ERROR\\(([0-9]+)\\)")
+
+
+class LassoResult:
+    """
+        The result of detect_lassos for one loop, parsed once from its output. Piercings are kept as printed by the
+        program, e.g. "+12" or "-40"; n_deep_piercings and c_deep_piercings are the piercings left after shallow
+        ones were removed and smooth_n_piercings, smooth_c_piercings those of the smoothed chain. For a failed run
+        only error (the error code) and error_message are set.
+    """
+    def __init__(self, output):
+        self.output = output
+        self.name = ""
+        self.first = None
+        self.last = None
+        self.lasso = None
+        self.area = None
+        self.n_piercings = []
+        self.c_piercings = []
+        self.n_deep_piercings = []
+        self.c_deep_piercings = []
+        self.smooth_n_piercings = []
+        self.smooth_c_piercings = []
+        self.has_shallow_n = False
+        self.has_shallow_c = False
+        self.error = None
+        self.error_message = ""
+
+        main = output.split("SMOOTH")[0]
+        if len(main.strip()) == 0:
+            self.error = 0
+            self.error_message = "ERROR: no output of detect_lassos"
+            return
+        if "ERROR" in main:
+            self.error_message = main[main.index("ERROR"):].strip().split("\n")[0]
+            error = error_pattern.search(main)
+            self.error = int(error.group(1)) if error else 0
+            return
+
+        elem = main.split(" ")
+        n, c = int(elem[4]), int(elem[5])
+        self.name = elem[0]
+        self.first = int(elem[1])
+        self.last = int(elem[2])
+        self.lasso = elem[-4]
+        self.area = float(elem[-2])
+        self.n_piercings, self.c_piercings = self.get_piercings(elem)
+
+        # piercings without the shallow ones follow: their numbers at 10 + n + c and 11 + n + c, then the lists
+        n_deep, c_deep = int(elem[10 + n + c]), int(elem[11 + n + c])
+        self.n_deep_piercings = elem[14 + n + c:14 + n + c + n_deep]
+        self.c_deep_piercings = elem[15 + n + c + n_deep:15 + n + c + n_deep + c_deep]
+        self.has_shallow_n = n != 0 and elem[4] != elem[10 + n + c]
+        self.has_shallow_c = c != 0 and elem[5] != elem[11 + n + c]
+
+        smooth = list(filter(len, output.splitlines()))[-1]
+        if "ERROR" not in smooth:
+            self.smooth_n_piercings, self.smooth_c_piercings = self.get_piercings(smooth.split(" "))
+
+    @staticmethod
+    def get_piercings(elem):
+        n, c = int(elem[4]), int(elem[5])
+        return elem[8:8 + n], elem[9 + n:9 + n + c]
+
+    def is_error(self):
+        return self.error is not None
+
+    def loop_length(self):
+        return self.last - self.first + 1
+
+
+def parse_result(output):
+    """
+        Parses the output of a single detect_lassos run into a LassoResult.
+    """
+    return LassoResult(output)
+
+
+def result_summary(result):
+    """
+        Lasso type, N- and C-terminal piercings (without the shallow ones) and the surface area of the loop, or the
+        error message.
+    """
+    if result.is_error():
+        return [result.error_message, "", "", ""]
+    n_piercings = result.n_deep_piercings if result.has_shallow_n else result.n_piercings
+    c_piercings = result.c_deep_piercings if result.has_shallow_c else result.c_piercings
+    return [result.lasso, ",".join(n_piercings), ",".join(c_piercings), "%.2f" % result.area]
+
+
+def detection_options(gln=False, smooth="", bad_caca=False, reductions=None, files=True):
+    """
+        Options appended to every detect_lassos command: output format, smoothing, the Ca-Ca distance check and the
+        reduction of shallow crossings given as (redAC, redEnd, redBr) - None keeps the stable lassos only. Without
+        files no surfaces and pictures are written (nor GLN matrices).
+    """
+    options = " -f " + (("3" if gln else "2") if files else "0")
+    if len(str(smooth)) > 0:
+        options += " -sm_nr " + str(smooth)
+    if bad_caca:
+        options += " -cd 0"
+    if reductions is not None:
+        options += " -redAC " + str(reductions[0]) + " -redEnd " + str(reductions[1]) + " -redBr " + str(reductions[2])
+    return options
+
+
+def bridge_loops(bridges, bridge_type=None):
+    """
+        Chooses the bridges closing the loops, one per loop. With a bridge_type given only bridges of that type
+        (or "-like") are taken, unless there are none - then all of them are. Returns the bridges as
+        (type, first, last) and whether a bridge of the given type was found.
+    """
+    bridges = [(bridge[0], str(min(bridge[1], bridge[2])), str(max(bridge[1], bridge[2]))) for bridge in bridges]
+    found = True
+    if bridge_type is not None:
+        selected = [bridge for bridge in bridges
+                    if bridge[0] == bridge_type.upper() or bridge[0] == bridge_type.upper() + "-like"]
+        found = len(selected) > 0
+        if found:
+            bridges = selected
+
+    loops = []
+    seen = set()
+    for bridge in bridges:
+        if (bridge[1], bridge[2]) not in seen:
+            seen.add((bridge[1], bridge[2]))
+            loops.append(bridge)
+    return loops, found
+
+
+def loop_commands(program_execution, xyz_file, loops):
+    """
+        detect_lassos commands for the loops given as (first, last) residue pairs, without repetitions.
+    """
+    commands = []
+    for first, last in loops:
+        command = program_execution + xyz_file + " " + str(first) + " " + str(last)
+        if command not in commands:
+            commands.append(command)
+    return commands
+
+
+def contact_loops(xyz_file, min_length=MIN_CONTACT_LOOP):
+    """
+        Loops of the chain in the .xyz file closed by every pair of residues whose CA atoms are at a distance
+        accepted by detect_lassos for a bridge (3.1-10 A), at least min_length residues long, as (first, last).
+    """
+    index, xyz, _ = lasso_engine.read_xyz(xyz_file)
+    first, last = lasso_engine.contact_pairs(xyz, min_length)
+    return [(int(index[i]), int(index[j])) for i, j in zip(first, last)]
+
+
+def scan_contacts(program_execution, xyz_file, options, output_file, cwd=None, workers=None, engine=None,
+                  min_length=MIN_CONTACT_LOOP, cancellation=None, progress=None):
+    """
+        Detects lassos for all the contact_loops of the chain. Every result is written to output_file (tab separated,
+        one loop per line) as soon as it is ready instead of being kept until the end. Returns the number of loops
+        and the number of lassos found. cancellation and progress as in run_commands.
+    """
+    loops = contact_loops(xyz_file, min_length)
+    commands = [i + options for i in loop_commands(program_execution, xyz_file, loops)]
+    lassos = 0
+    with open(output_file, "w") as f:
+        f.write("\t".join(["first", "last", "lasso", "N_piercings", "C_piercings", "area"]) + "\n")
+        for k, (loop, output) in enumerate(zip(loops, iter_commands(commands, cwd, workers, engine,
+                                                                     cancellation=cancellation))):
+            result = parse_result(output)
+            if not result.is_error() and result.lasso != "L0":
+                lassos += 1
+            f.write("\t".join([str(loop[0]), str(loop[1])] + result_summary(result)) + "\n")
+            f.flush()
+            if progress is not None:
+                progress(k + 1, len(loops))
+    return len(loops), lassos
+
+
+def read_frame_index(xyz_file):
+    """
+        (time, offset, length) of every frame of the trajectory .xyz file from the .idx file written with it by
+        convert_pdb_2_5columns.parse_traj, or None if there is no up-to-date index.
+    """
+    index_file = xyz_file[:-4] + ".idx"
+    if not os.path.exists(index_file) or os.path.getmtime(index_file) < os.path.getmtime(xyz_file):
+        return None
+    with open(index_file, "r") as f:
+        return [(time, int(offset), int(length)) for time, offset, length in (line.split() for line in f)]
+
+
+def trajectory_shards(frames, step=1, shards=1, min_frames=MIN_SHARD_FRAMES):
+    """
+        Splits the frames into at most `shards` ranges [begin, end) of consecutive frames with at least min_frames
+        analysed frames each. Every range starts at a multiple of the step, so detect_lassos -step analyses the same
+        frames in the shards as in the whole trajectory.
+    """
+    analysed = (frames + step - 1) // step
+    shards = max(1, min(shards, analysed // max(1, min_frames)))
+    per_shard = (analysed + shards - 1) // shards * step
+    return [(begin, min(frames, begin + per_shard)) for begin in range(0, frames, per_shard)]
+
+
+def write_trajectory_shard(xyz_file, index, begin, end, path, block=1 << 20):
+    """
+        Copies the frames begin to end - 1 (positions in the index of read_frame_index) of the trajectory to path.
+    """
+    offset = index[begin][1]
+    remaining = index[end - 1][1] + index[end - 1][2] - offset
+    with open(xyz_file, "rb") as source, open(path, "wb") as target:
+        source.seek(offset)
+        while remaining > 0:
+            data = source.read(min(block, remaining))
+            if not data:
+                break
+            target.write(data)
+            remaining -= len(data)
+
+
+def merge_trajectory_outputs(directories, target):
+    """
+        Joins the traj_*.txt outputs of detect_lassos run on consecutive shards of a trajectory into the target
+        directory: the header of the first shard followed by the frames of all of them in order.
+    """
+    for name in sorted(i for i in os.listdir(directories[0]) if i.startswith("traj_")):
+        with open(os.path.join(target, name), "wb") as output:
+            for k, directory in enumerate(directories):
+                with open(os.path.join(directory, name), "rb") as f:
+                    for n, line in enumerate(f):
+                        if k == 0 or n >= TRAJECTORY_HEADER:
+                            output.write(line)
+
+
+def shards_directory(cwd, xyz_file):
+    return os.path.join(cwd, os.path.basename(xyz_file)[:-4] + "_shards")
+
+
+def trajectory_step(words):
+    options = dict(zip(words[4::2], words[5::2]))
+    return int(options["-step"]) if options.get("-step", "").isdigit() and int(options["-step"]) > 0 else 1
+
+
+def run_trajectory(command, cwd=None, workers=None, cancellation=None, progress=None, engine=None):
+    """
+        Runs a trajectory command of detect_lassos. With more than one worker and an index of the frames the
+        trajectory is split into trajectory_shards, copied to subdirectories of cwd and analysed by separate
+        detect_lassos processes at the same time; their traj_*.txt outputs are merged into cwd, as a single run
+        would write them. The numpy engine (default_engine by default) analyses the whole trajectory in one run,
+        which carries the piercings over between similar frames (see lasso_engine.detect_trajectory). Returns the
+        standard output of the (first) run. progress and cancellation as in run_commands.
+    """
+    if workers is None:
+        workers = default_workers()
+    if engine is None:
+        engine = default_engine()
+    words = list(filter(len, command.split(" ")))
+    index = read_frame_index(words[1]) if workers > 1 and engine == "binary" and len(words) >= 4 else None
+    shards = trajectory_shards(len(index), trajectory_step(words), workers) if index else []
+    if len(shards) < 2:
+        return run_commands([command], cwd, 1, engine, cancellation=cancellation, progress=progress)[0]
+
+    cwd = cwd or os.getcwd()
+    root = shards_directory(cwd, words[1])
+    directories = [os.path.join(root, str(k)) for k in range(len(shards))]
+    try:
+        commands = []
+        for directory, (begin, end) in zip(directories, shards):
+            os.makedirs(directory, exist_ok=True)
+            shard_file = os.path.join(directory, os.path.basename(words[1]))
+            write_trajectory_shard(words[1], index, begin, end, shard_file)
+            commands.append(" ".join([words[0], shard_file] + words[2:]))
+
+        outputs = []
+        with ThreadPoolExecutor(max_workers=min(workers, len(commands))) as pool:
+            for output in pool.map(lambda k: run_command(commands[k], directories[k], "binary", cancellation),
+                                   range(len(commands))):
+                outputs.append(output)
+                if progress is not None:
+                    progress(len(outputs), len(commands))
+        merge_trajectory_outputs(directories, cwd)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    return outputs[0]
+
+
+def update_directory(cwd, xyz_file):
+    return os.path.join(cwd, os.path.basename(xyz_file)[:-4] + "_update")
+
+
+def trajectory_outputs(directory, words):
+    """
+        Names of the traj_*.txt outputs of the trajectory command (split into words) in the directory.
+    """
+    prefix = "traj_" + os.path.basename(words[1])[:-4] + "_" + words[2] + "_" + words[3]
+    return sorted(i for i in os.listdir(directory) if i.startswith(prefix) and i[len(prefix):][:1] in (".", "_") and
+                  i.endswith(".txt"))
+
+
+def trajectory_checkpoint(directory, words):
+    return os.path.join(directory, "traj_" + os.path.basename(words[1])[:-4] + "_" + words[2] + "_" + words[3] +
+                        TRAJECTORY_CHECKPOINT)
+
+
+def read_trajectory_checkpoint(path, words, index):
+    """
+        Reads the checkpoint written by write_trajectory_checkpoint, or returns None if there is none, it was written
+        for other options or the frames of the .xyz file before its frame have changed.
+    """
+    if index is None or not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as f:
+            checkpoint = json.load(f)
+    except ValueError:
+        return None
+    frames = checkpoint["frames"]
+    if checkpoint["command"] != words[2:] or not checkpoint["outputs"] or not 0 < frames < len(index) or \
+            [index[frames][0], index[frames][1]] != [checkpoint["time"], checkpoint["offset"]] or \
+            convert_pdb_2_5columns.traj_digest(words[1], checkpoint["offset"]) != checkpoint["digest"]:
+        return None
+    return checkpoint
+
+
+def write_trajectory_checkpoint(path, words, index, outputs):
+    """
+        Saves the state of a finished run of the trajectory command: the last analysed frame, which is analysed again
+        by the next update_trajectory as it may have been incomplete, with its time, its offset in the .xyz file and
+        a digest of the frames before it, and the traj_*.txt outputs.
+    """
+    frames = (len(index) - 1) // trajectory_step(words) * trajectory_step(words)
+    with open(path, "w") as f:
+        json.dump({"command": words[2:], "frames": frames, "time": index[frames][0], "offset": index[frames][1],
+                   "digest": convert_pdb_2_5columns.traj_digest(words[1], index[frames][1]), "outputs": outputs}, f)
+
+
+def keep_lines(path, lines):
+    """
+        Cuts the file after the given number of lines. Returns False if it has fewer lines.
+    """
+    with open(path, "r+b") as f:
+        position = 0
+        for _ in range(lines):
+            line = f.readline()
+            if not line.endswith(b"\n"):
+                return False
+            position += len(line)
+        f.truncate(position)
+    return True
+
+
+def update_trajectory(command, cwd=None, previous=None, workers=None, cancellation=None, progress=None):
+    """
+        Runs a trajectory command of detect_lassos (see run_trajectory) on the frames appended to the trajectory since
+        the previous run only. The traj_*.txt outputs of that run and its checkpoint (see write_trajectory_checkpoint)
+        are taken from the previous directory (cwd by default), cut after the frames before the checkpoint and
+        completed with the outputs of a run on the following frames, copied to a subdirectory of cwd. Without a valid
+        checkpoint the whole trajectory is analysed. Writes a new checkpoint to cwd and returns the standard output of
+        detect_lassos.
+    """
+    cwd = cwd or os.getcwd()
+    previous = previous or cwd
+    words = list(filter(len, command.split(" ")))
+    index = read_frame_index(words[1])
+    checkpoint = read_trajectory_checkpoint(trajectory_checkpoint(previous, words), words, index)
+    for path in (trajectory_checkpoint(previous, words), trajectory_checkpoint(cwd, words)):
+        if os.path.exists(path):
+            os.remove(path)  # until the outputs are complete again
+
+    start = 0
+    if checkpoint is not None:
+        start = checkpoint["frames"]
+        for name in checkpoint["outputs"]:
+            if os.path.abspath(previous) != os.path.abspath(cwd) and os.path.exists(os.path.join(previous, name)):
+                os.replace(os.path.join(previous, name), os.path.join(cwd, name))
+            if not os.path.exists(os.path.join(cwd, name)) or \
+                    not keep_lines(os.path.join(cwd, name), TRAJECTORY_HEADER + start // trajectory_step(words)):
+                start = 0
+    if start == 0:
+        output = run_trajectory(command, cwd, workers, cancellation, progress)
+    else:
+        root = update_directory(cwd, words[1])
+        try:
+            os.makedirs(root, exist_ok=True)
+            part = os.path.join(root, os.path.basename(words[1]))
+            write_trajectory_shard(words[1], index, start, len(index), part)
+            with open(part[:-4] + ".idx", "w") as f:
+                f.writelines("%s %d %d\n" % (time, offset - index[start][1], length)
+                             for time, offset, length in index[start:])
+            output = run_trajectory(" ".join([words[0], part] + words[2:]), root, workers, cancellation, progress)
+            for name in trajectory_outputs(root, [words[0], part] + words[2:]):
+                with open(os.path.join(cwd, name), "ab") as target, open(os.path.join(root, name), "rb") as f:
+                    for n, line in enumerate(f):
+                        if n >= TRAJECTORY_HEADER:
+                            target.write(line)
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+    if index and trajectory_outputs(cwd, words):
+        write_trajectory_checkpoint(trajectory_checkpoint(cwd, words), words, index, trajectory_outputs(cwd, words))
+    return output
+
+
+def separate_files(source, target, *patterns):
+    """
+        Moves the files of the source directory whose names contain any of the patterns to the target directory.
+    """
+    if not os.path.exists(target):
+        os.makedirs(target)
+    for filename in os.listdir(source):
+        for pattern in patterns:
+            if pattern in filename:
+                shutil.move(os.path.join(source, filename), os.path.join(target, filename))
+                break
+
+
+def move_results(path, gln=False):
+    """
+        Moves the files produced for the structure at path into its polymer directory (the file name with dots
+        replaced by underscores) and its _GLN, _barycentric, _surfaces and _smooth subdirectories. Returns the polymer
+        directory.
+    """
+    source, filename = os.path.split(os.path.abspath(path))
+    directory = os.path.join(source, filename.replace(".", "_"))
+    if gln:
+        separate_files(source, os.path.join(directory, "_GLN"), "matrixGLN_")
+    separate_files(source, os.path.join(directory, "_barycentric"), "barycentric_", "F_PYsvgBari_")
+    separate_files(source, os.path.join(directory, "_surfaces"), "surface_")
+    separate_files(source, os.path.join(directory, "_smooth"), "_smooth.pdb")
+    separate_files(source, directory, filename + "_")
+    return directory
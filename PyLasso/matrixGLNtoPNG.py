@@ -1,85 +1,172 @@
 from PIL import Image, ImageDraw, ImageFont
+import numpy as np
 
+import argparse
+import glob
+import os
 import sys
+from concurrent.futures import ProcessPoolExecutor
 
-filename=sys.argv[1]
-#filename = 'proteins/LASSOLINKINGS_1zd0_48_131_A.xyz'
+import gln
 
-f = open(filename)
-line = f.readline() #1.linia
-words_1line = line.split()
-
-CHAIN = int(words_1line[1])
-#KLATKA = 20
-#WIDTH = CHAIN*KLATKA
-#HEIGHT = CHAIN*KLATKA
-
-KLATKA = int(1100/CHAIN)
-FLOATKLATKA = float(1100)/CHAIN
 WIDTH = 1100
 HEIGHT = 1100
 
-FONT_SIZE=45
-FONT_SIZE_SMALL=20
-FONT_SIZE_MIDDLE=30
-
-image = Image.new('RGB', (WIDTH, HEIGHT), 'white')
-draw = ImageDraw.Draw(image)
-
-data = f.readlines()
-
-for line in data[1:]:
-  words = line.split()
-#  print words
-#  color = (255,int(255-255*float(words[3])),int(255-255*float(words[3]))) if words[2][0] == "m" else (int(255-255*float(words[3])),int(255-255*float(words[3])),255)
-  color = (int(255*float(words[5])),int(255*float(words[6])),int(255*float(words[7])))
-  for x in range(0,KLATKA+1):
-    for y in range(0,KLATKA+1):
-      draw.point((int(int(words[1])*FLOATKLATKA)+x, int(int(words[0])*FLOATKLATKA)+y), fill=color)
-
-font = ImageFont.truetype("arial.ttf", FONT_SIZE)
-font_middle = ImageFont.truetype("arial.ttf", FONT_SIZE_MIDDLE)
-font_small = ImageFont.truetype("arial.ttf", FONT_SIZE_SMALL)
-#font = ImageFont.truetype("/home/shared/baza_lassa/surfacesMyTraj_list2016/arial.ttf", FONT_SIZE)
-#font_middle = ImageFont.truetype("/home/shared/baza_lassa/surfacesMyTraj_list2016/arial.ttf", FONT_SIZE_MIDDLE)
-#font_small = ImageFont.truetype("/home/shared/baza_lassa/surfacesMyTraj_list2016/arial.ttf", FONT_SIZE_SMALL)
-
-# min i max
-max = "%.2f" % float(words_1line[8])
-min = "%.2f" % float(words_1line[5])
-xmax = int(int(words_1line[7])*FLOATKLATKA) if int(int(words_1line[7])*FLOATKLATKA)<HEIGHT-FONT_SIZE else HEIGHT-FONT_SIZE-5
-ymax = int(int(words_1line[6])*FLOATKLATKA) if int(int(words_1line[6])*FLOATKLATKA)<WIDTH-FONT_SIZE else WIDTH-FONT_SIZE-5
-xmin = int(int(words_1line[4])*FLOATKLATKA) if int(int(words_1line[4])*FLOATKLATKA)<HEIGHT-FONT_SIZE else HEIGHT-FONT_SIZE-5
-ymin = int(int(words_1line[3])*FLOATKLATKA) if int(int(words_1line[3])*FLOATKLATKA)<WIDTH-FONT_SIZE else WIDTH-FONT_SIZE-5
-#draw.text((xmax, ymax), max+" ("+words_1line[6]+","+words_1line[7]+")", font=font, fill=(0,0,0,255))
-#draw.text((xmin, ymin), min+" ("+words_1line[3]+","+words_1line[4]+")", font=font, fill=(0,0,0,255))
-draw.ellipse((xmax-12, ymax-12, xmax+12, ymax+12), fill = 'blue', outline ='black')
-draw.ellipse((xmin-12, ymin-12, xmin+12, ymin+12), fill = 'red', outline ='black')
-draw.text((.65*WIDTH, HEIGHT/10.), "max GLN = "+max+" ("+words_1line[7]+","+words_1line[6]+")", font=font_middle, fill=(0,0,0,255))
-draw.text((.65*WIDTH, 1.5*HEIGHT/10.), "min GLN = "+min+" ("+words_1line[4]+","+words_1line[3]+")", font=font_middle, fill=(0,0,0,255))
-
-draw.text((10,10), filename+", length "+str(CHAIN), font=font, fill=(0,255,0,255))
-
-#osie
-step = int(CHAIN/5)/10*10 if CHAIN>150 else int(CHAIN/5)/5*5 if CHAIN>50 else int(CHAIN/5)
-for x in range(1,6):
-  draw.text((x*step*FLOATKLATKA, HEIGHT-FONT_SIZE_SMALL-2), str(x*step), font=font_small, fill=(50,50,50,255))
-  draw.text((0,x*step*FLOATKLATKA), "-"+str(x*step), font=font_small, fill=(50,50,50,255))
-
-image.save(filename+'.png')
-
-image.save(filename+'.png')
-
-f.close()
-
-
-
-#for x, y in [(x, y) for x in range(WIDTH) for y in range(HEIGHT)]:
-#  color = (136, 54, 240) if (x / 20 + y / 20) % 2 == 0 else (10, 204, 127)
-#  draw.point((x, y), fill=color)
-
-#image.save('image.png')
-
-
-
-
+FONT_SIZE = 45
+FONT_SIZE_SMALL = 20
+FONT_SIZE_MIDDLE = 30
+
+worker_fonts = None  # fonts of a process of render_matrices, loaded once by init_worker
+
+
+def load_font(size):
+  for name in ("arial.ttf", "DejaVuSans.ttf"):
+    try:
+      return ImageFont.truetype(name, size)
+    except OSError:
+      pass
+  return ImageFont.load_default(size)
+
+
+def load_fonts():
+  """
+    Fonts of the title, the extremes and the axes - loaded once and passed to matrix_to_png for a batch of matrices.
+  """
+  return load_font(FONT_SIZE), load_font(FONT_SIZE_MIDDLE), load_font(FONT_SIZE_SMALL)
+
+
+def read_matrix(filename):
+  """
+    Reads a GLN matrix: a .npz archive of gln.save_matrix or the text format of older versions (a line with the size
+    and the extremes, a header and a line "row column ... R G B" per cell). Returns the colours (rows = ends,
+    columns = beginnings of the fragments) and the extremes as (row, column, value) of the minimum and the maximum.
+  """
+  if filename.endswith(".npz"):
+    residues, matrix = gln.load_matrix(filename)
+    (low, low_value), (high, high_value) = gln.extremes(matrix)
+    return gln.gln_colors(matrix.T), (low[1], low[0], low_value), (high[1], high[0], high_value)
+
+  with open(filename) as f:
+    words_1line = f.readline().split()
+    f.readline()
+    data = np.loadtxt(f, ndmin=2)
+  CHAIN = int(words_1line[1])
+  colors = np.ones((CHAIN, CHAIN, 3))
+  colors[data[:, 0].astype(int), data[:, 1].astype(int)] = data[:, 5:8]
+  return colors, (int(words_1line[3]), int(words_1line[4]), float(words_1line[5])), \
+      (int(words_1line[6]), int(words_1line[7]), float(words_1line[8]))
+
+
+def matrix_to_png(filename, output=None, fonts=None):
+  """
+    Renders the GLN matrix into a PNG (filename.png, or filename without .npz + .png, by default). The cells are
+    filled at once - a cells x cells image of the colours upscaled with the nearest neighbour to WIDTH x HEIGHT - and
+    PIL draws only the annotations. Returns the path of the PNG.
+  """
+  if output is None:
+    output = png_path(filename)
+  if fonts is None:
+    fonts = load_fonts()
+  font, font_middle, font_small = fonts
+
+  colors, low, high = read_matrix(filename)
+  CHAIN = len(colors)
+  FLOATKLATKA = float(WIDTH) / CHAIN
+
+  cells = Image.fromarray((255 * colors).astype(np.uint8), 'RGB')
+  image = cells.resize((WIDTH, HEIGHT), Image.NEAREST)
+  draw = ImageDraw.Draw(image)
+
+  # min i max
+  marks = []
+  for (row, column, value), fill in ((high, 'blue'), (low, 'red')):
+    x = int(column * FLOATKLATKA) if int(column * FLOATKLATKA) < HEIGHT - FONT_SIZE else HEIGHT - FONT_SIZE - 5
+    y = int(row * FLOATKLATKA) if int(row * FLOATKLATKA) < WIDTH - FONT_SIZE else WIDTH - FONT_SIZE - 5
+    draw.ellipse((x - 12, y - 12, x + 12, y + 12), fill=fill, outline='black')
+    marks.append("%.2f (%d,%d)" % (value, column, row))
+  draw.text((.65 * WIDTH, HEIGHT / 10.), "max GLN = " + marks[0], font=font_middle, fill=(0, 0, 0, 255))
+  draw.text((.65 * WIDTH, 1.5 * HEIGHT / 10.), "min GLN = " + marks[1], font=font_middle, fill=(0, 0, 0, 255))
+
+  draw.text((10, 10), os.path.basename(output)[:-4] + ", length " + str(CHAIN), font=font, fill=(0, 255, 0, 255))
+
+  # osie
+  step = CHAIN // 5 // 10 * 10 if CHAIN > 150 else CHAIN // 5 // 5 * 5 if CHAIN > 50 else CHAIN // 5
+  for x in range(1, 6):
+    draw.text((x * step * FLOATKLATKA, HEIGHT - FONT_SIZE_SMALL - 2), str(x * step), font=font_small,
+              fill=(50, 50, 50, 255))
+    draw.text((0, x * step * FLOATKLATKA), "-" + str(x * step), font=font_small, fill=(50, 50, 50, 255))
+
+  image.save(output)
+  return output
+
+
+def png_path(filename):
+  return (filename[:-4] if filename.endswith(".npz") else filename) + ".png"
+
+
+def find_matrices(patterns):
+  """
+    GLN matrices (matrixGLN_* files other than the pictures) in the given directories, glob patterns or files.
+  """
+  matrices = []
+  for pattern in patterns:
+    if os.path.isdir(pattern):
+      found = glob.glob(os.path.join(pattern, "matrixGLN_*"))
+    else:
+      found = glob.glob(pattern) or [pattern]
+    matrices += sorted(i for i in found if not i.endswith(".png") and os.path.isfile(i) and i not in matrices)
+  return matrices
+
+
+def is_rendered(filename):
+  """
+    True if the picture of the matrix exists and is newer than the matrix.
+  """
+  output = png_path(filename)
+  return os.path.exists(output) and os.path.getmtime(output) >= os.path.getmtime(filename)
+
+
+def init_worker():
+  global worker_fonts
+  worker_fonts = load_fonts()
+
+
+def render_worker(filename):
+  try:
+    return matrix_to_png(filename, fonts=worker_fonts), None
+  except Exception as e:
+    return None, filename + ": " + str(e)
+
+
+def render_matrices(patterns, workers=None, force=False):
+  """
+    Renders the GLN matrices found by find_matrices into PNG pictures with `workers` processes (the number of CPUs
+    by default), each loading the fonts once. Matrices with a picture newer than themselves are skipped unless
+    force is set. Returns the paths of the written pictures and the errors of the failed matrices.
+  """
+  matrices = [i for i in find_matrices(patterns) if force or not is_rendered(i)]
+  if workers is None:
+    workers = os.cpu_count() or 1
+  workers = max(1, min(workers, len(matrices)))
+  if workers == 1:
+    init_worker()
+    results = [render_worker(i) for i in matrices]
+  else:
+    with ProcessPoolExecutor(workers, initializer=init_worker) as executor:
+      results = list(executor.map(render_worker, matrices, chunksize=max(1, len(matrices) // (4 * workers))))
+  return [i for i, _ in results if i is not None], [e for _, e in results if e is not None]
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser(description="Renders GLN matrices (matrixGLN_* files) into PNG pictures.")
+  parser.add_argument('matrices', nargs="+", help="matrix files, directories or glob patterns")
+  parser.add_argument('-w', '--workers', type=int, default=None,
+                      help="number of processes rendering at the same time (number of CPUs by default)")
+  parser.add_argument('--force', action="store_true", default=False,
+                      help="render also the matrices with an up-to-date picture")
+  args = parser.parse_args()
+  written, errors = render_matrices(args.matrices, args.workers, args.force)
+  for error in errors:
+    print("  ### " + error, file=sys.stderr)
+  print(str(len(written)) + " pictures written")
+  sys.exit(1 if errors else 0)
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+# PyLasso: on-disk cache of the results of detect_lassos (and GLN matrices) keyed by the content of the chain.
+# ----------------------------------------------------------------------
+import hashlib
+import os
+import shutil
+import threading
+import time
+import uuid
+
+CACHE_FORMAT = "1"  # changing it invalidates all entries
+DEFAULT_SIZE = 512  # MB
+OUTPUT_FILE = "output.txt"
+STALE_STORE = 3600  # seconds after which an unfinished store is removed
+XYZ_PLACEHOLDER = "%PYLASSO_XYZ_FILE%"
+RESULT_PREFIXES = ("", "surface_", "barycentric_", "F_PYsvgBari_", "matrixGLN_")
+
+digests = {}
+digests_lock = threading.Lock()
+
+
+def file_digest(path):
+    """
+        SHA-256 of the content of the file, remembered as long as its size and modification time do not change.
+    """
+    stat = os.stat(path)
+    signature = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with digests_lock:
+        if signature in digests:
+            return digests[signature]
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    with digests_lock:
+        digests[signature] = digest.hexdigest()
+    return digests[signature]
+
+
+def result_files(directory, xyz_file, first, last, gln=False):
+    """
+        Names of the files written to the directory for the loop first-last of the chain in the .xyz file: surfaces,
+        barycentric projections, pictures and the smoothed chain, or the GLN matrices and colours with gln.
+    """
+    base = os.path.basename(xyz_file)[:-4] + "_" + str(first) + "_" + str(last)
+    names = []
+    for name in os.listdir(directory):
+        for prefix in RESULT_PREFIXES:
+            rest = name[len(prefix + base):]
+            if name.startswith(prefix + base) and rest[:1] in ("_", ".") and \
+                    (prefix == "matrixGLN_" or rest.startswith("_GLN")) == gln:
+                names.append(name)
+                break
+    return names
+
+
+def default_cache():
+    """
+        Cache in PYLASSO_CACHE (~/.pylasso/cache by default) bounded by PYLASSO_CACHE_SIZE megabytes (DEFAULT_SIZE by
+        default). Returns None if the size is 0 or the directory cannot be created.
+    """
+    size = os.environ.get("PYLASSO_CACHE_SIZE", "")
+    size = float(size) if size.replace(".", "", 1).isdigit() else DEFAULT_SIZE
+    if size <= 0:
+        return None
+    try:
+        return ResultCache(os.environ.get("PYLASSO_CACHE", ""), int(size * (1 << 20)))
+    except OSError as e:
+        print("  Results will not be cached: " + str(e))
+        return None
+
+
+class ResultCache:
+    """
+        Content-addressed cache of the results of single loops. An entry is the output of the program and the files
+        written for the loop, stored in <directory>/<key[:2]>/<key>; the key is a hash of the coordinates of the chain
+        (the .xyz file), its name, the loop, the options and the version of the program. When the entries take more
+        than max_size bytes the least recently used ones are removed by evict.
+    """
+
+    def __init__(self, directory="", max_size=DEFAULT_SIZE << 20):
+        self.directory = directory or os.path.join(os.path.expanduser("~"), ".pylasso", "cache")
+        self.max_size = max_size
+        os.makedirs(self.directory, exist_ok=True)
+
+    def entry(self, xyz_file, first, last, options, version):
+        """
+            Directory of the entry of the loop first-last of the chain in the .xyz file computed with the options by
+            the given version of the program (any string identifying it, e.g. a digest of its file).
+        """
+        key = hashlib.sha256("\n".join([CACHE_FORMAT, file_digest(xyz_file), os.path.basename(xyz_file), str(first),
+                                        str(last), " ".join(sorted(options.split(" "))), version]).encode("utf-8"))
+        key = key.hexdigest()
+        return os.path.join(self.directory, key[:2], key)
+
+    def restore(self, entry, xyz_file, target):
+        """
+            Copies the files of the entry to the target directory and returns the output, or None if there is no
+            such entry.
+        """
+        try:
+            with open(os.path.join(entry, OUTPUT_FILE), "r") as f:
+                output = f.read()
+            for name in os.listdir(entry):
+                if name != OUTPUT_FILE:
+                    shutil.copyfile(os.path.join(entry, name), os.path.join(target, name))
+            os.utime(os.path.join(entry, OUTPUT_FILE))
+        except OSError:
+            return None
+        return output.replace(XYZ_PLACEHOLDER, xyz_file)
+
+    def store(self, entry, xyz_file, output, directory, names):
+        """
+            Stores the output and the named files of the directory as the entry. The entry is written aside and
+            renamed, so an interrupted or concurrent store leaves no partial entry.
+        """
+        temporary = os.path.join(self.directory, "tmp-" + uuid.uuid4().hex)
+        try:
+            os.makedirs(temporary)
+            for name in names:
+                shutil.copyfile(os.path.join(directory, name), os.path.join(temporary, name))
+            with open(os.path.join(temporary, OUTPUT_FILE), "w") as f:
+                f.write(output.replace(xyz_file, XYZ_PLACEHOLDER))
+            os.makedirs(os.path.dirname(entry), exist_ok=True)
+            os.rename(temporary, entry)
+        except OSError:
+            shutil.rmtree(temporary, ignore_errors=True)
+
+    def evict(self):
+        """
+            Removes the least recently used entries (and stores interrupted long ago) until the cache takes at
+            most max_size bytes. Returns the number of removed entries.
+        """
+        entries = []
+        for group in os.scandir(self.directory):
+            if group.name.startswith("tmp-"):
+                if group.stat().st_mtime < time.time() - STALE_STORE:
+                    shutil.rmtree(group.path, ignore_errors=True)
+                continue
+            if not group.is_dir():
+                continue
+            for entry in os.scandir(group.path):
+                try:
+                    size = sum(i.stat().st_size for i in os.scandir(entry.path))
+                    entries.append((os.stat(os.path.join(entry.path, OUTPUT_FILE)).st_mtime, size, entry.path))
+                except OSError:
+                    continue
+        total = sum(i[1] for i in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+            removed += 1
+        return removed
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+# Scaling of the converter: python tests/benchmark_convert_pdb.py
+# Times the conversion of chains with growing numbers of residues and LINK records by the baseline converter
+# (linear residue scans in Chain.clean) and the current one (residue index), and the geometric bridge search of
+# Chain.find_bridges against the pairwise search of test_convert_pdb.
+# ----------------------------------------------------------------------
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from test_convert_pdb import BASELINE, CONVERTER, pairwise
+import convert_pdb_2_5columns
+import make_structures
+
+
+def conversion(sizes=((1000, 200), (2000, 400), (4000, 800), (8000, 1600))):
+    print("  %-22s %12s %12s" % ("residues / LINK", "baseline", "current"))
+    directory = tempfile.mkdtemp()
+    try:
+        for residues, links in sizes:
+            path = os.path.join(directory, "linked.pdb")
+            make_structures.linked_chain(path, residues, links)
+            times = []
+            for script in (BASELINE, CONVERTER):
+                start = time.perf_counter()
+                subprocess.run([sys.executable, script, path], stdout=subprocess.DEVNULL, check=True)
+                times.append(time.perf_counter() - start)
+            print("  %-22s %10.2f s %10.2f s" % ("%d / %d" % (residues, links), times[0], times[1]))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def bridge_search(sizes=(500, 1000, 2000, 4000)):
+    print("  %-22s %12s %12s" % ("residues (CA only)", "pairwise", "find_bridges"))
+    for residues in sizes:
+        chain = convert_pdb_2_5columns.Chain("A")
+        xyz = make_structures.walk(residues, 0)
+        for k, position in enumerate(xyz):
+            chain.add_coordinate(k + 1, position.tolist(), "CYS" if k % 4 == 3 else "ALA")
+        chain.clean()
+        start = time.perf_counter()
+        pairwise(xyz, 2, 0.0, 6.0)
+        middle = time.perf_counter()
+        chain.find_bridges(6.0)
+        print("  %-22d %10.3f s %10.3f s" % (residues, middle - start, time.perf_counter() - middle))
+
+
+if __name__ == "__main__":
+    conversion()
+    bridge_search()
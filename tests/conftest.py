@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+# PyLasso tests: the plugin modules import each other by flat names (as PyMOL loads them), so both the repository
+# and the plugin directory are put on the path.
+# ----------------------------------------------------------------------
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATA = os.path.join(ROOT, "tests", "data")
+sys.path[:0] = [ROOT, os.path.join(ROOT, "PyLasso")]
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+# Writes the chains of the engine regression set: a loop of 15 CA atoms on a circle of radius 10 A in the xy plane
+# (counter-clockwise, closed by a 6.84 A bridge) and tails threaded through its centre along z or kept outside.
+# Tail legs are split into steps of at most 4 A, so a tail going through the centre at (0, 0, 25) -> (0, 0, -8)
+# crosses the plane between its 7th and 8th atom.
+# ----------------------------------------------------------------------
+import math
+import os
+
+import numpy as np
+
+RADIUS = 10.0
+LOOP = [np.array([RADIUS * math.cos(math.radians(t)), RADIUS * math.sin(math.radians(t)), 0.0])
+        for t in np.linspace(20.0, 340.0, 15)]
+A, B = LOOP[0], LOOP[-1]
+FREE_N = [(30, 10, 20), (30, 10, 0), tuple(A)]
+THREADED_N = [(0, 0, 25), (0, 0, -8), (A[0], A[1], -8), tuple(A)]
+TWICE_N = [(0, 0, 25), (0, 0, -8), (-20, 0, -8), (-20, 0, 25), (2, 2, 25), (2, 2, -8), (A[0], A[1], -8), tuple(A)]
+FREE_C = [tuple(B), (30, -10, 0), (30, -10, 20)]
+THREADED_C = [tuple(B), (B[0], B[1], -8), (0, 0, -8), (0, 0, 25)]
+CHAINS = {"free": (FREE_N, FREE_C, False), "threaded_n": (THREADED_N, FREE_C, False),
+          "threaded_n_mirror": (THREADED_N, FREE_C, True), "threaded_c": (FREE_N, THREADED_C, False),
+          "threaded_both": (THREADED_N, THREADED_C, False), "threaded_n_twice": (TWICE_N, FREE_C, False)}
+
+
+def path(points):
+    atoms = [np.array(points[0], dtype=float)]
+    for a, b in zip(points[:-1], points[1:]):
+        a, b = np.array(a, dtype=float), np.array(b, dtype=float)
+        steps = int(math.ceil(np.linalg.norm(b - a) / 4.0))
+        atoms += [a + (b - a) * k / steps for k in range(1, steps + 1)]
+    return atoms
+
+
+def chain(n_tail, c_tail, mirror=False):
+    """
+        Coordinates of the chain and the residue numbers (from 1) of the bridge.
+    """
+    n_tail, c_tail = path(n_tail)[:-1], path(c_tail)[1:]
+    xyz = np.array(n_tail + LOOP + c_tail)
+    if mirror:
+        xyz[:, 2] *= -1
+    return xyz, len(n_tail) + 1, len(n_tail) + len(LOOP)
+
+
+if __name__ == "__main__":
+    for name, (n_tail, c_tail, mirror) in CHAINS.items():
+        xyz, first, last = chain(n_tail, c_tail, mirror)
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), name + ".xyz"), "w") as f:
+            f.writelines("%d %.3f %.3f %.3f ALA\n" % (k + 1, p[0], p[1], p[2]) for k, p in enumerate(xyz))
+        print(name, first, last)
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+# Writes the PDB files of the converter regression set: random-walk chains (3.8 A steps) with SEQRES, HELIX, SHEET,
+# SSBOND and LINK records, gaps in the numbering, CA-only chains, several chains, alternate locations and chains
+# without identifiers separated by TER records.
+# ----------------------------------------------------------------------
+import os
+
+import numpy as np
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+RESIDUES = ["ALA", "GLY", "SER", "LEU", "VAL", "THR", "ASP", "LYS", "GLU", "ILE"]
+
+
+def walk(residues, seed, start=(0.0, 0.0, 0.0)):
+    steps = np.random.default_rng(seed).normal(size=(residues - 1, 3))
+    steps *= 3.8 / np.linalg.norm(steps, axis=1)[:, None]
+    return np.vstack([np.zeros((1, 3)), np.cumsum(steps, axis=0)]) + start
+
+
+def sequence(residues, special):
+    names = [RESIDUES[k % len(RESIDUES)] for k in range(residues)]
+    for number, name in special.items():
+        names[number - 1] = name
+    return names
+
+
+def seqres(chain, names):
+    return ["SEQRES %3d %1s %4d  %s\n" % (k // 13 + 1, chain, len(names), " ".join(names[k:k + 13]))
+            for k in range(0, len(names), 13)]
+
+
+def ssbond(k, chain1, res1, chain2, res2):
+    return "SSBOND %3d CYS %1s %4d    CYS %1s %4d\n" % (k, chain1, res1, chain2, res2)
+
+
+def link(atom1, name1, chain1, res1, atom2, name2, chain2, res2):
+    return "LINK        %-4s %3s %1s%4d                %-4s %3s %1s%4d\n" % (
+        atom1, name1, chain1, res1, atom2, name2, chain2, res2)
+
+
+def helix(k, chain, name1, res1, name2, res2):
+    return "HELIX  %3d %3d %3s %1s %4d  %3s %1s %4d  1\n" % (k, k, name1, chain, res1, name2, chain, res2)
+
+
+def sheet(k, chain, name1, res1, name2, res2):
+    return "SHEET  %3d   A 2 %3s %1s%4d  %3s %1s%4d  0\n" % (k, name1, chain, res1, name2, chain, res2)
+
+
+def atom(serial, name, altloc, residue, chain, number, xyz, record="ATOM  "):
+    return "%6s%5d %-4s%1s%3s %1s%4d    %8.3f%8.3f%8.3f  1.00  0.00           %1s\n" % (
+        record, serial, name, altloc, residue, chain, number, xyz[0], xyz[1], xyz[2], name.strip()[0])
+
+
+def atoms(chain, names, xyz, first=1, skip=(), backbone=True, altlocs=(), hetero=(), serial=1):
+    """
+        ATOM (HETATM for the residue numbers in hetero) records of the chain: N, CA, C, O (only CA without backbone)
+        and SG of cysteines; the residues in skip are left out and those in altlocs get two CA locations.
+    """
+    lines = []
+    for k, (name, position) in enumerate(zip(names, xyz)):
+        number = first + k
+        if number in skip:
+            continue
+        record = "HETATM" if number in hetero else "ATOM  "
+        if backbone:
+            lines.append(atom(serial + len(lines), " N  ", " ", name, chain, number, position + (-1.2, 0.5, 0.3),
+                              record))
+        for altloc, shift in ((("A", 0.0), ("B", 0.4)) if number in altlocs else ((" ", 0.0),)):
+            lines.append(atom(serial + len(lines), " CA ", altloc, name, chain, number, position + shift, record))
+        if backbone:
+            lines.append(atom(serial + len(lines), " C  ", " ", name, chain, number, position + (1.2, 0.4, -0.2),
+                              record))
+            lines.append(atom(serial + len(lines), " O  ", " ", name, chain, number, position + (1.6, 1.4, -0.4),
+                              record))
+            if name == "CYS":
+                lines.append(atom(serial + len(lines), " SG ", " ", name, chain, number, position + (0.3, -1.5, 0.9),
+                                  record))
+    return lines
+
+
+def write(name, lines):
+    with open(os.path.join(DIRECTORY, name), "w") as f:
+        f.writelines(lines)
+
+
+def ssbond_link():
+    names = sequence(80, {6: "CYS", 40: "CYS", 12: "CYS", 70: "CYS", 20: "LYS", 55: "GLU", 30: "SER", 62: "ASP",
+                          44: "LYS", 45: "GLU", 75: "CYS", 77: "CYS"})
+    lines = ["HEADER    TEST STRUCTURE WITH BRIDGES\n"] + seqres("A", names)
+    lines += [helix(1, "A", names[9], 10, names[17], 18), sheet(1, "A", names[49], 50, names[53], 54)]
+    lines += [ssbond(1, "A", 6, "A", 40), ssbond(2, "A", 12, "A", 70), ssbond(3, "A", 75, "A", 77)]
+    lines += [link(" NZ ", "LYS", "A", 20, " CD ", "GLU", "A", 55),  # amide
+              link(" CD ", "ASP", "A", 62, " OG ", "SER", "A", 30),  # ester
+              link(" C  ", "LYS", "A", 44, " N  ", "GLU", "A", 45),  # amide-like extending the backbone
+              link(" NZ ", "LYS", "A", 20, " N  ", "GLU", "A", 25),  # inside a gap
+              link(" SG ", "CYS", "A", 6, " C  ", "THR", "A", 66),  # thioester-like
+              link(" CA ", "ALA", "A", 2, " CA ", "HOH", "A", 50)]  # non-protein
+    lines += atoms("A", names, walk(80, 1), skip=(23, 24, 25, 26)) + ["TER    1000      ALA A  80\n", "END\n"]
+    write("ssbond_link.pdb", lines)
+
+
+def ca_only():
+    names = sequence(120, {5: "CYS", 30: "CYS", 60: "CYS", 100: "CYS"})
+    lines = seqres("A", names) + [ssbond(1, "A", 5, "A", 30), ssbond(2, "A", 60, "A", 100)]
+    lines += atoms("A", names, walk(120, 2), backbone=False, skip=(50, 51), hetero=(80,))
+    write("ca_only.pdb", lines + ["TER\n", "END\n"])
+
+
+def multichain():
+    lines = []
+    chains = {"A": (70, {8: "CYS", 50: "CYS", 15: "LYS", 40: "GLU"}), "B": (50, {3: "CYS", 33: "CYS"}),
+              "C": (60, {10: "CYS", 12: "LYS"})}
+    for chain, (residues, special) in chains.items():
+        lines += seqres(chain, sequence(residues, special))
+    lines += [ssbond(1, "A", 8, "A", 50), ssbond(2, "B", 3, "B", 33), ssbond(3, "A", 8, "C", 10),
+              link(" NZ ", "LYS", "A", 15, " CD ", "GLU", "A", 40), link(" NZ ", "LYS", "C", 12, " CD ", "GLU", "B", 20)]
+    serial = 1
+    for k, (chain, (residues, special)) in enumerate(chains.items()):
+        chain_atoms = atoms(chain, sequence(residues, special), walk(residues, 3 + k, (40.0 * k, 0.0, 0.0)),
+                            first=1 + 5 * k, serial=serial)
+        serial += len(chain_atoms) + 1
+        lines += chain_atoms + ["TER   %5d\n" % (serial - 1)]
+    write("multichain.pdb", lines + ["END\n"])
+
+
+def altlocs():
+    names = sequence(60, {4: "CYS", 44: "CYS", 10: "MSE"})
+    lines = seqres("A", names) + [ssbond(1, "A", 4, "A", 44)]
+    lines += atoms("A", names, walk(60, 6), altlocs=(7, 8, 30, 44), hetero=(10,))
+    write("altlocs.pdb", lines + ["TER\n", "END\n"])
+
+
+def no_chain_id(segments=2):
+    lines = []
+    for k in range(segments):
+        lines += atoms(" ", sequence(40, {}), walk(40, 7 + k, (30.0 * k, 0.0, 0.0)), backbone=False) + ["TER\n"]
+    write("no_chain_id_%d.pdb" % segments, lines + ["END\n"])
+
+
+def linked_chain(path, residues, links, seed=0, ca_only=False):
+    """
+        Writes a chain of the given length with the given number of LINK records (amide, ester and other bonds
+        between random residues, some of them missing, inside gaps or adjacent) for the tests and benchmarks of
+        Chain.clean.
+    """
+    rng = np.random.default_rng(seed)
+    names = sequence(residues, {})
+    lines = seqres("A", names)
+    kinds = [(" NZ ", "LYS", " CD ", "GLU"), (" CD ", "ASP", " OG ", "SER"), (" C  ", "LYS", " N  ", "GLU"),
+             (" SG ", "CYS", " C  ", "THR"), (" CA ", "ALA", " CA ", "ALA")]
+    for _ in range(links):
+        res1 = int(rng.integers(1, residues + 10))
+        res2 = min(res1 + int(rng.choice([1, 3, 8, 40, int(rng.integers(1, residues))])), residues + 10)
+        atom1, name1, atom2, name2 = kinds[int(rng.integers(len(kinds)))]
+        lines.append(link(atom1, name1, "A", res1, atom2, name2, "A", res2))
+    skip = set(int(i) for i in rng.integers(1, residues, residues // 50))
+    lines += atoms("A", names, walk(residues, seed), skip=skip, backbone=not ca_only)
+    with open(path, "w") as f:
+        f.writelines(lines + ["TER\n", "END\n"])
+
+
+def trajectory(path, frames, residues, seed=0, chains=("A", "B"), noise=0.3, time=True, xyz=None):
+    """
+        Writes a trajectory of the given chains (CA atoms only) with MODEL records, or TITLE records with the time of
+        every frame: random walks (or the coordinates in xyz, one array per chain) moved by random noise in every
+        frame, for the tests of parse_traj and of the trajectory pipeline.
+    """
+    rng = np.random.default_rng(seed)
+    if xyz is None:
+        xyz = [walk(residues, seed + k, (30.0 * k, 0.0, 0.0)) for k in range(len(chains))]
+    lines = []
+    for frame in range(frames):
+        lines.append("TITLE     frame t= %d.00000\n" % (10 * frame) if time else "MODEL     %4d\n" % (frame + 1))
+        for chain, chain_xyz in zip(chains, xyz):
+            lines += atoms(chain, sequence(residues, {}), chain_xyz + rng.normal(scale=noise, size=chain_xyz.shape),
+                           backbone=False) + ["TER   %5d\n" % (residues + 1)]
+        lines.append("ENDMDL\n")
+    with open(path, "w") as f:
+        f.writelines(lines)
+
+
+if __name__ == "__main__":
+    ssbond_link()
+    ca_only()
+    multichain()
+    altlocs()
+    no_chain_id(2)
+    no_chain_id(3)
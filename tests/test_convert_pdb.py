@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import subprocess
+import sys
+
+import numpy as np
+import pytest
+
+import convert_pdb_2_5columns
+import PyLasso
+from conftest import DATA, ROOT
+
+BASELINE = os.path.join(DATA, "baseline", "convert_pdb_2_5columns.py")
+CONVERTER = os.path.join(ROOT, "PyLasso", "convert_pdb_2_5columns.py")
+sys.path.insert(0, os.path.join(DATA, "pdb"))
+import make_structures
+
+STRUCTURES = ["ssbond_link.pdb", "ca_only.pdb", "multichain.pdb", "altlocs.pdb", "no_chain_id_2.pdb"]
+
+
+def atom_line(number, name, residue, chain, index, xyz, element="C"):
+    return "ATOM  %5d  %-3s %3s %s%4d    %8.3f%8.3f%8.3f  1.00  0.00          %2s\n" % (
+        number, name, residue, chain, index, xyz[0], xyz[1], xyz[2], element)
+
+
+def hairpin(residues=20, width=5.5, cysteines=(3, 18)):
+    """
+        CA atoms of a hairpin: residues 1-10 along x, 11-20 back at y = width, so residues k and 21 - k face each
+        other width apart. Returns (index, residue, xyz) rows.
+    """
+    rows = []
+    half = residues // 2
+    for index in range(1, residues + 1):
+        if index <= half:
+            xyz = ((index - 1) * 3.8, 0.0, 0.0)
+        else:
+            xyz = ((residues - index) * 3.8, width, 0.0)
+        rows.append((index, "CYS" if index in cysteines else "ALA", xyz))
+    return rows
+
+
+def write_pdb(path, rows, chain="A", records=()):
+    with open(path, "w") as f:
+        f.writelines(records)
+        f.writelines(atom_line(k + 1, "CA", residue, chain, index, xyz) for k, (index, residue, xyz) in enumerate(rows))
+        f.write("TER   \nEND\n")
+    return str(path)
+
+
+def test_ca_only_cysteines_give_ss_like_bridges_with_images(tmp_path):
+    path = write_pdb(tmp_path / "hairpin.pdb", hairpin())
+    chains, chain_data = convert_pdb_2_5columns.convert_pdb(path, find_bridges=True)
+    bridges = chain_data["A"].get_bridges()
+    assert bridges == [("SS-like", 3, 18)]
+    assert all(bridge[0] in PyLasso.bridge_images for bridge in bridges)
+    assert os.path.exists(path + "_A.xyz")
+
+
+def test_all_proposed_bridge_types_have_images(tmp_path):
+    path = write_pdb(tmp_path / "hairpin.pdb", hairpin())
+    chains, chain_data = convert_pdb_2_5columns.convert_pdb(path, find_bridges=True, cutoff=6.0)
+    types = set(bridge[0] for bridge in chain_data["A"].get_bridges())
+    assert types == {"SS-like", "OTHER"}
+    assert types <= set(PyLasso.bridge_images)
+
+
+def convert(script, structure, directory):
+    """
+        Runs the converter script on a copy of the structure in the directory. Returns its standard output and the
+        written files {name: content}.
+    """
+    os.makedirs(str(directory))
+    shutil.copyfile(os.path.join(DATA, "pdb", structure), os.path.join(str(directory), structure))
+    output = subprocess.run([sys.executable, script, structure], cwd=str(directory), stdout=subprocess.PIPE,
+                            check=True).stdout.decode()
+    files = {}
+    for name in sorted(os.listdir(str(directory))):
+        if name != structure:
+            with open(os.path.join(str(directory), name)) as f:
+                files[name] = f.read()
+    return output, files
+
+
+@pytest.mark.parametrize("structure", STRUCTURES)
+def test_converter_matches_baseline(structure, tmp_path):
+    expected = convert(BASELINE, structure, tmp_path / "baseline")
+    assert convert(CONVERTER, structure, tmp_path / "current") == expected
+
+
+def test_chains_without_identifiers_are_separate_segments(tmp_path):
+    output, files = convert(CONVERTER, "no_chain_id_3.pdb", tmp_path / "current")
+    _, baseline = convert(BASELINE, "no_chain_id_3.pdb", tmp_path / "baseline")
+    assert sorted(files) == sorted(baseline)
+    for chain in "AB":
+        assert files["no_chain_id_3.pdb_%s.xyz" % chain] == baseline["no_chain_id_3.pdb_%s.xyz" % chain]
+    # the baseline gave chain C a copy of chain B
+    assert baseline["no_chain_id_3.pdb_C.xyz"] == baseline["no_chain_id_3.pdb_B.xyz"]
+    assert files["no_chain_id_3.pdb_C.xyz"].split("\n")[0] == "1 60.0 0.0 0.0 ALA"
+
+
+def test_convert_pdb_in_process_matches_script(tmp_path):
+    output, files = convert(CONVERTER, "multichain.pdb", tmp_path / "script")
+    os.makedirs(str(tmp_path / "module"))
+    path = str(tmp_path / "module" / "multichain.pdb")
+    shutil.copyfile(os.path.join(DATA, "pdb", "multichain.pdb"), path)
+    chains, chain_data = convert_pdb_2_5columns.convert_pdb(path)
+    assert chains == ["A", "B", "C"]
+    for name, content in files.items():
+        with open(os.path.join(str(tmp_path / "module"), name)) as f:
+            assert f.read() == content
+
+
+def test_bridges_of_linked_chain_match_baseline(tmp_path):
+    structure = "linked.pdb"
+    for directory in ("baseline", "current"):
+        os.makedirs(str(tmp_path / directory))
+    make_structures.linked_chain(str(tmp_path / "linked.pdb"), 3000, 600, seed=1)
+    outputs = []
+    for script, directory in ((BASELINE, "baseline"), (CONVERTER, "current")):
+        shutil.copyfile(str(tmp_path / structure), str(tmp_path / directory / structure))
+        outputs.append(subprocess.run([sys.executable, script, structure], cwd=str(tmp_path / directory),
+                                      stdout=subprocess.PIPE, check=True).stdout.decode())
+    assert outputs[1] == outputs[0]
+
+    chains, chain_data = convert_pdb_2_5columns.convert_pdb(str(tmp_path / structure))
+    commands = [line.split() for line in outputs[0].splitlines() if line.startswith(("SS", "AMIDE", "ESTER", "THIO",
+                                                                                     "OTHER"))]
+    assert len(commands) > 100
+    assert chain_data["A"].get_bridges() == [(i[0], int(i[2]), int(i[3])) for i in commands]
+
+
+def pairwise(xyz, min_length, min_dist, max_dist):
+    """
+        All pairs (i, j), i < j, checked one by one.
+    """
+    pairs = []
+    for i in range(len(xyz)):
+        for j in range(i + min_length - 1, len(xyz)):
+            if min_dist <= np.linalg.norm(xyz[j] - xyz[i]) <= max_dist:
+                pairs.append((i, j))
+    return pairs
+
+
+@pytest.mark.parametrize("seed,min_length,min_dist,max_dist", [(0, 3, 3.1, 10.0), (1, 2, 0.0, 2.5),
+                                                                (2, 2, 4.4, 6.8), (3, 10, 0.0, 15.0)])
+def test_contact_pairs_match_pairwise_search(seed, min_length, min_dist, max_dist):
+    xyz = make_structures.walk(400, seed)
+    first, second = convert_pdb_2_5columns.contact_pairs(xyz, min_length, min_dist, max_dist)
+    assert list(zip(first.tolist(), second.tolist())) == pairwise(xyz, min_length, min_dist, max_dist)
+
+
+def test_find_bridges_match_pairwise_search(tmp_path):
+    residues = 300
+    names = make_structures.sequence(residues, {k: "CYS" for k in range(3, residues, 4)})
+    skip = (40, 41, 150)
+    path = str(tmp_path / "model.pdb")
+    make_structures.write(path, make_structures.atoms("A", names, make_structures.walk(residues, 5), backbone=False,
+                                                      skip=skip) + ["TER\n", "END\n"])
+    chains, chain_data = convert_pdb_2_5columns.convert_pdb(path, find_bridges=True, cutoff=6.0)
+
+    numbers = np.array([k + 1 for k in range(residues) if k + 1 not in skip])
+    with open(path) as f:
+        xyz = np.array([[float(line[30:38]), float(line[38:46]), float(line[46:54])] for line in f
+                        if line.startswith("ATOM")])
+    cysteines = np.array([k for k, number in enumerate(numbers) if names[number - 1] == "CYS"])
+    candidates = [("SS-like", numbers[cysteines[i]], numbers[cysteines[j]])
+                  for i, j in pairwise(xyz[cysteines], 2, *convert_pdb_2_5columns.SS_CA_DIST)]
+    candidates += [("OTHER", numbers[i], numbers[j]) for i, j in pairwise(xyz, 2, 0.0, 6.0)]
+    expected, found = [], set()
+    for bridge_type, res1, res2 in candidates:
+        if res2 - res1 >= 5 and (res1, res2) not in found:
+            found.add((res1, res2))
+            expected.append((bridge_type, int(res1), int(res2)))
+    assert len(expected) > 10
+    assert chain_data["A"].get_bridges() == expected
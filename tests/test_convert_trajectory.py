@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+
+import numpy as np
+import pytest
+
+import convert_pdb_2_5columns
+from conftest import DATA
+
+sys.path.insert(0, os.path.join(DATA, "pdb"))
+import make_structures
+
+OUTPUTS = ["traj.pdb.xyz"] + ["traj.pdb_%s%s" % (chain, extension) for chain in "AB"
+                              for extension in (".xyz", ".idx", ".npy")]
+
+
+def cut_in_coordinates(data, frame, line):
+    """
+        Byte offset inside the x coordinate of the given line of the frame (both counted from 0) of the trajectory.
+    """
+    starts = [k for k in range(len(data)) if data.startswith((b"TITLE", b"MODEL"), k) and
+              (k == 0 or data[k - 1:k] == b"\n")]
+    position = starts[frame]
+    for _ in range(line):
+        position = data.index(b"\n", position) + 1
+    return position + 34
+
+
+def assert_same_outputs(directory, expected):
+    for name in OUTPUTS:
+        with open(os.path.join(directory, name), "rb") as f, open(os.path.join(expected, name), "rb") as g:
+            assert f.read() == g.read(), name
+    for chain in "AB":
+        metadata = np.load(os.path.join(directory, "traj.pdb_%s.npz" % chain))
+        reference = np.load(os.path.join(expected, "traj.pdb_%s.npz" % chain))
+        assert np.array_equal(metadata["time"], reference["time"])
+        assert np.array_equal(metadata["resid"], reference["resid"])
+
+
+@pytest.mark.parametrize("time", [True, False], ids=["title", "model"])
+def test_resumed_conversion_of_trajectory_cut_mid_line_matches_full_conversion(tmp_path, time):
+    full, growing = str(tmp_path / "full"), str(tmp_path / "growing")
+    os.makedirs(full)
+    os.makedirs(growing)
+    trajectory = os.path.join(full, "traj.pdb")
+    make_structures.trajectory(trajectory, 10, 40, seed=3, time=time)
+    convert_pdb_2_5columns.convert_trajectory(trajectory)
+    with open(trajectory, "rb") as f:
+        data = f.read()
+
+    path = os.path.join(growing, "traj.pdb")
+    cuts = [cut_in_coordinates(data, 6, 3), cut_in_coordinates(data, 8, 50), len(data)]
+    kept = []
+    for cut in cuts:
+        with open(path, "wb") as f:
+            f.write(data[:cut])
+        kept.append(convert_pdb_2_5columns.convert_trajectory(path, previous=growing))
+
+    assert kept == [0, 6, 8]
+    assert_same_outputs(growing, full)
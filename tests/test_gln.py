@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+import gln
+
+
+def circle(center, axes, n=60, radius=1.0):
+    """
+        Regular n-gon in the plane of the two given axes.
+    """
+    angles = 2 * np.pi * np.arange(n) / n
+    return np.asarray(center, dtype=float) + radius * (np.cos(angles)[:, np.newaxis] * np.asarray(axes[0]) +
+                                                       np.sin(angles)[:, np.newaxis] * np.asarray(axes[1]))
+
+
+def ring_gln(first, second):
+    return gln.segment_gln(first, np.roll(first, -1, axis=0), second, np.roll(second, -1, axis=0)).sum()
+
+
+def test_linked_polygons():
+    first = circle((0, 0, 0), ((1, 0, 0), (0, 1, 0)))
+    second = circle((1, 0, 0), ((1, 0, 0), (0, 0, 1)))
+    assert "%.4f" % ring_gln(first, second) == "-1.0000"
+    assert "%.4f" % ring_gln(first, second[::-1]) == "1.0000"
+
+
+def test_unlinked_polygons():
+    first = circle((0, 0, 0), ((1, 0, 0), (0, 1, 0)))
+    second = circle((3, 0, 0), ((1, 0, 0), (0, 0, 1)))
+    assert abs(ring_gln(first, second)) < 1e-9
+
+
+def test_segments_sharing_an_atom_give_zero():
+    points = np.array([[0.0, 0, 0], [1, 0, 0], [1, 1, 0]])
+    assert gln.segment_gln(points[:1], points[1:2], points[1:2], points[2:]).tolist() == [[0.0]]
+
+
+def chain(residues=40, seed=3):
+    """
+        Random walk with unit steps.
+    """
+    steps = np.random.RandomState(seed).normal(size=(residues, 3))
+    return np.cumsum(steps / np.linalg.norm(steps, axis=1)[:, np.newaxis], axis=0)
+
+
+def test_matrix_entries_are_sums_of_single_segments():
+    xyz = chain()
+    matrix, single = gln.gln_matrix(xyz[10:25], xyz[25:])
+    assert matrix.shape == (len(xyz) - 25, len(xyz) - 25) and len(single) == len(xyz) - 26
+    for a in range(len(matrix)):
+        for b in range(len(matrix)):
+            if a < b:
+                assert matrix[a, b] == pytest.approx(single[a:b].sum(), abs=1e-12)
+            else:
+                assert np.isnan(matrix[a, b])
+
+
+def test_chunks_give_the_same_gln():
+    xyz = chain()
+    whole = gln.segment_gln(xyz[:-1], xyz[1:], xyz[5:20], xyz[6:21])
+    assert np.allclose(gln.segment_gln(xyz[:-1], xyz[1:], xyz[5:20], xyz[6:21], chunk=7), whole)
+
+
+def test_tail_matrices():
+    xyz = chain()
+    index = np.arange(100, 100 + len(xyz))
+    matrices = gln.tail_matrices(index, xyz, 10, 30)
+    assert sorted(matrices) == ["t1", "t2"]
+    residues, matrix, single = matrices["t1"]
+    assert residues.tolist() == list(range(100, 110))
+    assert np.allclose(single, gln.tail_gln(xyz[10:31], xyz[:10]))
+    assert np.allclose(matrix[0, -1], single.sum())
+    assert matrices["t2"][0].tolist() == list(range(131, 140))
+
+
+def test_short_tails_have_no_matrix():
+    xyz = chain()
+    matrices = gln.tail_matrices(np.arange(len(xyz)), xyz, gln.MIN_TAIL - 1, len(xyz) - gln.MIN_TAIL - 1)
+    assert sorted(matrices) == ["t2"]
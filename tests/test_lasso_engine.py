@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import platform
+import shutil
+import subprocess
+
+import numpy as np
+import pytest
+
+import lasso_engine
+import lasso_pipeline
+from conftest import DATA, ROOT
+
+ENGINE_DATA = os.path.join(DATA, "engine")
+FIELDS = ("lasso", "n_piercings", "c_piercings", "n_deep_piercings", "c_deep_piercings")
+
+with open(os.path.join(ENGINE_DATA, "expected.json")) as f:
+    CASES = json.load(f)["cases"]
+
+
+def case_id(case):
+    return "%s_%d_%d" % (case["xyz"][:-4], case["first"], case["last"])
+
+
+def detect(case, directory, engine, program="detect_lassos"):
+    """
+        LassoResult of the case run in the directory by the engine.
+    """
+    xyz = os.path.join(str(directory), case["xyz"])
+    shutil.copyfile(os.path.join(ENGINE_DATA, case["xyz"]), xyz)
+    command = "%s %s %d %d -f 0" % (program, xyz, case["first"], case["last"])
+    return lasso_pipeline.parse_result(lasso_pipeline.run_command(command, str(directory), engine))
+
+
+def detect_lassos_program():
+    """
+        detect_lassos of the plugin (or PYLASSO_DETECT_LASSOS) if it runs on this machine, otherwise None.
+    """
+    program = os.environ.get("PYLASSO_DETECT_LASSOS") or os.path.join(
+        ROOT, "PyLasso", "detect_lassos" + (".exe" if platform.system() == "Windows" else ""))
+    try:
+        subprocess.run([program], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=30)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return program
+
+
+@pytest.mark.parametrize("case", CASES, ids=case_id)
+def test_engine_matches_expected(case, tmp_path):
+    result = detect(case, tmp_path, "numpy")
+    assert result.error == case["error"]
+    if case["error"] is None:
+        assert {i: getattr(result, i) for i in FIELDS} == {i: case[i] for i in FIELDS}
+
+
+@pytest.mark.parametrize("case", CASES, ids=case_id)
+def test_engine_agrees_with_detect_lassos(case, tmp_path):
+    program = detect_lassos_program()
+    if program is None:
+        pytest.skip("detect_lassos does not run on this machine (set PYLASSO_DETECT_LASSOS)")
+    (tmp_path / "binary").mkdir()
+    expected = detect(case, tmp_path / "binary", "binary", program)
+    result = detect(case, tmp_path, "numpy")
+    assert result.error == expected.error
+    if expected.error is None:
+        assert {i: getattr(result, i) for i in FIELDS} == {i: getattr(expected, i) for i in FIELDS}
+
+
+def test_binary_engine_by_default(monkeypatch):
+    monkeypatch.delenv("PYLASSO_ENGINE", raising=False)
+    assert lasso_pipeline.default_engine() == "binary"
+    monkeypatch.setenv("PYLASSO_ENGINE", "numpy")
+    assert lasso_pipeline.default_engine() == "numpy"
+
+
+def test_trajectory_frames_are_carried_over(tmp_path):
+    path = str(tmp_path / "random_A.xyz")
+    lasso_engine.random_trajectory(path, 60, 300, noise=0.01)
+    words = lasso_engine.detect_trajectory(path, 100, 200, check_distances=False, detailed=True, verify=True).split()
+    counts = {name: int(words[words.index(name) + 1]) for name in ("frames", "computed", "carried", "retested",
+                                                                   "differ")}
+    assert counts["differ"] == 0
+    assert counts["computed"] + counts["carried"] + counts["retested"] == counts["frames"] == 60
+    assert counts["carried"] > counts["computed"]
+
+
+def test_unchanged_frame_carries_the_reference_lasso():
+    index, xyz = np.arange(1, 301), lasso_engine.random_chain(300)
+    i, j = 99, 199
+    lasso = lasso_engine.find_lasso(index, xyz, i, j)
+    segments = list(range(i - 2, -1, -1)) + list(range(j + 1, len(xyz) - 1))
+    clearances = lasso_engine.surface_clearances(xyz, segments, lasso["triangles"], 4.0)
+    assert clearances[2].min() < 0.01  # a tail segment next to the bridge nearly touches the surface
+    moved = xyz + np.random.default_rng(1).normal(scale=0.002, size=xyz.shape)
+    derived, changed = lasso_engine.coherent_lasso((xyz, lasso, clearances, 4.0), index, moved, i, j)
+    assert derived is lasso and not changed
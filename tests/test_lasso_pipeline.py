@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import sys
+
+import pytest
+
+import convert_pdb_2_5columns
+import lasso_engine
+import lasso_pipeline
+from conftest import DATA
+
+sys.path.insert(0, os.path.join(DATA, "pdb"))
+import make_structures
+
+
+@pytest.mark.skipif(shutil.which("printf") is None, reason="printf is not available")
+def test_run_command_finishes_process_when_output_cannot_be_read():
+    cancellation = lasso_pipeline.Cancellation()
+    with pytest.raises(UnicodeDecodeError):
+        lasso_pipeline.run_command("printf \\377", cancellation=cancellation)
+    assert not cancellation.processes
+
+
+@pytest.mark.parametrize("frames, step, shards, min_frames", [(1000, 1, 4, 100), (1000, 3, 4, 100), (1001, 7, 8, 10),
+                                                              (999, 10, 3, 30), (250, 2, 16, 20), (50, 1, 4, 100),
+                                                              (10, 20, 4, 1), (1, 1, 4, 1)])
+def test_trajectory_shards_start_at_multiples_of_step_and_cover_all_frames(frames, step, shards, min_frames):
+    ranges = lasso_pipeline.trajectory_shards(frames, step, shards, min_frames)
+    assert 1 <= len(ranges) <= shards
+    assert ranges[0][0] == 0 and ranges[-1][1] == frames
+    assert all(end == begin for (_, end), (begin, _) in zip(ranges, ranges[1:]))
+    assert all(begin % step == 0 and begin < end for begin, end in ranges)
+    analysed = [list(range(begin, end, step)) for begin, end in ranges]
+    assert sum(analysed, []) == list(range(0, frames, step))
+    if len(ranges) > 1:
+        assert all(len(i) >= min_frames for i in analysed)
+
+
+def test_trajectory_shards_concatenate_to_the_trajectory(tmp_path):
+    trajectory = str(tmp_path / "traj.pdb")
+    make_structures.trajectory(trajectory, 23, 20, seed=5)
+    convert_pdb_2_5columns.convert_trajectory(trajectory)
+    xyz_file = trajectory + "_A.xyz"
+    index = lasso_pipeline.read_frame_index(xyz_file)
+    assert len(index) == 23
+
+    parts = []
+    for k, (begin, end) in enumerate(lasso_pipeline.trajectory_shards(len(index), 2, 3, 2)):
+        path = str(tmp_path / ("shard_%d.xyz" % k))
+        lasso_pipeline.write_trajectory_shard(xyz_file, index, begin, end, path, block=100)
+        with open(path, "rb") as f:
+            parts.append(f.read())
+        assert parts[-1].startswith(("t " + index[begin][0] + "\n").encode())
+    with open(xyz_file, "rb") as f:
+        assert b"".join(parts) == f.read()
+
+
+def trajectory_output(frames):
+    header = ["# header line %d of detect_lassos\n" % k for k in range(lasso_pipeline.TRAJECTORY_HEADER)]
+    return "".join(header + ["%d.00000 0 0 | | | L0\n" % (10 * k) for k in frames])
+
+
+def test_merged_shard_outputs_equal_a_single_run(tmp_path):
+    names = ["traj_x_A_3_25.txt", "traj_x_A_3_25_detailed.txt"]
+    shards = [range(0, 40), range(40, 80), range(80, 101)]
+    directories = []
+    for k, frames in enumerate(shards):
+        directories.append(str(tmp_path / str(k)))
+        os.makedirs(directories[-1])
+        for name in names:
+            with open(os.path.join(directories[-1], name), "w") as f:
+                f.write(trajectory_output(frames))
+        with open(os.path.join(directories[-1], "surface_x_A_3_25.jms"), "w") as f:
+            f.write("not merged")
+    target = str(tmp_path / "merged")
+    os.makedirs(target)
+
+    lasso_pipeline.merge_trajectory_outputs(directories, target)
+    assert sorted(os.listdir(target)) == names
+    for name in names:
+        with open(os.path.join(target, name)) as f:
+            assert f.read() == trajectory_output(range(101))
+
+
+def frame_starts(data):
+    return [k for k in range(len(data)) if data.startswith(b"TITLE", k) and (k == 0 or data[k - 1:k] == b"\n")]
+
+
+def trajectory_run(directory, data, step):
+    """
+        Converts the trajectory (bytes of a .pdb file) written to the directory, incrementally if it was converted
+        there before, and updates the analysis of its loop 15-29. Returns the output of the run, its summary line
+        and the traj_*.txt file.
+    """
+    trajectory = os.path.join(directory, "traj.pdb")
+    with open(trajectory, "wb") as f:
+        f.write(data)
+    convert_pdb_2_5columns.convert_trajectory(trajectory, previous=directory)
+    output = lasso_pipeline.update_trajectory("detect_lassos %s_A.xyz 15 29 -traj 1 -trajout 0 -cd 0 -step %d" %
+                                              (trajectory, step), directory)
+    with open(os.path.join(directory, "traj_traj.pdb_A_15_29.txt")) as f:
+        return output, f.read().replace(directory, "DIRECTORY")
+
+
+def analysed_frames(output):
+    words = output.split()
+    return int(words[words.index("frames") + 1])
+
+
+@pytest.fixture
+def threaded_trajectory(tmp_path, monkeypatch):
+    """
+        Bytes of a trajectory of 25 frames of the chain threaded_n of the engine regression set (the loop 15-29
+        threaded by the N-terminal tail), analysed by the numpy engine.
+    """
+    monkeypatch.setenv("PYLASSO_ENGINE", "numpy")
+    index, xyz, _ = lasso_engine.read_xyz(os.path.join(DATA, "engine", "threaded_n.xyz"))
+    path = str(tmp_path / "threaded.pdb")
+    make_structures.trajectory(path, 25, len(index), seed=6, chains=("A",), noise=0.2, xyz=[xyz])
+    with open(path, "rb") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("step", [1, 3])
+def test_updated_trajectory_analysis_equals_a_full_run(tmp_path, threaded_trajectory, step):
+    data = threaded_trajectory
+    os.makedirs(str(tmp_path / "full"))
+    os.makedirs(str(tmp_path / "growing"))
+    output, expected = trajectory_run(str(tmp_path / "full"), data, step)
+    assert analysed_frames(output) == len(range(0, 25, step))
+
+    starts = frame_starts(data)
+    previous = None
+    for frames in (9, 17, 25):
+        output, result = trajectory_run(str(tmp_path / "growing"), data[:starts[frames] if frames < 25 else None],
+                                        step)
+        first = 0 if previous is None else (previous - 1) // step * step  # frame of the checkpoint
+        assert analysed_frames(output) == len(range(first, frames, step))
+        previous = frames
+    assert result == expected
+    assert "L-1N" in expected
+
+
+def test_edited_frame_invalidates_the_checkpoint(tmp_path, threaded_trajectory):
+    data = threaded_trajectory
+    starts = frame_starts(data)
+    atom = data.index(b"\nATOM", starts[4]) + 1
+    edited = data[:atom + 37] + (b"9" if data[atom + 37:atom + 38] != b"9" else b"8") + data[atom + 38:]
+    os.makedirs(str(tmp_path / "full"))
+    os.makedirs(str(tmp_path / "growing"))
+    _, expected = trajectory_run(str(tmp_path / "full"), edited, 1)
+
+    trajectory_run(str(tmp_path / "growing"), data[:starts[17]], 1)
+    words = ["detect_lassos", str(tmp_path / "growing" / "traj.pdb_A.xyz"), "15", "29", "-traj", "1", "-trajout", "0",
+             "-cd", "0", "-step", "1"]
+    checkpoint = lasso_pipeline.trajectory_checkpoint(str(tmp_path / "growing"), words)
+    index = lasso_pipeline.read_frame_index(words[1])
+    assert lasso_pipeline.read_trajectory_checkpoint(checkpoint, words, index)["frames"] == 16
+
+    output, result = trajectory_run(str(tmp_path / "growing"), edited, 1)
+    assert analysed_frames(output) == 25
+    assert result == expected
+
+
+def test_keep_lines(tmp_path):
+    path = str(tmp_path / "lines.txt")
+    with open(path, "wb") as f:
+        f.write(b"a\nb\nc\nd")
+    assert lasso_pipeline.keep_lines(path, 2)
+    with open(path, "rb") as f:
+        assert f.read() == b"a\nb\n"
+    assert not lasso_pipeline.keep_lines(path, 3)
+
+
+# Output lines of detect_lassos in the field layout the plugin read them in before LassoResult: name, first, last,
+# loop length, numbers of N- and C-terminal piercings, two fields, the N- then the C-terminal piercings, the
+# numbers of piercings without the shallow ones, their lists, the lasso type and the surface area.
+normal_output = "/data/1abc.pdb_A.xyz 15 29 15 1 0 - - -7 - - 1 0 - - -7 - L-1N - 304.0503 -\n"
+detailed_output = "/data/1abc.pdb_A.xyz 20 80 61 3 2 - - +25 -31 +40 - -66 +70 - 1 1 - - +40 - -66 LL+1,-1 - " \
+                  "512.3301 -\n"
+error_output = "ERROR(8): There is no MOSTEK CYSTEINOWY - distance between chosen atoms is too big\n"
+smooth_output = normal_output + "SMOOTH_/data/1abc.pdb_A.xyz 15 29 15 2 1 - - -7 +12 - +44 - 1 1 - - -7 - +44 " \
+                                "LL-1,+1 - 311.2000 -\n"
+
+
+def plugin_fields(output):
+    """
+        N- and C-terminal piercings and those without the shallow ones read at the positions the plugin used
+        before LassoResult (get_n_crossings, get_c_crossings and itemise_types_of_lasso).
+    """
+    elem = output.split("SMOOTH")[0].split(" ")
+    n, c = int(elem[4]), int(elem[5])
+    n_deep, c_deep = int(elem[4 + 3 + n + 1 + c + 2]), int(elem[9 + n + c + 2])
+    start = 8 + n + 2 + c + 4
+    return (elem[8:8 + n], elem[5 + 2 + 2 + n:5 + 2 + 2 + n + c], elem[start:start + n_deep],
+            elem[start + n_deep + 1:start + n_deep + 1 + c_deep])
+
+
+def test_normal_result():
+    result = lasso_pipeline.parse_result(normal_output)
+    assert not result.is_error()
+    assert (result.name, result.first, result.last, result.loop_length()) == ("/data/1abc.pdb_A.xyz", 15, 29, 15)
+    assert (result.lasso, result.area) == ("L-1N", 304.0503)
+    assert (result.n_piercings, result.c_piercings) == (["-7"], [])
+    assert (result.n_deep_piercings, result.c_deep_piercings) == (["-7"], [])
+    assert not result.has_shallow_n and not result.has_shallow_c
+    assert (result.smooth_n_piercings, result.smooth_c_piercings) == (["-7"], [])
+    assert lasso_pipeline.result_summary(result) == ["L-1N", "-7", "", "304.05"]
+
+
+def test_detailed_result_with_shallow_piercings():
+    result = lasso_pipeline.parse_result(detailed_output)
+    assert (result.first, result.last, result.loop_length()) == (20, 80, 61)
+    assert (result.lasso, result.area) == ("LL+1,-1", 512.3301)
+    assert (result.n_piercings, result.c_piercings) == (["+25", "-31", "+40"], ["-66", "+70"])
+    assert (result.n_deep_piercings, result.c_deep_piercings) == (["+40"], ["-66"])
+    assert result.has_shallow_n and result.has_shallow_c
+    assert lasso_pipeline.result_summary(result) == ["LL+1,-1", "+40", "-66", "512.33"]
+
+
+@pytest.mark.parametrize("output", [normal_output, detailed_output, smooth_output])
+def test_result_fields_at_the_plugin_positions(output):
+    result = lasso_pipeline.parse_result(output)
+    assert (result.n_piercings, result.c_piercings, result.n_deep_piercings, result.c_deep_piercings) == \
+        plugin_fields(output)
+
+
+@pytest.mark.parametrize("output", [error_output, "Neighbours for crossings:\n" + error_output])
+def test_error_result(output):
+    result = lasso_pipeline.parse_result(output)
+    assert result.is_error() and result.error == 8
+    assert result.error_message == error_output.strip()
+    assert result.lasso is None and result.n_piercings == [] and result.smooth_n_piercings == []
+    assert lasso_pipeline.result_summary(result) == [error_output.strip(), "", "", ""]
+
+
+def test_empty_output_is_an_error():
+    result = lasso_pipeline.parse_result("\n")
+    assert result.is_error() and result.error == 0
+
+
+def test_smooth_crossings_read_from_the_smooth_line():
+    result = lasso_pipeline.parse_result(smooth_output)
+    assert (result.lasso, result.area) == ("L-1N", 304.0503)
+    assert (result.n_piercings, result.c_piercings) == (["-7"], [])
+    assert (result.smooth_n_piercings, result.smooth_c_piercings) == (["-7", "+12"], ["+44"])
+
+
+def test_smooth_error_keeps_the_result():
+    result = lasso_pipeline.parse_result(normal_output + "SMOOTH_" + error_output)
+    assert not result.is_error() and result.lasso == "L-1N"
+    assert (result.smooth_n_piercings, result.smooth_c_piercings) == ([], [])
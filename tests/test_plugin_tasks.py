@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import sys
+
+import numpy as np
+
+import convert_pdb_2_5columns
+import lasso_pipeline
+import PyLasso
+from conftest import DATA
+
+sys.path.insert(0, os.path.join(DATA, "pdb"))
+import make_structures
+
+
+class Value:
+    """
+        Stand-in for the Tk variables (get) and Pmw entry fields (getvalue) read by the plugin.
+    """
+    def __init__(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def getvalue(self):
+        return self.value
+
+
+def trajectory_plugin(directory):
+    """
+        Plugin (without Tk) with a converted trajectory in its polymer directory, whose start_task runs the task
+        at once and records it.
+    """
+    trajectory = os.path.join(directory, "traj.pdb")
+    make_structures.trajectory(trajectory, 5, 30, seed=4, chains=("A",))
+    convert_pdb_2_5columns.convert_trajectory(trajectory)
+    os.makedirs(os.path.join(directory, "traj_pdb"))
+    for name in os.listdir(directory):
+        if name.startswith("traj.pdb_"):
+            shutil.move(os.path.join(directory, name), os.path.join(directory, "traj_pdb", name))
+
+    plugin = object.__new__(PyLasso.PyLassoLinux)
+    plugin._full_path_to_dir, plugin._filename, plugin.chains = directory, "traj.pdb", ["A"]
+    plugin.program_execution = os.path.join(PyLasso.plugin_path, "detect_lassos ")
+    plugin.result_cache, plugin.frame_cache = None, (None, [])
+    plugin.retrieved_frames = ["0.00000", "10.00000", "20.00000", "30.00000", "40.00000"]
+    plugin.trajectory_chain_loop_indexes = ["3", "25"]
+    plugin.is_detailed_alg, plugin.is_detailed_out_frame = Value(False), Value(True)
+    plugin.get_trajectory_advanced = lambda: "-f 2 -cd 0"
+    plugin.tasks = []
+
+    def start_task(label, function, then=None, watch=None, failure=None):
+        plugin.tasks.append(label)
+        then(function(lambda done, total: None, lasso_pipeline.Cancellation()))
+
+    plugin.start_task = start_task
+    return plugin
+
+
+def test_frames_are_analysed_in_a_task_without_changing_directory(tmp_path, monkeypatch):
+    monkeypatch.setenv("PYLASSO_ENGINE", "numpy")
+    plugin = trajectory_plugin(str(tmp_path))
+    plugin.frame_list = [Value("10"), Value("30.0")]
+    shown = []
+    plugin.show_trajectory_frame = shown.append
+
+    def chdir(path):
+        raise AssertionError("os.chdir(%r) called" % path)
+
+    monkeypatch.setattr(os, "chdir", chdir)
+    plugin.calculate_trajectory_frame()
+
+    assert plugin.tasks == ["Detecting lassos in the frames..."] and shown == [None]
+    assert plugin.given_frames == ["10.00000", "30.00000"]
+    assert [result.first for result in plugin.results] == [3, 3] and not any(i.is_error() for i in plugin.results)
+    for frame in plugin.given_frames:
+        assert "traj.pdb_A__frame_" + frame + ".xyz" in os.listdir(os.path.join(str(tmp_path), "traj_pdb",
+                                                                                "frame_" + frame))
+    assert not [name for name in os.listdir(str(tmp_path)) if "frame_" in name]
+
+
+def test_frame_missing_from_an_ended_cache_is_read_with_the_index(tmp_path, monkeypatch):
+    plugin = trajectory_plugin(str(tmp_path))
+    path = os.path.join(str(tmp_path), "traj_pdb", "traj.pdb_A")
+    # the cache ends after two frames, as when the residues of the chain change in the third one
+    metadata = dict(np.load(path + ".npz"))
+    frames = np.load(path + ".npy")[:2]
+    np.save(path + ".npy", frames)
+    np.savez(path + ".npz", time=metadata["time"][:2], resid=metadata["resid"])
+    read = []
+    write_xyz = convert_pdb_2_5columns.FrameIndex.write_xyz
+    monkeypatch.setattr(convert_pdb_2_5columns.FrameIndex, "write_xyz",
+                        lambda self, time, name: read.append(time) or write_xyz(self, time, name))
+
+    expected = [line.rstrip("\n") + " ABC\n" for line in convert_pdb_2_5columns.FrameIndex(path).frame("30.00000")]
+    for frame in ["10.00000", "30.00000"]:
+        plugin.given_frame = frame
+        plugin.create_file_containing_frame()
+    assert read == ["30.00000"]
+    with open(plugin.file_frame_name) as f:
+        assert f.readlines() == expected
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import time
+
+import pytest
+
+import lasso_pipeline
+import result_cache
+from conftest import DATA
+
+ENGINE_DATA = os.path.join(DATA, "engine")
+
+
+@pytest.fixture
+def runs(monkeypatch):
+    """
+        Commands actually run (not taken from the cache) by lasso_pipeline.run_command, with the numpy engine.
+    """
+    commands = []
+    run_command = lasso_pipeline.run_command
+
+    def counted(command, cwd=None, engine="binary", cancellation=None):
+        commands.append(command)
+        return run_command(command, cwd, engine, cancellation)
+
+    monkeypatch.setattr(lasso_pipeline, "run_command", counted)
+    return commands
+
+
+def chain(directory, name="threaded_n.xyz"):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, name)
+    shutil.copyfile(os.path.join(ENGINE_DATA, name), path)
+    return path
+
+
+def run(cache, xyz, loop="15 29", options="-f 2"):
+    command = "detect_lassos %s %s %s" % (xyz, loop, options)
+    return lasso_pipeline.run_cached_command(command, os.path.dirname(xyz), "numpy", cache)
+
+
+def test_second_run_restores_output_and_files(tmp_path, runs):
+    cache = result_cache.ResultCache(str(tmp_path / "cache"))
+    first, second = chain(str(tmp_path / "first")), chain(str(tmp_path / "second"))
+    output = run(cache, first)
+    assert runs and "L-1N" in output
+
+    restored = run(cache, second)
+    assert len(runs) == 1
+    assert restored == output.replace(first, second)
+    assert os.listdir(str(tmp_path / "second")) == os.listdir(str(tmp_path / "first"))
+    with open(str(tmp_path / "first" / "surface_threaded_n_15_29.jms")) as f, \
+            open(str(tmp_path / "second" / "surface_threaded_n_15_29.jms")) as g:
+        assert f.read() == g.read()
+
+
+def test_changed_chain_misses_the_cache(tmp_path, runs):
+    cache = result_cache.ResultCache(str(tmp_path / "cache"))
+    xyz = chain(str(tmp_path / "chain"))
+    run(cache, xyz)
+    with open(xyz) as f:
+        lines = f.readlines()
+    index, x, y, z = lines[0].split()[:4]
+    lines[0] = "%s %.3f %s %s\n" % (index, float(x) + 0.5, y, z)
+    with open(xyz, "w") as f:
+        f.writelines(lines)
+    os.utime(xyz, ns=(time.time_ns(), time.time_ns() + 10 ** 9))
+    run(cache, xyz)
+    assert len(runs) == 2
+
+
+def test_key_depends_on_chain_loop_options_and_version(tmp_path):
+    cache = result_cache.ResultCache(str(tmp_path / "cache"))
+    xyz = chain(str(tmp_path / "a"))
+    entry = cache.entry(xyz, 15, 29, "-f 2 -cd 0", "numpy 1")
+    assert cache.entry(chain(str(tmp_path / "b")), 15, 29, "-cd 0 -f 2", "numpy 1") == entry
+    assert cache.entry(chain(str(tmp_path / "c"), "threaded_c.xyz"), 15, 29, "-f 2 -cd 0", "numpy 1") != entry
+    assert cache.entry(xyz, 15, 30, "-f 2 -cd 0", "numpy 1") != entry
+    assert cache.entry(xyz, 15, 29, "-f 2", "numpy 1") != entry
+    assert cache.entry(xyz, 15, 29, "-f 2 -cd 0", "numpy 2") != entry
+    assert lasso_pipeline.engine_version("detect_lassos", "numpy") != \
+        lasso_pipeline.engine_version(os.path.join(ENGINE_DATA, "make_chains.py"), "binary")
+
+
+def test_errors_are_not_stored(tmp_path, runs):
+    cache = result_cache.ResultCache(str(tmp_path / "cache"))
+    xyz = chain(str(tmp_path / "chain"), "free.xyz")
+    assert "ERROR(7)" in run(cache, xyz, "12 13")
+    assert "ERROR(7)" in run(cache, xyz, "12 13")
+    assert len(runs) == 2
+    assert os.listdir(str(tmp_path / "cache")) == []
+
+
+def test_restore_of_missing_entry(tmp_path):
+    cache = result_cache.ResultCache(str(tmp_path / "cache"))
+    xyz = chain(str(tmp_path / "chain"))
+    assert cache.restore(cache.entry(xyz, 15, 29, "-f 2", "numpy"), xyz, str(tmp_path)) is None
+
+
+def test_evict_removes_least_recently_used_entries(tmp_path):
+    cache = result_cache.ResultCache(str(tmp_path / "cache"), max_size=2500)
+    directory = str(tmp_path / "chain")
+    xyz = chain(directory)
+    with open(os.path.join(directory, "surface_threaded_n_15_29.jms"), "w") as f:
+        f.write("x" * 1000)
+    entries = [cache.entry(xyz, 15, 29, "-f %d" % k, "numpy") for k in range(3)]
+    for k, entry in enumerate(entries):
+        cache.store(entry, xyz, "output %d" % k, directory, ["surface_threaded_n_15_29.jms"])
+        os.utime(os.path.join(entry, result_cache.OUTPUT_FILE), (1000 + k, 1000 + k))
+    assert cache.restore(entries[0], xyz, directory) == "output 0"  # used again, now the most recent
+    stale = os.path.join(str(tmp_path / "cache"), "tmp-stale")
+    os.makedirs(stale)
+    os.utime(stale, (0, 0))
+
+    assert cache.evict() == 1
+    assert [os.path.exists(entry) for entry in entries] == [True, False, True]
+    assert not os.path.exists(stale)
+    assert cache.evict() == 0
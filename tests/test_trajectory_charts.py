@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+matplotlib = pytest.importorskip("matplotlib")
+matplotlib.use("Agg")
+import matplotlib.figure
+from matplotlib.backend_bases import MouseEvent, PickEvent
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+import PyLasso
+
+
+def trajectory_chart(lassos):
+    """
+        Plugin with a trajectory of the given lasso types (frames 1, 2, ...) and its chart of lasso types drawn as
+        draw_lassos_type_chart does, without Tk.
+    """
+    plugin = object.__new__(PyLasso.PyLassoBase)
+    plugin.retrieved_frames = [str(i + 1) for i in range(len(lassos))]
+    plugin.retrieved_trajectory_lassos = list(lassos)
+    plugin.retrieved_trajectory_crossings = ["|" if i in ("L0", "ERR") else ["+%d" % (10 + k), "-%d" % (50 + k)]
+                                             for k, i in enumerate(lassos)]
+    plugin.chart_frames = {}
+    positions = sorted(set(PyLasso.lassos.index(i) if i in PyLasso.lassos else PyLasso.lassos.index("Other")
+                           for i in lassos))
+    plugin.lasso_info_tuple = {PyLasso.lassos[i]: [k, PyLasso.colors[i]] for k, i in enumerate(positions)}
+    figure = matplotlib.figure.Figure()
+    ax = figure.add_subplot(111)
+    FigureCanvasAgg(figure)
+    ax.yaxis.set_ticks(range(len(positions)))
+    ax.set_yticklabels(list(plugin.lasso_info_tuple))
+    plugin.scatter_lassos_types(ax)
+    plugin.create_annotations(ax.collections)
+    figure.canvas.draw()
+    return plugin, ax
+
+
+def pick(ax, collection, k):
+    """
+        Pick event of a click on the k-th point of the collection.
+    """
+    x, y = ax.transData.transform(collection.get_offsets()[k])
+    mouse = MouseEvent("button_press_event", ax.figure.canvas, x, y)
+    hit, properties = collection.contains(mouse)
+    assert hit
+    return PickEvent("pick_event", ax.figure.canvas, mouse, collection, **properties)
+
+
+def test_all_frames_drawn_one_collection_per_type():
+    lassos = ["L0", "L+1C", "L0", "ERR", "L+1C", "L-1N"] * 50
+    plugin, ax = trajectory_chart(lassos)
+    assert len(ax.collections) == 4
+    assert sum(len(i.get_offsets()) for i in ax.collections) == len(lassos)
+
+
+def test_pick_without_other_type():
+    plugin, ax = trajectory_chart(["L0", "L+1C", "L0", "L-1N", "L+1C"])
+    assert "Other" not in plugin.lasso_info_tuple
+    collection = next(i for i, frames in plugin.chart_frames.items() if plugin.retrieved_trajectory_lassos[frames[0]]
+                      == "L-1N")
+    event = pick(ax, collection, 0)
+    assert plugin.picked_frame(event) == 3
+    plugin.display_annotation(event)
+    annotation = plugin.annotations[ax]
+    assert annotation.get_visible()
+    assert "L-1N" in annotation.get_text() and "Frame: 4" in annotation.get_text()
+    assert annotation.xy == (4.0, plugin.lasso_info_tuple["L-1N"][0])
+
+
+def test_pick_unknown_type_drawn_as_other():
+    plugin, ax = trajectory_chart(["L0", "LS5+N", "L0"])
+    collection = next(i for i, frames in plugin.chart_frames.items() if frames[0] == 1)
+    event = pick(ax, collection, 0)
+    plugin.display_annotation(event)
+    assert "LS5+N" in plugin.annotations[ax].get_text()
+    assert plugin.annotations[ax].xy[1] == plugin.lasso_info_tuple["Other"][0]